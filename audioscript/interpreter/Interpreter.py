@@ -1,16 +1,63 @@
-from audioscript.lexer.Lexer import Lexer, get_tokens
+from audioscript.lexer.Lexer import Lexer, get_tokens, make_lexer
 from audioscript.pars.Parser import Parser, Var
-from interpreter.symbol_table import ScopedSymbolTable, VarSymbol, FunctionSymbol, BuiltinTypeSymbol, ExternalFunctionSymbol
-import numbers
+from audioscript.interpreter.arrays import element, floating, make_array, ndarray, part
+from audioscript.interpreter.externals import ExternalTable
+from audioscript.interpreter.host import host_call
+from audioscript.interpreter.memo import MEMO_SIZE, MISSING, Memos
+from audioscript.interpreter.scopes import scoped_blocks
+from interpreter.symbol_table import (ScopedSymbolTable, ScopePool, VarSymbol, FunctionSymbol, BuiltinTypeSymbol,
+                                      ExternalFunctionSymbol)
 import sys
 
 globals().update(get_tokens())
 
+class InlineCache(object):
+    """
+    Inline cache of a FunctionCall node: symbol of the function the call found the last time, and
+    the caller of the external function made for the arguments of the call, valid while the epoch
+    of the interpreter is the same.
+    """
+    __slots__ = ('epoch', 'symbol', 'function', 'variables', 'hits', 'misses')
+
+    def __init__(self, variables):
+        """
+        :param variables: For every argument, whether it is a variable, which external calls check differently.
+        """
+        self.epoch = None
+        self.symbol = None
+        self.function = None
+        self.variables = variables
+        # number of calls which used the cached function and which looked the function up
+        self.hits = 0
+        self.misses = 0
+
+
 class NodeVisitor(object):
+    """
+    Calls visit_<node class name> method for the visited node. The method is looked up once per
+    node class and visitor class and kept in the visitor class' dispatch table.
+    """
+    _visitors = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._visitors = {}
+
     def visit(self, node):
-        method_name = 'visit_' + type(node).__name__
-        visitor = getattr(self, method_name, self.default_visit)
-        return visitor(node)
+        try:
+            visitor = self._visitors[node.__class__]
+        except KeyError:
+            visitor = self.resolve_visitor(node.__class__)
+        return visitor(self, node)
+
+    @classmethod
+    def resolve_visitor(cls, node_class):
+        """
+        Find method visiting nodes of the class and remember it in the dispatch table.
+        """
+        visitor = getattr(cls, 'visit_' + node_class.__name__, cls.default_visit)
+        cls._visitors[node_class] = visitor
+        return visitor
 
     def default_visit(self, node):
         raise Exception('No visit_{} method'.format(type(node).__name__))
@@ -37,21 +84,101 @@ class Interpreter(NodeVisitor):
     RETURNED_VARIABLE_TYPE = RetType()
     ext_functions = {}
 
-    def __init__(self, parser):
+    def __init__(self, parser, memo_size=MEMO_SIZE):
+        """
+        :param memo_size: Number of results of every pure function kept for calls with the same
+        arguments, 0 turns memoization off.
+        """
         self.parser = parser
         self.current_scope = None
         self.global_scope = None
+        # BlockStat nodes which need scope of their own, the others run in the enclosing scope
+        self.scoped = frozenset()
+        self.scopes = ScopePool()
+        # FunctionCall node -> InlineCache
+        self.inline_caches = {}
+        # names of the functions whose calls are cached; declaring one of them or leaving a scope
+        # which declares one changes the epoch, so the cached calls look the function up again
+        self.called = set()
+        self.epoch = 0
+        # slot -> value of SharedExpression computed in the SharingRegions being run
+        self.shared = {}
+        self.memos = Memos(memo_size)
+        self.externals = ExternalTable()
+        # (function name, number of arguments) -> HostCall
+        self.host_calls = {}
+
+    def location(self, token):
+        """
+        Return position of the token in the source for error messages.
+        """
+        offset = getattr(token, 'offset', None)
+        if offset is None:
+            return ''
+        return ' at ' + self.parser.describe_location(offset)
 
-    def visit(self, node):
-        method_name = 'visit_' + type(node).__name__
-        visitor = getattr(self, method_name, self.default_visit)
-        if not self.FUNCTION_CALL_RETURN_FLAG:
-            return visitor(node)
+    def declare(self, symbol):
+        """
+        Insert the symbol in the current scope.
+        """
+        if symbol.name in self.called:
+            self.epoch += 1
+        self.current_scope.insert(symbol)
+
+    def leave_scope(self, scope):
+        """
+        Leave the scope of block or function call, return the enclosing scope.
+        """
+        if scope.declares(self.called):
+            self.epoch += 1
+        return self.scopes.leave(scope)
+
+    def callee(self, node):
+        """
+        Return InlineCache of the FunctionCall node holding symbol of the function it calls.
+        """
+        cache = self.inline_caches.get(node)
+        if cache is not None and cache.epoch == self.epoch:
+            cache.hits += 1
+            return cache
+
+        function = node.function
+        func_symbol = self.current_scope.lookup(function.value)
+        if func_symbol is None:
+            raise Exception(
+                "Error: Unidentified function \"%s\"%s" % (function.value, self.location(function.token))
+            )
+        if cache is None:
+            cache = self.inline_caches[node] = InlineCache([isinstance(arg, Var) for arg in node.args])
+            self.called.add(function.value)
+        cache.misses += 1
+        cache.epoch = self.epoch
+        cache.symbol = func_symbol
+        if isinstance(func_symbol, ExternalFunctionSymbol):
+            cache.function = func_symbol.external.caller(cache.variables)
+        else:
+            cache.function = None
+        return cache
+
+    def inline_cache_report(self):
+        """
+        Return lines describing hits and misses of the inline caches, by location of the calls.
+        """
+        return ['{}{}: {} hits, {} misses'.format(node.function.value, self.location(node.function.token),
+                                                  cache.hits, cache.misses)
+                for node, cache in self.inline_caches.items()]
 
     def visit_Program(self, node):
         """
         program = declarations, statement-list ;
         """
+        self.enter_program(node)
+        self.leave_program()
+
+    def enter_program(self, node):
+        """
+        Run the program, leaving its global scope current.
+        """
         print('ENTER scope: global')
         self.global_scope = ScopedSymbolTable(
             scope_name='global',
@@ -60,6 +187,7 @@ class Interpreter(NodeVisitor):
         )
         self.global_scope._init_builtins()
         self.current_scope = self.global_scope
+        self.scoped = scoped_blocks(node)
 
         # visit subtree
         if node.declarations is not None:
@@ -68,7 +196,8 @@ class Interpreter(NodeVisitor):
         if node.code is not None:
             self.visit(node.code)
 
-        self.current_scope = self.current_scope.enclosing_scope
+    def leave_program(self):
+        self.current_scope = self.global_scope.enclosing_scope
         print(self.global_scope)
         print('LEAVE scope: global')
 
@@ -81,15 +210,16 @@ class Interpreter(NodeVisitor):
 
     def visit_DeclaredType(self, node):
         if node.name != 'STRING' and node.name != 'NUMBER':
-            self.current_scope.insert(BuiltinTypeSymbol(node.name))
+            self.declare(BuiltinTypeSymbol(node.name))
 
     def visit_ModuleDeclaration(self, node):
-        mod = __import__(node.name)
         for function in node.functions:
-            globals()[function.name] = mod.__getattribute__(function.name)
-            self.visit(function)
+            self.declare_external(node.name, function)
 
-    def visit_ExternalFunctionDeclaration(self, node):
+    def declare_external(self, module_name, node):
+        """
+        Declare external function of the module, bound in the table of external functions.
+        """
         function_name = node.name
         return_type = node.return_type
         args_types = node.arguments_types
@@ -108,23 +238,20 @@ class Interpreter(NodeVisitor):
                 )
             args_symbols.append(arg_sym)
 
-        self.current_scope.insert(ExternalFunctionSymbol(function_name, args_symbols, return_type))
+        memo = self.memos.memo(node, function_name, node.pure)
+        external = self.externals.bind(module_name, function_name, [arg.name for arg in args_symbols], memo)
+        self.declare(ExternalFunctionSymbol(function_name, args_symbols, return_type, memo, external))
 
     def visit_BlockStat(self, node):
-        #print('ENTER scope: %s' %  "BLOCK SCOPE")
+        if node not in self.scoped:
+            self.visit(node.list)
+            return
         # Scope for parameters and local variables
-        block_scope = ScopedSymbolTable(
-            scope_name="block",
-            scope_level=self.current_scope.scope_level + 1,
-            enclosing_scope=self.current_scope
-        )
-        self.current_scope = block_scope
+        self.current_scope = self.scopes.enter("block", self.current_scope)
 
         self.visit(node.list)
 
-        #print(block_scope)
-        self.current_scope = block_scope.enclosing_scope
-        #print("LEAVE scope: BLOCK SCOPE")
+        self.current_scope = self.leave_scope(self.current_scope)
 
     def visit_StatList(self, node):
         """
@@ -132,76 +259,58 @@ class Interpreter(NodeVisitor):
         """
         for statement in node.statements:
             self.visit(statement)
+            # rest of the function body is skipped after return
+            if self.FUNCTION_CALL_RETURN_FLAG:
+                break
 
     def visit_FunctionDeclaration(self, node):
         name = node.name
         args = node.arguments
         body = node.body
 
-        func_symbol = FunctionSymbol(name.value, body, args)
+        func_symbol = FunctionSymbol(name.value, body, args, memo=self.memos.memo(node, name.value, node.pure))
         if self.current_scope.lookup(name.value, current_scope_only=True):
             raise Exception(
-                "Error: Duplicate identifier '%s' found" % name.value
+                "Error: Duplicate identifier '%s' found%s" % (name.value, self.location(name))
             )
-        self.current_scope.insert(func_symbol)
+        self.declare(func_symbol)
 
     def visit_FunctionCall(self, node):
-        function = node.function
-
-        func_symbol = self.current_scope.lookup(function.value)
-        if func_symbol is None:
-            raise Exception(
-                "Error: Unidentified function \"%s\"" % function.name
-            )
+        cache = self.callee(node)
+        func_symbol = cache.symbol
 
         values = []
         for arg in node.args:
             values.append(self.visit(arg))
 
-        if isinstance(func_symbol, ExternalFunctionSymbol):
-            func = globals()[func_symbol.name]
-            arguments = []
-            for arg, formal_arg, v in zip(node.args, func_symbol.arguments_types, values):
-                # when it is a variable
-                if isinstance(arg, Var):
-                    arg_symbol = self.current_scope.lookup(arg.value)
-                    if formal_arg.name == 'NUMBER' and not isinstance(arg_symbol.value, numbers.Complex):
-                        raise TypeError(
-                            "TypeError: Expected {} and got {}".format(formal_arg.name, 'STRING'))
-                    elif formal_arg.name == 'STRING' and isinstance(arg_symbol.value, numbers.Complex):
-                        raise TypeError(
-                            "TypeError: Expected {} and got {}".format(formal_arg.name, 'NUMBER'))
-                    elif formal_arg.name != 'NUMBER' and formal_arg.name != 'STRING' and arg_symbol.type.name != formal_arg.name:
-                        raise TypeError("TypeError: Expected {} and got {}".format(formal_arg.name, arg_symbol.type))
-                    else:
-                        arguments.append(arg_symbol.value)
-                elif v.type == NUMBER or v.type == VAR:
-                    if formal_arg.name != NUMBER and formal_arg.name != 'VAR':
-                        raise TypeError("TypeError: Expected {} and got {}".format(formal_arg.name, 'NUMBER'))
-                    else:
-                        arguments.append(v.value)
-                elif v.type == STRING or v.type == VAR:
-                    if formal_arg.name != STRING and formal_arg.name != 'VAR':
-                        raise TypeError("TypeError: Expected {} and got {}".format(formal_arg.name, 'STRING'))
-                    else:
-                        arguments.append(v.value)
-
-            return VarSymbol(None, func_symbol.return_type.name, func(*arguments))
-
-        function_scope = ScopedSymbolTable(
-            scope_name="function",
-            scope_level=self.current_scope.scope_level + 1,
-            enclosing_scope=self.current_scope
-        )
+        if cache.function is not None:
+            return VarSymbol(None, func_symbol.return_type.name,
+                             cache.function([v.type for v in values], [v.value for v in values],
+                                            lambda: self.location(node.function.token)))
+
+        memo = func_symbol.memo
+        key = memo.key([value.value for value in values]) if memo is not None else None
+        if key is not None:
+            result = memo.get(key)
+            if result is not MISSING:
+                self.GLOBAL_RETURN = result
+                return result
+
+        function_scope = self.scopes.enter("function", self.current_scope)
         self.current_scope = function_scope
 
-        for name, val in zip(func_symbol.arguments, node.args):
-            function_scope.insert(VarSymbol(name, function_scope.lookup('VAR'), self.visit(val)))
+        for name, value in zip(func_symbol.arguments, values):
+            # parameters given arrays are arrays, the others are var
+            self.declare(VarSymbol(name, function_scope.lookup('ARRAY' if value.value.__class__ is ndarray else 'VAR'),
+                                   value.value))
 
         self.visit(func_symbol.body)
+        # only results of return statements are kept, without one the call has no result of its own
+        if key is not None and self.FUNCTION_CALL_RETURN_FLAG:
+            memo.put(key, self.GLOBAL_RETURN)
         self.FUNCTION_CALL_RETURN_FLAG = False
 
-        self.current_scope = function_scope.enclosing_scope
+        self.current_scope = self.leave_scope(function_scope)
         return self.GLOBAL_RETURN
 
     def visit_BinOp(self, node):
@@ -209,28 +318,54 @@ class Interpreter(NodeVisitor):
         right = self.visit(node.right)
 
         if node.op.type == PLUS:
-            return VarSymbol(None, left.type, left.value + right.value)
+            value = left.value + right.value
         elif node.op.type == MINUS:
-            return VarSymbol(None, left.type, left.value - right.value)
+            value = left.value - right.value
         elif node.op.type == MUL:
-            return VarSymbol(None, left.type, left.value * right.value)
+            value = left.value * right.value
         elif node.op.type == DIV:
-            return VarSymbol(None, left.type, left.value / right.value)
-
-        self.GLOBAL_RETURN = None
+            value = left.value / right.value
+        else:
+            self.GLOBAL_RETURN = None
+            return
+        if value.__class__ is ndarray:
+            # arithmetic with an array is done on all the elements at once and gives array
+            return VarSymbol(None, 'ARRAY', floating(value, node.op.type, left.value, right.value))
+        return VarSymbol(None, left.type, value)
 
     def visit_Num(self, node):
-        return VarSymbol(None, NUMBER, node.value)
+        return VarSymbol(None, 'NUMBER', node.value)
 
     def visit_String(self, node):
-        return VarSymbol(None, STRING, node.value)
+        return VarSymbol(None, 'STRING', node.value)
 
     def visit_UnaryOp(self, node):
         op = node.op.type
+        value = self.visit(node.value).value
         if op == PLUS:
-            return VarSymbol(None, NUMBER, +node.value.value)
+            result = +value
         elif op == MINUS:
-            return VarSymbol(None, NUMBER, -node.value.value)
+            result = -value
+        else:
+            return
+        if result.__class__ is ndarray:
+            return VarSymbol(None, 'ARRAY', floating(result, op, value))
+        return VarSymbol(None, 'NUMBER', result)
+
+    def visit_ArrayLiteral(self, node):
+        values = [self.visit(element).value for element in node.elements]
+        return VarSymbol(None, 'ARRAY', make_array(values, lambda: self.location(node.token)))
+
+    def visit_Index(self, node):
+        array = self.visit(node.value).value
+        index = self.visit(node.index).value
+        return VarSymbol(None, 'NUMBER', element(array, index, lambda: self.location(node.token)))
+
+    def visit_Slice(self, node):
+        array = self.visit(node.value).value
+        start = self.visit(node.start).value if node.start is not None else None
+        end = self.visit(node.end).value if node.end is not None else None
+        return VarSymbol(None, 'ARRAY', part(array, start, end, lambda: self.location(node.token)))
 
     def visit_If(self, node):
         cond_node = node.cond
@@ -245,6 +380,8 @@ class Interpreter(NodeVisitor):
 
         while(self.visit(cond_node)):
             self.visit(block_node)
+            if self.FUNCTION_CALL_RETURN_FLAG:
+                break
 
     def visit_Assign(self, node):
         # right-hand side
@@ -261,12 +398,12 @@ class Interpreter(NodeVisitor):
         var_symbol = self.current_scope.lookup(var_name)
         if var_symbol is None:
             raise Exception(
-                "Error: Unidentified variable \"%s\"" % var_name
+                "Error: Unidentified variable \"%s\"%s" % (var_name, self.location(node.token))
             )
         if var_symbol.type.name == 'VAR' and (value.type != 'STRING' and value.type != 'NUMBER' and value.type != 'VAR'):
-            raise TypeError("TypeError: Expected {} and got {}".format('VAR', value.type))
+            raise TypeError("TypeError: Expected {} and got {}".format('VAR', value.type) + self.location(node.token))
         elif var_symbol.type.name != 'VAR' and var_symbol.type.name != value.type:
-            raise TypeError("TypeError: Expected {} and got {}".format(var_symbol.type, value.type))
+            raise TypeError("TypeError: Expected {} and got {}".format(var_symbol.type, value.type) + self.location(node.token))
 
         var_symbol.value = value.value
         self.GLOBAL_RETURN = None
@@ -278,9 +415,9 @@ class Interpreter(NodeVisitor):
             var_symbol = VarSymbol(variable.value, var_type, None)
             if self.current_scope.lookup(variable.value, current_scope_only=True):
                 raise Exception(
-                    "Error: Duplicate identifier '%s' found" % var_name
+                    "Error: Duplicate identifier '%s' found%s" % (variable.value, self.location(variable))
                 )
-            self.current_scope.insert(var_symbol)
+            self.declare(var_symbol)
 
 
     def visit_Return(self, node):
@@ -302,7 +439,7 @@ class Interpreter(NodeVisitor):
         var_symbol = self.current_scope.lookup(var_name)
         if var_symbol is None:
             raise Exception(
-                "Error: Symbol not found '%s'" % var_name
+                "Error: Symbol not found '%s'%s" % (var_name, self.location(node.token))
             )
         return VarSymbol(None, var_symbol.type.name, var_symbol.value)
 
@@ -335,13 +472,64 @@ class Interpreter(NodeVisitor):
     def visit_NoOp(self, node):
         pass
 
+    def visit_SharedExpression(self, node):
+        try:
+            return self.shared[node.slot]
+        except KeyError:
+            value = self.shared[node.slot] = self.visit(node.expression)
+            return value
+
+    def visit_SharingRegion(self, node):
+        # values computed by the region which is being run in a caller are kept
+        shared = self.shared
+        saved = [(slot, shared.pop(slot)) for slot in node.slots if slot in shared]
+        self.visit(node.statement)
+        for slot in node.slots:
+            shared.pop(slot, None)
+        shared.update(saved)
+
     def interpret(self):
         tree = self.parser.parse()
 
-        return self.visit(tree)
+        result = self.visit(tree)
+        self.memos.print_report()
+        return result
+
+    def start(self):
+        """
+        Run the program like interpret(), but keep its global scope, so the host can call() its
+        functions, until finish().
+        """
+        self.enter_program(self.parser.parse())
+
+    def call(self, name, *values):
+        """
+        Call function of the started program with the values as arguments, see HostCall, and
+        return the value it returned, None when it returned none.
+        """
+        call = host_call(self.host_calls, name, len(values))
+        scope = self.current_scope = call.enter(self.scopes, self.global_scope, values)
+        value = self.host_value(call.node)
+        self.current_scope = self.leave_scope(scope)
+        return value
+
+    def host_value(self, node):
+        """
+        Return value returned by the function the FunctionCall node of HostCall calls.
+        """
+        self.GLOBAL_RETURN = None
+        result = self.visit(node)
+        return result.value if result is not None else None
+
+    def finish(self):
+        """
+        Leave the global scope of the started program, printing it as interpret() does.
+        """
+        self.leave_program()
+        self.memos.print_report()
 
 
-def main(path):
+def main(path, lexer_engine='regex'):
     # text = input("> ")
     # lexer = Lexer(text)
     # parser = Parser(lexer)
@@ -350,10 +538,7 @@ def main(path):
     # print(interpreter.global_scope)
 
     with open(path, 'r') as f:
-        text = ""
-        for line in f:
-            text += line.strip()
-        lexer = Lexer(text)
+        lexer = make_lexer(f, lexer_engine)
         parser = Parser(lexer)
         int = Interpreter(parser)
         int.interpret()
@@ -0,0 +1,96 @@
+import math
+import numbers
+
+from audioscript.lexer.Lexer import get_tokens
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+globals().update(get_tokens())
+
+# Class of array values; arithmetic which gives one has type ARRAY, whatever the type of its left operand.
+# None without NumPy, when no value is an array.
+ndarray = numpy.ndarray if numpy is not None else None
+# operator token type -> NumPy function computing arithmetic in floats, given dtype=float
+if numpy is not None:
+    FLOAT_OPERATIONS = {PLUS: numpy.add, MINUS: numpy.subtract, MUL: numpy.multiply, DIV: numpy.true_divide}
+    FLOAT_UNARY_OPERATIONS = {PLUS: numpy.positive, MINUS: numpy.negative}
+# kinds of the arrays of whole numbers: booleans, signed and unsigned integers
+WHOLE_KINDS = frozenset('biu')
+
+
+def type_name(value):
+    """
+    Return type name Interpreter gives the value when nothing else is known about it.
+    """
+    if value.__class__ is ndarray:
+        return 'ARRAY'
+    if isinstance(value, str):
+        return 'STRING'
+    return 'NUMBER'
+
+
+def floating(value, op, *operands):
+    """
+    Return value, the array the arithmetic operator gave for the operands, computed again in floats
+    when it holds whole numbers: arithmetic on arrays of whole numbers, e.g. samples read from PCM
+    files, wraps around on overflow, while numbers never overflow.
+    :param op: Token type of the operator.
+    :param operands: Both operands, or the only one of unary operator.
+    """
+    if value.dtype.kind not in WHOLE_KINDS:
+        return value
+    operations = FLOAT_OPERATIONS if len(operands) == 2 else FLOAT_UNARY_OPERATIONS
+    return operations[op](*operands, dtype=float)
+
+
+def make_array(values, location):
+    """
+    Return new array of the values of the elements of an array literal.
+    :param location: Function returning location of the literal, for error messages.
+    """
+    if numpy is None:
+        raise Exception("Error: Arrays need NumPy, which is not installed" + location())
+    for value in values:
+        # strings are numbers for NumPy
+        if not isinstance(value, numbers.Real):
+            raise TypeError("TypeError: Expected {} and got {}".format('NUMBER', type_name(value)) + location())
+    return numpy.array(values, dtype=float)
+
+
+def position(array, index, location):
+    """
+    Return index of element of the array given by number, which must be whole; negative ones count from the end.
+    """
+    if not isinstance(index, numbers.Real):
+        raise TypeError("TypeError: Expected whole NUMBER index and got {}".format(type_name(index)) + location())
+    if not math.isfinite(index):
+        raise IndexError("IndexError: Index {} out of array of {} elements".format(index, len(array)) + location())
+    if index != int(index):
+        raise TypeError("TypeError: Expected whole NUMBER index and got {}".format(index) + location())
+    return int(index)
+
+
+def element(array, index, location):
+    """
+    Return value of the element of the array, as a number.
+    """
+    if array.__class__ is not ndarray:
+        raise TypeError("TypeError: Expected {} and got {}".format('ARRAY', type_name(array)) + location())
+    try:
+        return array.item(position(array, index, location))
+    except IndexError:
+        raise IndexError("IndexError: Index {} out of array of {} elements".format(index, len(array)) + location())
+
+
+def part(array, start, end, location):
+    """
+    Return the elements of the array from start up to end, which are left out when None. The part
+    shares the elements with the array, nothing is copied.
+    """
+    if array.__class__ is not ndarray:
+        raise TypeError("TypeError: Expected {} and got {}".format('ARRAY', type_name(array)) + location())
+    return array[None if start is None else position(array, start, location):
+                 None if end is None else position(array, end, location)]
@@ -0,0 +1,474 @@
+from array import array
+
+from audioscript.interpreter.Interpreter import NodeVisitor
+from audioscript.interpreter.arrays import ndarray
+from audioscript.interpreter.scopes import scoped_blocks
+from audioscript.lexer.Lexer import get_tokens
+from audioscript.pars.Parser import FunctionCall, NoOp, Var
+
+globals().update(get_tokens())
+
+# Instruction set. Every instruction is two words in CodeObject.code: opcode and its argument
+# (0 when unused). Jump targets are indexes into code.
+OPNAMES = (
+    'LOAD_NAME',           # push value of names[arg]
+    'LOAD_CONST',          # push constants[arg]
+    'LOAD_NAME_TYPED',     # push type name and value of names[arg]
+    'STORE_NAME',          # pop type name and value, check and assign them to names[arg]
+    'BINARY_ADD',
+    'BINARY_SUBTRACT',
+    'BINARY_MULTIPLY',
+    'BINARY_DIVIDE',
+    'UNARY_MINUS',
+    'UNARY_PLUS',
+    'COMPARE_EQ',
+    'COMPARE_NE',
+    'COMPARE_LT',
+    'COMPARE_GT',
+    'COMPARE_LE',
+    'COMPARE_GE',
+    'LOGICAL_AND',         # both operands are evaluated, as in Interpreter
+    'LOGICAL_OR',
+    'POP_JUMP_IF_FALSE',
+    'JUMP',
+    'POP_TOP',
+    'CALL',                # call constants[arg] (CallSite), push returned value
+    'CALL_TYPED',          # call constants[arg] (CallSite), push returned type name and value
+    'CALL_STATEMENT',      # call constants[arg] (CallSite), drop returned value
+    'TAIL_CALL',           # like CALL_TYPED before RETURN, a user function returns to the caller at once
+    'CHECK_RETURN',        # fail when return is not in a function, before its value is computed
+    'RETURN',              # pop type name and value and return them from the function
+    'END_FUNCTION',        # return from function which did not execute return statement
+    'ENTER_BLOCK',
+    'LEAVE_BLOCK',
+    'DECLARE_VARS',        # declare variables of constants[arg] (VariablesDeclaration)
+    'DEFINE_FUNCTION',     # define function constants[arg] (FunctionDefinition)
+    'DECLARE_TYPE',        # declare external type named constants[arg]
+    'BIND_EXTERNAL',       # bind external function constants[arg] (ExternalBinding)
+    'LOAD_SHARED',         # push value of constants[arg] (SharedValue) and jump past it, when it was computed
+    'STORE_SHARED',        # keep value of constants[arg] (SharedValue) computed on top of the stack
+    'CLEAR_SHARED',        # forget values of the slots constants[arg] (tuple)
+    'BUILD_ARRAY',         # pop values of the elements of constants[arg] (ArrayOperation), push new array
+    'BINARY_SUBSCRIPT',    # pop index and array, push the element
+    'BINARY_SLICE',        # pop end, start and array, push the part of the array
+    'ARRAY_TYPE',          # replace type name under the value by ARRAY when the value is an array
+    'HALT',
+)
+OPCODES = {name: code for code, name in enumerate(OPNAMES)}
+globals().update(OPCODES)
+
+# Instructions whose argument indexes constants, names or code.
+CONSTANT_ARGUMENTS = frozenset((LOAD_CONST, CALL, CALL_TYPED, CALL_STATEMENT, TAIL_CALL, DECLARE_VARS, DEFINE_FUNCTION,
+                                DECLARE_TYPE, BIND_EXTERNAL, LOAD_SHARED, STORE_SHARED, CLEAR_SHARED, BUILD_ARRAY,
+                                BINARY_SUBSCRIPT, BINARY_SLICE))
+NAME_ARGUMENTS = frozenset((LOAD_NAME, LOAD_NAME_TYPED, STORE_NAME))
+JUMP_ARGUMENTS = frozenset((POP_JUMP_IF_FALSE, JUMP))
+
+ARITHMETIC_INSTRUCTIONS = {PLUS: BINARY_ADD, MINUS: BINARY_SUBTRACT, MUL: BINARY_MULTIPLY, DIV: BINARY_DIVIDE}
+CONDITION_INSTRUCTIONS = {EQ: COMPARE_EQ, NEQ: COMPARE_NE, LT: COMPARE_LT, MT: COMPARE_GT, LEQT: COMPARE_LE,
+                          MEQT: COMPARE_GE, AND: LOGICAL_AND, OR: LOGICAL_OR}
+# Nodes which are statements on their own; value of other nodes is popped when used as a statement.
+STATEMENT_NODES = frozenset(('StatList', 'BlockStat', 'If', 'While', 'Return', 'Assign', 'VarDeclaration',
+                             'FunctionDeclaration', 'NoOp', 'SharingRegion'))
+
+
+class CodeObject(object):
+    """
+    Compiled code of the program or of a function body.
+    """
+    def __init__(self, name):
+        """
+        :param name: Name of the function or '<program>'.
+        """
+        self.name = name
+        self.code = array('i')
+        self.constants = []
+        # name referenced by instruction and token of the reference, for error messages
+        self.names = []
+        self.tokens = []
+        self._constant_indexes = {}
+
+    def emit(self, opcode, argument=0):
+        """
+        Append instruction and return its index.
+        """
+        index = len(self.code)
+        self.code.append(opcode)
+        self.code.append(argument)
+        return index
+
+    def patch(self, index, target):
+        """
+        Set argument of the jump at index.
+        """
+        self.code[index + 1] = target
+
+    def add_constant(self, value):
+        """
+        Return index of the value in the constant pool, numbers and strings are stored once.
+        """
+        if isinstance(value, (int, float, str)):
+            key = (type(value), value)
+            if key not in self._constant_indexes:
+                self._constant_indexes[key] = len(self.constants)
+                self.constants.append(value)
+            return self._constant_indexes[key]
+        self.constants.append(value)
+        return len(self.constants) - 1
+
+    def add_name(self, name, token):
+        self.names.append(name)
+        self.tokens.append(token)
+        return len(self.names) - 1
+
+
+class CallSite(object):
+    """
+    Constant describing function call: called name, its token and, for every argument, whether
+    it is a variable, which external function calls need to check the arguments.
+    """
+    __slots__ = ('name', 'token', 'variables')
+
+    def __init__(self, name, token, variables):
+        self.name = name
+        self.token = token
+        self.variables = variables
+
+    def __repr__(self):
+        return '<call {}/{}>'.format(self.name, len(self.variables))
+
+
+class FunctionDefinition(object):
+    """
+    Constant describing user function: name token, parameter names, compiled body and whether
+    it was defined pure.
+    """
+    __slots__ = ('name', 'arguments', 'code', 'pure')
+
+    def __init__(self, name, arguments, code, pure=False):
+        self.name = name
+        self.arguments = arguments
+        self.code = code
+        self.pure = pure
+
+    def __repr__(self):
+        return '<{}function {}({})>'.format('pure ' if self.pure else '', self.name.value, ', '.join(self.arguments))
+
+
+class VariablesDeclaration(object):
+    """
+    Constant describing declaration of variables: type name and tokens of the names.
+    """
+    __slots__ = ('type', 'names')
+
+    def __init__(self, type, names):
+        self.type = type
+        self.names = names
+
+    def __repr__(self):
+        return '<var {} {}>'.format(self.type, ', '.join(name.value for name in self.names))
+
+
+class ExternalBinding(object):
+    """
+    Constant describing external function of a declared module.
+    """
+    __slots__ = ('module', 'name', 'return_type', 'arguments_types', 'pure')
+
+    def __init__(self, module, name, return_type, arguments_types, pure=False):
+        self.module = module
+        self.name = name
+        self.return_type = return_type
+        self.arguments_types = arguments_types
+        self.pure = pure
+
+    def __repr__(self):
+        return '<{}external {}.{}>'.format('pure ' if self.pure else '', self.module, self.name)
+
+
+class SharedValue(object):
+    """
+    Constant describing SharedExpression: its slot, whether the type name is pushed under the
+    value and index of the instruction after the code computing it.
+    """
+    __slots__ = ('slot', 'typed', 'end')
+
+    def __init__(self, slot, typed, end=None):
+        self.slot = slot
+        self.typed = typed
+        self.end = end
+
+    def __repr__(self):
+        return '<shared {}{} to {}>'.format(self.slot, ' typed' if self.typed else '', self.end)
+
+
+class ArrayOperation(object):
+    """
+    Constant describing array literal, index or slice: token of its bracket, for error messages,
+    and number of the values it takes from the stack.
+    """
+    __slots__ = ('token', 'count')
+
+    def __init__(self, token, count):
+        self.token = token
+        self.count = count
+
+    def __repr__(self):
+        return '<array operation of {}>'.format(self.count)
+
+
+class BytecodeCompiler(NodeVisitor):
+    """
+    Compiles program tree into CodeObjects. Expressions leave their value on the stack; typed()
+    compiles expressions leaving type name under the value, for the places where types are checked.
+    """
+    def __init__(self):
+        self.code = None
+        # BlockStat nodes which need scope of their own, the others run in the enclosing scope
+        self.scoped = frozenset()
+
+    def compile(self, tree):
+        """
+        Return CodeObject of the program.
+        """
+        self.code = CodeObject('<program>')
+        self.scoped = scoped_blocks(tree)
+        self.visit(tree)
+        self.code.emit(HALT)
+        return self.code
+
+    def compile_statement(self, node):
+        """
+        Return CodeObject running the statement alone, e.g. call of a function by the host.
+        """
+        self.code = CodeObject('<statement>')
+        self.statement(node)
+        self.code.emit(HALT)
+        return self.code
+
+    def statement(self, node):
+        if isinstance(node, FunctionCall):
+            # function which did not return any has no value to pop
+            self.typed_FunctionCall(node, CALL_STATEMENT)
+            return
+        self.visit(node)
+        if type(node).__name__ not in STATEMENT_NODES:
+            self.code.emit(POP_TOP)
+
+    def typed(self, node):
+        typed = getattr(self, 'typed_' + type(node).__name__, None)
+        if typed is None:
+            # assignment or declaration, which have no value
+            self.visit(node)
+            none = self.code.add_constant(None)
+            self.code.emit(LOAD_CONST, none)
+            self.code.emit(LOAD_CONST, none)
+        else:
+            typed(node)
+
+    def visit_Program(self, node):
+        if node.declarations is not None:
+            self.visit(node.declarations)
+        if node.code is not None:
+            self.statement(node.code)
+
+    def visit_Declarations(self, node):
+        for ext_type in node.types:
+            self.visit(ext_type)
+        for module in node.modules:
+            self.visit(module)
+
+    def visit_DeclaredType(self, node):
+        self.code.emit(DECLARE_TYPE, self.code.add_constant(node.name))
+
+    def visit_ModuleDeclaration(self, node):
+        for function in node.functions:
+            binding = ExternalBinding(node.name, function.name, function.return_type, function.arguments_types,
+                                      function.pure)
+            self.code.emit(BIND_EXTERNAL, self.code.add_constant(binding))
+
+    def visit_BlockStat(self, node):
+        if node not in self.scoped:
+            self.statement(node.list)
+            return
+        self.code.emit(ENTER_BLOCK)
+        self.statement(node.list)
+        self.code.emit(LEAVE_BLOCK)
+
+    def visit_StatList(self, node):
+        for statement in node.statements:
+            if not isinstance(statement, NoOp):
+                self.statement(statement)
+
+    def visit_FunctionDeclaration(self, node):
+        outer = self.code
+        self.code = CodeObject(node.name.value)
+        self.statement(node.body)
+        self.code.emit(END_FUNCTION)
+        definition = FunctionDefinition(node.name, node.arguments, self.code, node.pure)
+        self.code = outer
+        self.code.emit(DEFINE_FUNCTION, self.code.add_constant(definition))
+
+    def typed_FunctionCall(self, node, opcode=CALL_TYPED):
+        for arg in node.args:
+            self.typed(arg)
+        site = CallSite(node.function.value, node.function.token, tuple(isinstance(arg, Var) for arg in node.args))
+        self.code.emit(opcode, self.code.add_constant(site))
+
+    def visit_FunctionCall(self, node):
+        self.typed_FunctionCall(node, CALL)
+
+    def typed_BinOp(self, node):
+        self.typed(node.left)
+        self.visit(node.right)
+        self.code.emit(ARITHMETIC_INSTRUCTIONS[node.op.type])
+        if ndarray is not None:
+            self.code.emit(ARRAY_TYPE)
+
+    def visit_BinOp(self, node):
+        self.visit(node.left)
+        self.visit(node.right)
+        self.code.emit(ARITHMETIC_INSTRUCTIONS[node.op.type])
+
+    def typed_Num(self, node):
+        self.code.emit(LOAD_CONST, self.code.add_constant('NUMBER'))
+        self.visit(node)
+
+    def visit_Num(self, node):
+        self.code.emit(LOAD_CONST, self.code.add_constant(node.value))
+
+    def typed_String(self, node):
+        self.code.emit(LOAD_CONST, self.code.add_constant('STRING'))
+        self.visit(node)
+
+    visit_String = visit_Num
+
+    def typed_UnaryOp(self, node):
+        self.code.emit(LOAD_CONST, self.code.add_constant('NUMBER'))
+        self.visit(node)
+        if ndarray is not None:
+            self.code.emit(ARRAY_TYPE)
+
+    def visit_UnaryOp(self, node):
+        self.visit(node.value)
+        self.code.emit(UNARY_MINUS if node.op.type == MINUS else UNARY_PLUS)
+
+    def typed_ArrayLiteral(self, node):
+        self.code.emit(LOAD_CONST, self.code.add_constant('ARRAY'))
+        self.visit(node)
+
+    def visit_ArrayLiteral(self, node):
+        for element in node.elements:
+            self.visit(element)
+        self.code.emit(BUILD_ARRAY, self.code.add_constant(ArrayOperation(node.token, len(node.elements))))
+
+    def typed_Index(self, node):
+        self.code.emit(LOAD_CONST, self.code.add_constant('NUMBER'))
+        self.visit(node)
+
+    def visit_Index(self, node):
+        self.visit(node.value)
+        self.visit(node.index)
+        self.code.emit(BINARY_SUBSCRIPT, self.code.add_constant(ArrayOperation(node.token, 2)))
+
+    def typed_Slice(self, node):
+        self.code.emit(LOAD_CONST, self.code.add_constant('ARRAY'))
+        self.visit(node)
+
+    def visit_Slice(self, node):
+        self.visit(node.value)
+        for bound in (node.start, node.end):
+            if bound is None:
+                self.code.emit(LOAD_CONST, self.code.add_constant(None))
+            else:
+                self.visit(bound)
+        self.code.emit(BINARY_SLICE, self.code.add_constant(ArrayOperation(node.token, 3)))
+
+    def visit_If(self, node):
+        self.visit(node.cond)
+        jump = self.code.emit(POP_JUMP_IF_FALSE)
+        self.statement(node.block)
+        self.code.patch(jump, len(self.code.code))
+
+    def visit_While(self, node):
+        start = len(self.code.code)
+        self.visit(node.cond)
+        jump = self.code.emit(POP_JUMP_IF_FALSE)
+        self.statement(node.block)
+        self.code.emit(JUMP, start)
+        self.code.patch(jump, len(self.code.code))
+
+    def visit_Assign(self, node):
+        self.typed(node.right)
+        self.code.emit(STORE_NAME, self.code.add_name(node.left.value, node.left.token))
+
+    def visit_VarDeclaration(self, node):
+        declaration = VariablesDeclaration(node.type.value, node.names)
+        self.code.emit(DECLARE_VARS, self.code.add_constant(declaration))
+
+    def visit_Return(self, node):
+        self.code.emit(CHECK_RETURN)
+        if isinstance(node.value, FunctionCall):
+            self.typed_FunctionCall(node.value, TAIL_CALL)
+        else:
+            self.typed(node.value)
+        self.code.emit(RETURN)
+
+    def typed_Var(self, node):
+        self.code.emit(LOAD_NAME_TYPED, self.code.add_name(node.value, node.token))
+
+    def visit_Var(self, node):
+        self.code.emit(LOAD_NAME, self.code.add_name(node.value, node.token))
+
+    def visit_ConditionalVal(self, node):
+        self.visit(node.left)
+        self.visit(node.right)
+        self.code.emit(CONDITION_INSTRUCTIONS[node.op.type])
+
+    def visit_NoOp(self, node):
+        pass
+
+    def typed_SharedExpression(self, node, typed=True):
+        # the type name is computed and kept also when only the value is used here
+        shared = SharedValue(node.slot, typed)
+        constant = self.code.add_constant(shared)
+        self.code.emit(LOAD_SHARED, constant)
+        self.typed(node.expression)
+        self.code.emit(STORE_SHARED, constant)
+        shared.end = len(self.code.code)
+
+    def visit_SharedExpression(self, node):
+        self.typed_SharedExpression(node, False)
+
+    def visit_SharingRegion(self, node):
+        self.code.emit(CLEAR_SHARED, self.code.add_constant(tuple(node.slots)))
+        self.statement(node.statement)
+
+
+def disassemble(code_object):
+    """
+    Return readable listing of the code object and of the functions defined in it.
+    """
+    lines = ['code {}:'.format(code_object.name)]
+    functions = []
+    code = code_object.code
+    targets = {code[index + 1] for index in range(0, len(code), 2) if code[index] in JUMP_ARGUMENTS}
+    for index in range(0, len(code), 2):
+        opcode, argument = code[index], code[index + 1]
+        if opcode in CONSTANT_ARGUMENTS:
+            constant = code_object.constants[argument]
+            detail = '{} ({!r})'.format(argument, constant)
+            if isinstance(constant, FunctionDefinition):
+                functions.append(constant.code)
+        elif opcode in NAME_ARGUMENTS:
+            detail = '{} ({})'.format(argument, code_object.names[argument])
+        elif opcode in JUMP_ARGUMENTS:
+            detail = 'to {}'.format(argument)
+        else:
+            detail = ''
+        marker = '>>' if index in targets else '  '
+        lines.append('{} {:5} {:<18} {}'.format(marker, index, OPNAMES[opcode], detail).rstrip())
+    for function in functions:
+        lines.append('')
+        lines.append(disassemble(function))
+    return '\n'.join(lines)
@@ -0,0 +1,618 @@
+import functools
+import operator
+
+from audioscript.interpreter.Interpreter import NodeVisitor
+from audioscript.interpreter.arrays import element, floating, make_array, ndarray, part
+from audioscript.interpreter.externals import ExternalTable
+from audioscript.interpreter.host import host_call
+from audioscript.interpreter.memo import MEMO_SIZE, MISSING, Memos
+from audioscript.interpreter.resolver import Resolution, Resolver
+from audioscript.interpreter.scopes import scoped_blocks
+from audioscript.interpreter.type_checker import TypeCheck, TypeChecker
+from audioscript.lexer.Lexer import get_tokens
+from audioscript.pars.Parser import NoOp, Var
+from interpreter.symbol_table import (ScopedSymbolTable, ScopePool, VarSymbol, FunctionSymbol, BuiltinTypeSymbol,
+                                      ExternalFunctionSymbol)
+
+globals().update(get_tokens())
+
+ARITHMETIC_OPERATIONS = {PLUS: operator.add, MINUS: operator.sub, MUL: operator.mul, DIV: operator.truediv}
+RELATIONAL_OPERATIONS = {EQ: operator.eq, NEQ: operator.ne, LT: operator.lt, MT: operator.gt,
+                         LEQT: operator.le, MEQT: operator.ge}
+# Nodes which are statements on their own; other nodes are expressions and their value is dropped.
+STATEMENT_NODES = frozenset(('StatList', 'BlockStat', 'If', 'While', 'Return', 'Assign', 'VarDeclaration',
+                             'FunctionDeclaration', 'NoOp', 'SharingRegion'))
+
+
+def nothing(scope):
+    pass
+
+
+class ClosureInterpreter(NodeVisitor):
+    """
+    Execution engine which compiles the tree once into nested closures and then runs them,
+    so nodes are not dispatched and values are not boxed in VarSymbols while the program runs.
+
+    Every closure takes the current scope. Statement closures return True when a return statement
+    was executed. Expression closures made by visit() return value of the expression and the ones
+    made by typed() return (type name, value) pairs, used where the type is checked.
+    Scopes, symbols and error messages are the same as in Interpreter.
+
+    References resolved by the Resolver read the symbol from the frame of the program or of the
+    function call, the others are looked up by name. Assignments and external function calls
+    which the TypeChecker proved type-safe are compiled without the type checks.
+    """
+    def __init__(self, parser, resolve=True, check_types=True, memo_size=MEMO_SIZE):
+        """
+        :param resolve: Whether to resolve references to frame slots before compiling.
+        :param check_types: Whether to check types before compiling, to skip checks proven to pass.
+        :param memo_size: Number of results of every pure function kept, 0 turns memoization off.
+        """
+        self.parser = parser
+        self.resolve = resolve
+        self.check_types = check_types
+        self.resolution = Resolution()
+        self.checks = TypeCheck()
+        self.global_scope = None
+        # BlockStat nodes which need scope of their own, the others run in the enclosing scope
+        self.scoped = frozenset()
+        self.scopes = ScopePool()
+        # external functions bound from modules declared in Declarations
+        self.externals = ExternalTable()
+        # (type name, value) returned by the last return statement, like Interpreter.GLOBAL_RETURN
+        self.returned = None
+        # slot -> (type name, value) of SharedExpression computed in the SharingRegions being run
+        self.shared = {}
+        self.memos = Memos(memo_size)
+        # (function name, number of arguments) -> HostCall
+        self.host_calls = {}
+
+    def location(self, token):
+        """
+        Return position of the token in the source for error messages.
+        """
+        offset = getattr(token, 'offset', None)
+        if offset is None:
+            return ''
+        return ' at ' + self.parser.describe_location(offset)
+
+    def locate(self, node):
+        """
+        Return function finding symbol of the referenced name in the scope, None when not found.
+        """
+        name = node.value
+        slot = self.resolution.references.get(node)
+        if slot is None:
+            return functools.partial(ScopedSymbolTable.lookup, name=name)
+        # slot of the parameter which was not passed is empty, then the name is looked up
+        return lambda scope: scope.frame[slot] or scope.lookup(name)
+
+    def statement(self, node):
+        """
+        Compile node whose value, if any, is not used.
+        """
+        if type(node).__name__ in STATEMENT_NODES:
+            return self.visit(node)
+        # typed, so that calls of functions which did not return any do not fail
+        expression = self.typed(node)
+
+        def run(scope):
+            expression(scope)
+        return run
+
+    def typed(self, node):
+        """
+        Compile expression into closure returning (type name, value) of the expression.
+        Nodes without value (assignment, declaration) compile to closures returning None.
+        """
+        typed = getattr(self, 'typed_' + type(node).__name__, None)
+        if typed is None:
+            return self.visit(node)
+        return typed(node)
+
+    def visit_Program(self, node):
+        """
+        program = declarations, statement-list ;
+        """
+        self.scoped = scoped_blocks(node)
+        declarations = self.visit(node.declarations) if node.declarations is not None else nothing
+        code = self.statement(node.code) if node.code is not None else nothing
+        size = self.resolution.sizes.get(node, 0)
+
+        def run():
+            print('ENTER scope: global')
+            self.global_scope = ScopedSymbolTable(
+                scope_name='global',
+                scope_level=1,
+                enclosing_scope=None,
+                frame=[None] * size,
+            )
+            self.global_scope._init_builtins()
+            declarations(self.global_scope)
+            code(self.global_scope)
+        return run
+
+    def visit_Declarations(self, node):
+        declarations = [self.visit(ext_type) for ext_type in node.types]
+        declarations.extend(self.visit(module) for module in node.modules)
+
+        def run(scope):
+            for declaration in declarations:
+                declaration(scope)
+        return run
+
+    def visit_DeclaredType(self, node):
+        name = node.name
+
+        def run(scope):
+            if name != 'STRING' and name != 'NUMBER':
+                scope.insert(BuiltinTypeSymbol(name))
+        return run
+
+    def visit_ModuleDeclaration(self, node):
+        functions = [self.external_declaration(node.name, function) for function in node.functions]
+
+        def run(scope):
+            for declaration in functions:
+                declaration(scope)
+        return run
+
+    def external_declaration(self, module_name, node):
+        """
+        Compile declaration of external function of the module, bound in the table of external functions.
+        """
+        function_name = node.name
+        return_type_name = node.return_type
+        args_types = node.arguments_types
+        slot = self.resolution.slots.get(node)
+        memo = self.memos.memo(node, function_name, node.pure)
+
+        def run(scope):
+            if return_type_name is not None:
+                return_type = scope.lookup(return_type_name)
+            else:
+                return_type = BuiltinTypeSymbol("NULL")
+
+            args_symbols = []
+            for arg_type in args_types:
+                arg_sym = scope.lookup(arg_type)
+                if arg_sym is None:
+                    raise TypeError(
+                        "Type \"{}\" was not declared and is being used in function \"{}\" declaration".format(
+                            arg_type, function_name)
+                    )
+                args_symbols.append(arg_sym)
+
+            external = self.externals.bind(module_name, function_name, [arg.name for arg in args_symbols], memo)
+            scope.insert(ExternalFunctionSymbol(function_name, args_symbols, return_type, memo, external), slot)
+        return run
+
+    def visit_BlockStat(self, node):
+        body = self.statement(node.list)
+        if node not in self.scoped:
+            return body
+        scopes = self.scopes
+
+        def run(scope):
+            block_scope = scopes.enter("block", scope, scope.frame)
+            returned = body(block_scope)
+            scopes.leave(block_scope)
+            return returned
+        return run
+
+    def visit_StatList(self, node):
+        """
+        statement-list = {statement}* ;
+        """
+        statements = [self.statement(statement) for statement in node.statements if not isinstance(statement, NoOp)]
+        if not statements:
+            return nothing
+        if len(statements) == 1:
+            return statements[0]
+
+        def run(scope):
+            for statement in statements:
+                # rest of the function body is skipped after return
+                if statement(scope):
+                    return True
+        return run
+
+    def visit_FunctionDeclaration(self, node):
+        name = node.name
+        args = node.arguments
+        body = self.statement(node.body)
+        slot = self.resolution.slots.get(node)
+        frame_size = self.resolution.sizes.get(node, len(args))
+        memo = self.memos.memo(node, name.value, node.pure)
+
+        def run(scope):
+            # compiled body is kept in place of the body node
+            func_symbol = FunctionSymbol(name.value, body, args, frame_size, memo)
+            if scope.lookup(name.value, current_scope_only=True):
+                raise Exception(
+                    "Error: Duplicate identifier '%s' found%s" % (name.value, self.location(name))
+                )
+            scope.insert(func_symbol, slot)
+        return run
+
+    def external_call(self, node):
+        """
+        Compile call of external function whose arguments are proven to pass the checks
+        into closure returning value of the call.
+        """
+        function = node.function
+        name = function.value
+        args = [self.visit(arg) for arg in node.args]
+        find = self.locate(function)
+
+        def run(scope):
+            func_symbol = find(scope)
+            if func_symbol is None:
+                raise Exception(
+                    "Error: Unidentified function \"%s\"%s" % (name, self.location(function.token))
+                )
+            return func_symbol.external(*[arg(scope) for arg in args])
+        return run
+
+    def typed_FunctionCall(self, node):
+        return_type = self.checks.calls.get(node)
+        if return_type is not None:
+            call = self.external_call(node)
+            return lambda scope: (return_type, call(scope))
+
+        function = node.function
+        name = function.value
+        variables = tuple(isinstance(arg, Var) for arg in node.args)
+        args = [self.typed(arg) for arg in node.args]
+        find = self.locate(function)
+        location = lambda: self.location(function.token)
+
+        def run(scope):
+            func_symbol = find(scope)
+            if func_symbol is None:
+                raise Exception(
+                    "Error: Unidentified function \"%s\"%s" % (name, self.location(function.token))
+                )
+
+            values = [arg(scope) for arg in args]
+
+            if isinstance(func_symbol, ExternalFunctionSymbol):
+                call = func_symbol.external.caller(variables)
+                return func_symbol.return_type.name, call([v[0] for v in values], [v[1] for v in values], location)
+
+            memo = func_symbol.memo
+            key = memo.key([value[1] for value in values]) if memo is not None else None
+            if key is not None:
+                returned = memo.get(key)
+                if returned is not MISSING:
+                    self.returned = returned
+                    return returned
+
+            function_scope = self.scopes.enter("function", scope, [None] * func_symbol.frame_size)
+            var_type = function_scope.lookup('VAR')
+            for slot, (arg_name, value) in enumerate(zip(func_symbol.arguments, values)):
+                # parameters given arrays are arrays, the others are var
+                arg_type = var_type if value[1].__class__ is not ndarray else function_scope.lookup('ARRAY')
+                function_scope.insert(VarSymbol(arg_name, arg_type, value[1]), slot)
+
+            # only results of return statements are kept, without one the call has no result of its own
+            if func_symbol.body(function_scope) and key is not None:
+                memo.put(key, self.returned)
+            self.scopes.leave(function_scope)
+            return self.returned
+        return run
+
+    def visit_FunctionCall(self, node):
+        if node in self.checks.calls:
+            return self.external_call(node)
+        call = self.typed_FunctionCall(node)
+
+        def run(scope):
+            return call(scope)[1]
+        return run
+
+    def typed_BinOp(self, node):
+        left = self.typed(node.left)
+        right = self.visit(node.right)
+        op = node.op.type
+        operation = ARITHMETIC_OPERATIONS[op]
+
+        def run(scope):
+            left_type, left_value = left(scope)
+            right_value = right(scope)
+            value = operation(left_value, right_value)
+            if value.__class__ is ndarray:
+                # arithmetic with an array is done on all the elements at once and gives array
+                return 'ARRAY', floating(value, op, left_value, right_value)
+            return left_type, value
+        return run
+
+    def visit_BinOp(self, node):
+        left = self.visit(node.left)
+        right = self.visit(node.right)
+        op = node.op.type
+        operation = ARITHMETIC_OPERATIONS[op]
+
+        def run(scope):
+            left_value = left(scope)
+            right_value = right(scope)
+            value = operation(left_value, right_value)
+            if value.__class__ is ndarray:
+                return floating(value, op, left_value, right_value)
+            return value
+        return run
+
+    def typed_Num(self, node):
+        typed_value = ('NUMBER', node.value)
+        return lambda scope: typed_value
+
+    def visit_Num(self, node):
+        value = node.value
+        return lambda scope: value
+
+    def typed_String(self, node):
+        typed_value = ('STRING', node.value)
+        return lambda scope: typed_value
+
+    visit_String = visit_Num
+
+    def typed_UnaryOp(self, node):
+        value = self.visit_UnaryOp(node)
+
+        def run(scope):
+            result = value(scope)
+            return 'ARRAY' if result.__class__ is ndarray else 'NUMBER', result
+        return run
+
+    def visit_UnaryOp(self, node):
+        value = self.visit(node.value)
+        op = node.op.type
+
+        def run(scope):
+            operand = value(scope)
+            result = -operand if op == MINUS else +operand
+            if result.__class__ is ndarray:
+                return floating(result, op, operand)
+            return result
+        return run
+
+    def typed_ArrayLiteral(self, node):
+        array = self.visit_ArrayLiteral(node)
+        return lambda scope: ('ARRAY', array(scope))
+
+    def visit_ArrayLiteral(self, node):
+        elements = [self.visit(element) for element in node.elements]
+        location = lambda: self.location(node.token)
+        return lambda scope: make_array([value(scope) for value in elements], location)
+
+    def typed_Index(self, node):
+        value = self.visit_Index(node)
+        return lambda scope: ('NUMBER', value(scope))
+
+    def visit_Index(self, node):
+        array = self.visit(node.value)
+        index = self.visit(node.index)
+        location = lambda: self.location(node.token)
+        return lambda scope: element(array(scope), index(scope), location)
+
+    def typed_Slice(self, node):
+        value = self.visit_Slice(node)
+        return lambda scope: ('ARRAY', value(scope))
+
+    def visit_Slice(self, node):
+        array = self.visit(node.value)
+        start = self.visit(node.start) if node.start is not None else lambda scope: None
+        end = self.visit(node.end) if node.end is not None else lambda scope: None
+        location = lambda: self.location(node.token)
+        return lambda scope: part(array(scope), start(scope), end(scope), location)
+
+    def visit_If(self, node):
+        cond = self.visit(node.cond)
+        block = self.statement(node.block)
+
+        def run(scope):
+            if cond(scope):
+                return block(scope)
+        return run
+
+    def visit_While(self, node):
+        cond = self.visit(node.cond)
+        block = self.statement(node.block)
+
+        def run(scope):
+            while cond(scope):
+                if block(scope):
+                    return True
+        return run
+
+    def visit_Assign(self, node):
+        variable = node.left
+        var_name = variable.value
+        find = self.locate(variable)
+        if node in self.checks.assignments:
+            value = self.visit(node.right)
+
+            def run(scope):
+                value_value = value(scope)
+
+                var_symbol = find(scope)
+                if var_symbol is None:
+                    raise Exception(
+                        "Error: Unidentified variable \"%s\"%s" % (var_name, self.location(variable.token))
+                    )
+                var_symbol.value = value_value
+                self.returned = None
+            return run
+
+        value = self.typed(node.right)
+
+        def run(scope):
+            value_type, value_value = value(scope)
+
+            var_symbol = find(scope)
+            if var_symbol is None:
+                raise Exception(
+                    "Error: Unidentified variable \"%s\"%s" % (var_name, self.location(variable.token))
+                )
+            type_name = var_symbol.type.name
+            if type_name == 'VAR' and (value_type != 'STRING' and value_type != 'NUMBER' and value_type != 'VAR'):
+                raise TypeError("TypeError: Expected {} and got {}".format('VAR', value_type)
+                                + self.location(variable.token))
+            elif type_name != 'VAR' and type_name != value_type:
+                raise TypeError("TypeError: Expected {} and got {}".format(var_symbol.type, value_type)
+                                + self.location(variable.token))
+
+            var_symbol.value = value_value
+            self.returned = None
+        return run
+
+    def visit_VarDeclaration(self, node):
+        type_name = node.type.value
+        names = node.names
+        slots = self.resolution.slots.get(node, (None,) * len(names))
+
+        def run(scope):
+            var_type = scope.lookup(type_name)
+
+            for variable, slot in zip(names, slots):
+                var_symbol = VarSymbol(variable.value, var_type, None)
+                if scope.lookup(variable.value, current_scope_only=True):
+                    raise Exception(
+                        "Error: Duplicate identifier '%s' found%s" % (variable.value, self.location(variable))
+                    )
+                scope.insert(var_symbol, slot)
+        return run
+
+    def visit_Return(self, node):
+        value = self.typed(node.value)
+
+        def run(scope):
+            if scope.scope_level == 1 or scope.enclosing_scope.scope_name != "function":
+                raise Exception(
+                    "Cannot return outside of function"
+                )
+            self.returned = value(scope)
+            return True
+        return run
+
+    def typed_Var(self, node):
+        var_name = node.value
+        find = self.locate(node)
+
+        def run(scope):
+            var_symbol = find(scope)
+            if var_symbol is None:
+                raise Exception(
+                    "Error: Symbol not found '%s'%s" % (var_name, self.location(node.token))
+                )
+            return var_symbol.type.name, var_symbol.value
+        return run
+
+    def visit_Var(self, node):
+        var_name = node.value
+        find = self.locate(node)
+
+        def run(scope):
+            var_symbol = find(scope)
+            if var_symbol is None:
+                raise Exception(
+                    "Error: Symbol not found '%s'%s" % (var_name, self.location(node.token))
+                )
+            return var_symbol.value
+        return run
+
+    def visit_ConditionalVal(self, node):
+        left = self.visit(node.left)
+        right = self.visit(node.right)
+        op = node.op.type
+
+        if op == AND:
+            def run(scope):
+                lval = left(scope)
+                rval = right(scope)
+                return lval and rval
+        elif op == OR:
+            def run(scope):
+                lval = left(scope)
+                rval = right(scope)
+                return lval or rval
+        else:
+            operation = RELATIONAL_OPERATIONS[op]
+
+            def run(scope):
+                return operation(left(scope), right(scope))
+        return run
+
+    def visit_NoOp(self, node):
+        return nothing
+
+    def typed_SharedExpression(self, node):
+        expression = self.typed(node.expression)
+        slot = node.slot
+        shared = self.shared
+
+        def run(scope):
+            try:
+                return shared[slot]
+            except KeyError:
+                value = shared[slot] = expression(scope)
+                return value
+        return run
+
+    def visit_SharedExpression(self, node):
+        shared = self.typed_SharedExpression(node)
+        return lambda scope: shared(scope)[1]
+
+    def visit_SharingRegion(self, node):
+        statement = self.statement(node.statement)
+        slots = node.slots
+        shared = self.shared
+
+        def run(scope):
+            # values computed by the region which is being run in a caller are kept
+            saved = [(slot, shared.pop(slot)) for slot in slots if slot in shared]
+            returned = statement(scope)
+            for slot in slots:
+                shared.pop(slot, None)
+            shared.update(saved)
+            return returned
+        return run
+
+    def interpret(self):
+        self.start()
+        self.finish()
+
+    def start(self):
+        """
+        Run the program like interpret(), but keep its global scope, so the host can call() its
+        functions, until finish().
+        """
+        tree = self.parser.parse()
+        if self.resolve:
+            self.resolution = Resolver().resolve(tree)
+        if self.check_types:
+            self.checks = TypeChecker(self.parser).check(tree, self.resolution if self.resolve else None)
+
+        self.visit(tree)()
+
+    def call(self, name, *values):
+        """
+        Call function of the started program with the values as arguments, see HostCall, and
+        return the value it returned, None when it returned none.
+        """
+        call = host_call(self.host_calls, name, len(values))
+        if call.compiled is None:
+            call.compiled = self.typed(call.node)
+        scope = call.enter(self.scopes, self.global_scope, values)
+        self.returned = None
+        returned = call.compiled(scope)
+        self.scopes.leave(scope)
+        return returned[1] if returned is not None else None
+
+    def finish(self):
+        """
+        Leave the global scope of the started program, printing it as interpret() does.
+        """
+        print(self.global_scope)
+        print('LEAVE scope: global')
+        self.memos.print_report()
@@ -0,0 +1,30 @@
+from audioscript.interpreter.Interpreter import Interpreter
+from audioscript.interpreter.closure_compiler import ClosureInterpreter
+from audioscript.interpreter.memo import MEMO_SIZE
+from audioscript.interpreter.transpiler import PythonInterpreter
+from audioscript.interpreter.unboxed import UnboxedInterpreter
+from audioscript.interpreter.vm import VirtualMachine
+
+# Execution engines selectable by name, all constructed from a parser and run with interpret().
+ENGINES = {
+    'tree': Interpreter,
+    'unboxed': UnboxedInterpreter,
+    'closure': ClosureInterpreter,
+    'vm': VirtualMachine,
+    'python': PythonInterpreter,
+}
+
+
+def make_interpreter(parser, engine='tree', memo_size=MEMO_SIZE):
+    """
+    Create interpreter of given engine.
+    :param parser: Parser (or CachedParser) of the program.
+    :param engine: Name of the execution engine ('tree', 'unboxed', 'closure', 'vm' or 'python').
+    :param memo_size: Number of results of every pure function kept for calls with the same
+    arguments, 0 turns memoization off.
+    """
+    try:
+        interpreter_class = ENGINES[engine]
+    except KeyError:
+        raise ValueError('Unknown execution engine "{}"'.format(engine))
+    return interpreter_class(parser, memo_size=memo_size)
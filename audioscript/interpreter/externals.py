@@ -0,0 +1,128 @@
+import importlib
+import numbers
+
+from audioscript.interpreter.arrays import ndarray, type_name
+from audioscript.interpreter.memo import memoized_call
+from audioscript.modules import BUILTIN_MODULES
+
+# Types of values, not stored in variables, accepted for arguments of declared types.
+ACCEPTED_TYPES = {
+    'NUMBER': ('NUMBER', 'VAR'),
+    'STRING': ('STRING',),
+    'VAR': ('NUMBER', 'VAR', 'STRING'),
+}
+
+
+def type_error(expected, got, location):
+    return TypeError("TypeError: Expected {} and got {}".format(expected, got) + location())
+
+
+def argument_check(index, formal, variable):
+    """
+    Return source of the check of argument of the formal type, raising TypeError when it fails.
+    :param variable: Whether the argument is a variable; numbers, strings and arrays stored in
+    variables are told apart by the value.
+    """
+    type, value = 'types[{}]'.format(index), 'values[{}]'.format(index)
+    if variable and formal == 'NUMBER':
+        return 'if not isinstance({0}, Complex): raise type_error({1!r}, type_name({0}), location)'.format(value, formal)
+    if variable and formal == 'STRING':
+        return 'if isinstance({0}, Complex) or {0}.__class__ is ndarray: raise type_error({1!r}, type_name({0}), ' \
+               'location)'.format(value, formal)
+    if variable:
+        return 'if {} != {!r}: raise type_error({!r}, {}, location)'.format(type, formal, formal, type)
+    return 'if {} not in {!r}: raise type_error({!r}, {!r} if {} == {!r} else {}, location)'.format(
+        type, ACCEPTED_TYPES.get(formal, (formal,)), formal, 'NUMBER', type, 'VAR', type)
+
+
+class ExternalFunction(object):
+    """
+    Function of a declared module bound to its declaration, calling it with arguments checked
+    against the declared types.
+    """
+    __slots__ = ('module', 'name', 'function', 'arguments_types', 'memo', 'callers')
+
+    def __init__(self, module, name, function, arguments_types, memo=None):
+        """
+        :param function: Python function the module defines.
+        :param arguments_types: Names of the declared types of the arguments.
+        :param memo: Memo of results of the function when it is pure, None otherwise.
+        """
+        self.module = module
+        self.name = name
+        self.function = function
+        self.arguments_types = arguments_types
+        self.memo = memo
+        # which arguments are variables -> caller made for them
+        self.callers = {}
+
+    def __call__(self, *arguments):
+        """
+        Call the function with arguments proven to pass the checks.
+        """
+        return memoized_call(self.function, self.memo, arguments)
+
+    def caller(self, variables):
+        """
+        Return function calling the function with types and values of the arguments and function
+        returning location of the call, for error messages.
+        :param variables: For every argument of the calls, whether it is a variable.
+        """
+        variables = tuple(variables)
+        call = self.callers.get(variables)
+        if call is None:
+            call = self.callers[variables] = self.make_caller(variables)
+        return call
+
+    def make_caller(self, variables):
+        """
+        Compile caller checking the arguments of calls whose arguments are variables as given.
+        """
+        count = min(len(self.arguments_types), len(variables))
+        lines = ['def call(types, values, location):']
+        lines.extend('    ' + argument_check(index, formal, variable)
+                     for index, (formal, variable) in enumerate(zip(self.arguments_types, variables)))
+        if self.memo is None:
+            lines.append('    return function({})'.format(', '.join('values[{}]'.format(i) for i in range(count))))
+        else:
+            lines.append('    return memoized_call(function, memo, values[:{}])'.format(count))
+        namespace = {'Complex': numbers.Complex, 'ndarray': ndarray, 'type_name': type_name, 'type_error': type_error,
+                     'memoized_call': memoized_call, 'function': self.function, 'memo': self.memo}
+        exec(compile('\n'.join(lines), '<external {}.{}>'.format(self.module, self.name), 'exec'), namespace)
+        return namespace['call']
+
+    def __repr__(self):
+        return '<external {}.{}({})>'.format(self.module, self.name, ', '.join(self.arguments_types))
+
+
+class ExternalTable(object):
+    """
+    External functions bound by an interpreter, by module and name, so functions of the same name
+    from different modules are kept apart. Every module is imported and every function looked up
+    once; modules shipped with AudioScript are imported by their short name, see BUILTIN_MODULES.
+    """
+    def __init__(self):
+        self.modules = {}
+        # (module name, function name) -> ExternalFunction bound last
+        self.functions = {}
+
+    def bind(self, module_name, function_name, arguments_types, memo=None):
+        """
+        Return ExternalFunction of the function of the module.
+        :param arguments_types: Names of the declared types of the arguments.
+        """
+        key = (module_name, function_name)
+        bound = self.functions.get(key)
+        if bound is not None and bound.arguments_types == arguments_types and bound.memo is memo:
+            return bound
+        if bound is not None:
+            function = bound.function
+        else:
+            module = self.modules.get(module_name)
+            if module is None:
+                module = self.modules[module_name] = importlib.import_module(
+                    BUILTIN_MODULES.get(module_name, module_name))
+            function = module.__getattribute__(function_name)
+        bound = self.functions[key] = ExternalFunction(module_name, function_name, function,
+                                                       list(arguments_types), memo)
+        return bound
@@ -0,0 +1,49 @@
+from audioscript.interpreter.arrays import ndarray
+from audioscript.lexer.Lexer import Token, get_tokens
+from audioscript.pars.Parser import FunctionCall, Var
+from interpreter.symbol_table import VarSymbol
+
+globals().update(get_tokens())
+
+
+class HostCall(object):
+    """
+    Call of a function of the running program by the program hosting it, e.g. Pipeline: a
+    FunctionCall node whose arguments are variables holding the values the host gives. The
+    variables are declared in a block scope entered from the global scope for every call; their
+    names cannot be written in scripts, so the program does not see them. Engines compile the
+    node once, so the call is run like the calls of the program.
+    """
+    def __init__(self, name, count):
+        """
+        :param name: Name of the function.
+        :param count: Number of the arguments.
+        """
+        self.names = ['${}'.format(index) for index in range(count)]
+        self.node = FunctionCall(Var(Token(ID, name)), [Var(Token(ID, arg_name)) for arg_name in self.names])
+        # what the engine compiled the node into, None until the first call
+        self.compiled = None
+
+    def enter(self, scopes, global_scope, values):
+        """
+        Return block scope of the call, holding the values.
+        :param scopes: ScopePool of the interpreter.
+        """
+        scope = scopes.enter("block", global_scope)
+        var_type = global_scope.lookup('VAR')
+        for name, value in zip(self.names, values):
+            # values given arrays are arrays, the others are var, like parameters
+            scope.insert(VarSymbol(name, var_type if value.__class__ is not ndarray else global_scope.lookup('ARRAY'),
+                                   value))
+        return scope
+
+
+def host_call(calls, name, count):
+    """
+    Return HostCall of the function with count arguments, made once and kept in calls.
+    :param calls: Dictionary of the HostCalls of the interpreter, by name and count.
+    """
+    call = calls.get((name, count))
+    if call is None:
+        call = calls[(name, count)] = HostCall(name, count)
+    return call
@@ -0,0 +1,115 @@
+from collections import OrderedDict
+import sys
+
+# Default number of results kept for every pure function.
+MEMO_SIZE = 256
+# Result of Memo.get when the arguments were not cached.
+MISSING = object()
+
+
+class Memo(object):
+    """
+    Results of calls of one pure function by the values of the arguments, the least recently used
+    are dropped when there are more than size of them.
+    """
+    __slots__ = ('name', 'size', 'results', 'hits', 'misses')
+
+    def __init__(self, name, size):
+        self.name = name
+        self.size = size
+        self.results = OrderedDict()
+        # number of calls which returned cached result and which called the function
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(values):
+        """
+        Return key of the argument values, None when they can not be cached. Classes of the values
+        are part of the key, so 1, 1.0 and True are different arguments.
+        """
+        key = tuple((value.__class__, value) for value in values)
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def get(self, key):
+        """
+        Return result cached for the key, MISSING when there is none.
+        """
+        result = self.results.get(key, MISSING)
+        if result is MISSING:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.results.move_to_end(key)
+        return result
+
+    def put(self, key, result):
+        results = self.results
+        results[key] = result
+        if len(results) > self.size:
+            results.popitem(last=False)
+
+
+def memoized_call(function, memo, arguments):
+    """
+    Return result of the external function called with the arguments, the one cached in the memo
+    when the function is pure and was called with the same arguments before.
+    :param memo: Memo of the function, None when it is not pure.
+    """
+    key = memo.key(arguments) if memo is not None else None
+    if key is None:
+        return function(*arguments)
+    result = memo.get(key)
+    if result is MISSING:
+        result = function(*arguments)
+        memo.put(key, result)
+    return result
+
+
+class Memos(object):
+    """
+    Memos of the pure functions of a program, by the declaration of the function: functions
+    declared again by the same declaration have the same code, so they share results.
+    """
+    def __init__(self, size=MEMO_SIZE):
+        """
+        :param size: Number of results kept for every function, 0 turns memoization off.
+        """
+        self.size = size
+        self.memos = OrderedDict()
+
+    def memo(self, declaration, name, pure):
+        """
+        Return Memo of the function, None when it is not pure or memoization is off.
+        :param declaration: Node or other object declaring the function, the same for functions
+        with the same code.
+        """
+        if not pure or not self.size:
+            return None
+        memo = self.memos.get(declaration)
+        if memo is None:
+            memo = self.memos[declaration] = Memo(name, self.size)
+        return memo
+
+    def report(self):
+        """
+        Return lines describing hits and misses of the memos of the called functions.
+        """
+        return ['{}: {} hits, {} misses, {} results cached'.format(memo.name, memo.hits, memo.misses,
+                                                                  len(memo.results))
+                for memo in self.memos.values() if memo.hits or memo.misses]
+
+    def print_report(self, file=None):
+        """
+        Print the report when pure functions were called, as interpreters do at exit.
+        :param file: File to print to, standard error by default.
+        """
+        lines = self.report()
+        if lines:
+            file = file if file is not None else sys.stderr
+            print('Memoized calls of pure functions:', file=file)
+            print('\n'.join('  ' + line for line in lines), file=file)
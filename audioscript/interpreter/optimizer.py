@@ -0,0 +1,368 @@
+from audioscript.interpreter.Interpreter import NodeVisitor
+from audioscript.interpreter.resolver import Resolver
+from audioscript.interpreter.sharing import Sharing
+from audioscript.interpreter.unboxed import ARITHMETIC_OPERATIONS, CONDITIONAL_OPERATIONS
+from audioscript.lexer.Lexer import Token, get_tokens
+from audioscript.pars.Parser import (AST, ArrayLiteral, BinOp, BlockStat, ConditionalVal, FunctionCall,
+                                     FunctionDeclaration, Index, NoOp, Num, Program, Slice, StatList, String, UnaryOp,
+                                     Var, If, While, Return, Assign)
+
+globals().update(get_tokens())
+
+# Optimization levels, given by -O of run.py.
+LEVELS = (0, 1, 2, 3)
+# Value of expressions not known before running.
+UNKNOWN = object()
+
+
+def first_offset(node):
+    """
+    Return source offset of the first token of the node which has one, None when none has.
+    """
+    token = getattr(node, 'token', None)
+    if getattr(token, 'offset', None) is not None:
+        return token.offset
+    if isinstance(node, FunctionDeclaration):
+        return node.name.offset
+    for field in node.__slots__:
+        value = getattr(node, field)
+        for child in (value if isinstance(value, list) else (value,)):
+            if isinstance(child, AST):
+                offset = first_offset(child)
+                if offset is not None:
+                    return offset
+
+
+def referenced_names(node, functions, names):
+    """
+    Add names of variables and functions referenced by the node to names; bodies of the
+    FunctionDeclaration nodes in functions are not included.
+    """
+    if isinstance(node, Var):
+        names.add(node.value)
+    elif node in functions:
+        return
+    for field in node.__slots__:
+        value = getattr(node, field)
+        for child in (value if isinstance(value, list) else (value,)):
+            if isinstance(child, AST):
+                referenced_names(child, functions, names)
+
+
+def is_number(node):
+    """
+    Return whether Interpreter gives value of the expression type NUMBER, whatever the variables hold.
+    """
+    while isinstance(node, BinOp):
+        node = node.left
+    return isinstance(node, (Num, UnaryOp))
+
+
+class Optimization(object):
+    """
+    Result of the Optimizer.
+    """
+    def __init__(self, tree, level):
+        # optimized program tree
+        self.tree = tree
+        self.level = level
+        # number of expressions replaced by their values
+        self.folded = 0
+        # number of expressions replaced by one of their operands
+        self.simplified = 0
+        # number of loop invariant expressions and of repeated expressions whose values are shared
+        self.hoisted = 0
+        self.reused = 0
+        # descriptions of the removed statements and declarations
+        self.removed = []
+
+    def report(self):
+        """
+        Return lines describing what was optimized.
+        """
+        return self.removed + [
+            '{} expressions folded, {} simplified, {} statements removed, {} loop invariants hoisted, '
+            '{} repeated expressions reused at -O{}'.format(
+                self.folded, self.simplified, len(self.removed), self.hoisted, self.reused, self.level)]
+
+
+class Optimizer(NodeVisitor):
+    """
+    Rewrites the program tree after parsing, before any engine runs it. Nodes which do not change
+    are shared with the parsed tree, which is not modified.
+
+    -O1 makes only changes which do not change what the program prints or raises:
+    arithmetic over number literals is folded, unless it raises; conditions over literals are
+    folded, and `and`, `or` with an operand always true or false simplified; if statements whose
+    condition is always false and while statements which never run are removed, if statements
+    whose condition is always true are replaced by their statement.
+
+    -O2 also assumes that operands of arithmetic operators are numbers: x * 1, 1 * x, x - 0,
+    - -x and +x are replaced by x when the type stays the same, so the TypeError such expression
+    would raise for other values is lost. Functions which are never referenced are removed, and
+    are not listed in the global scope printed at the end any more; functions whose name is
+    declared more than once are kept, as the declarations may fail, and so are the roots, which
+    the host calls, e.g. process of Pipeline.
+
+    -O3 also shares values of loop invariant and repeated expressions, see Sharing; this does not
+    change what the program prints either.
+    """
+    def __init__(self, parser, level=2, roots=()):
+        """
+        :param parser: Parser of the program, for locations in the report.
+        :param level: Optimization level, one of LEVELS.
+        :param roots: Names of the functions called by the host, kept as if the program referenced them.
+        """
+        if level not in LEVELS:
+            raise ValueError('Unknown optimization level {}'.format(level))
+        self.parser = parser
+        self.level = level
+        self.roots = frozenset(roots)
+        self.result = None
+        # argument of external function call being optimized, which may not be replaced by a Var
+        self.argument = None
+        # FunctionDeclaration nodes removed as unused
+        self.unused = frozenset()
+
+    def location(self, node):
+        offset = first_offset(node)
+        if offset is None:
+            return ''
+        return ' at ' + self.parser.describe_location(offset)
+
+    def optimize(self, tree):
+        """
+        Return Optimization of the program tree.
+        """
+        self.result = Optimization(tree, self.level)
+        if self.level == 0:
+            return self.result
+        tree = self.visit(tree)
+        if self.level >= 2:
+            self.unused = self.unused_functions(tree)
+            if self.unused:
+                tree = self.visit(tree)
+        if self.level >= 3:
+            sharing = Sharing(tree)
+            tree = sharing.share(tree)
+            self.result.hoisted = sharing.hoisted
+            self.result.reused = sharing.reused
+        self.result.tree = tree
+        return self.result
+
+    def unused_functions(self, tree):
+        """
+        Return FunctionDeclaration nodes of functions never referenced, outside of bodies of such
+        functions, whose name is declared only once and is not one of the roots.
+        """
+        declarations = Resolver().resolve(tree).names
+        functions = {}
+        for name, declared in declarations.items():
+            if len(declared) == 1 and isinstance(declared[0], FunctionDeclaration):
+                functions[declared[0]] = name
+        used = set(self.roots)
+        referenced_names(tree, functions, used)
+        bodies = {name: function for function, name in functions.items()}
+        pending = list(used)
+        while pending:
+            function = bodies.pop(pending.pop(), None)
+            if function is not None:
+                names = set()
+                referenced_names(function.body, functions, names)
+                pending.extend(names - used)
+                used |= names
+        return frozenset(function for function, name in functions.items() if name not in used)
+
+    def constant(self, node):
+        """
+        Return value of the expression or condition, UNKNOWN when it is known only when running.
+        """
+        if isinstance(node, (Num, String)):
+            return node.value
+        if not isinstance(node, ConditionalVal):
+            return UNKNOWN
+        left = self.constant(node.left)
+        right = self.constant(node.right)
+        if left is UNKNOWN or right is UNKNOWN:
+            return UNKNOWN
+        op = node.op.type
+        if op == AND:
+            return left and right
+        elif op == OR:
+            return left or right
+        try:
+            return CONDITIONAL_OPERATIONS[op](left, right)
+        except TypeError:
+            return UNKNOWN
+
+    def visit_Program(self, node):
+        code = self.visit(node.code) if node.code is not None else None
+        if code is node.code:
+            return node
+        return Program(node.declarations, code)
+
+    def visit_StatList(self, node):
+        statements = []
+        for statement in node.statements:
+            optimized = self.visit(statement)
+            if optimized is not None:
+                statements.append(optimized)
+        if len(statements) == len(node.statements) and all(map(
+                lambda optimized, statement: optimized is statement, statements, node.statements)):
+            return node
+        return StatList(statements)
+
+    def visit_BlockStat(self, node):
+        statements = self.visit(node.list)
+        return node if statements is node.list else BlockStat(statements)
+
+    def branch(self, node):
+        """
+        Return optimized statement of if or while, which is not removed.
+        """
+        statement = self.visit(node)
+        return NoOp() if statement is None else statement
+
+    def visit_If(self, node):
+        cond = self.visit(node.cond)
+        value = self.constant(cond)
+        if value is UNKNOWN:
+            block = self.branch(node.block)
+            if cond is node.cond and block is node.block:
+                return node
+            return If(cond, block)
+        if not value:
+            self.result.removed.append('Removed if statement{}, its condition is always false'.format(
+                self.location(node)))
+            return None
+        self.result.removed.append('Removed condition of if statement{}, it is always true'.format(
+            self.location(node)))
+        return self.visit(node.block)
+
+    def visit_While(self, node):
+        cond = self.visit(node.cond)
+        value = self.constant(cond)
+        if value is not UNKNOWN and not value:
+            self.result.removed.append('Removed while statement{}, its condition is always false'.format(
+                self.location(node)))
+            return None
+        block = self.branch(node.block)
+        if cond is node.cond and block is node.block:
+            return node
+        return While(cond, block)
+
+    def visit_FunctionDeclaration(self, node):
+        if node in self.unused:
+            self.result.removed.append('Removed unused function "{}"{}'.format(node.name.value, self.location(node)))
+            return None
+        body = self.visit(node.body)
+        return node if body is node.body else FunctionDeclaration(node.name, node.arguments, body, node.pure)
+
+    def visit_Return(self, node):
+        value = self.visit(node.value)
+        return node if value is node.value else Return(value)
+
+    def visit_Assign(self, node):
+        right = self.visit(node.right)
+        return node if right is node.right else Assign(node.left, node.op, right)
+
+    def visit_FunctionCall(self, node):
+        args = []
+        for arg in node.args:
+            # Interpreter checks arguments which are variables differently
+            self.argument = arg
+            args.append(self.visit(arg))
+        self.argument = None
+        if all(map(lambda optimized, arg: optimized is arg, args, node.args)):
+            return node
+        return FunctionCall(node.function, args)
+
+    def visit_ConditionalVal(self, node):
+        left = self.visit(node.left)
+        right = self.visit(node.right)
+        op = node.op.type
+        if op == AND or op == OR:
+            # both operands are evaluated, and the other one is true or false as well
+            neutral = op == AND
+            if self.constant(left) is not UNKNOWN and bool(self.constant(left)) == neutral:
+                self.result.simplified += 1
+                return right
+            if self.constant(right) is not UNKNOWN and bool(self.constant(right)) == neutral:
+                self.result.simplified += 1
+                return left
+        if left is node.left and right is node.right:
+            return node
+        return ConditionalVal(left, node.op, right)
+
+    def number(self, value, node):
+        """
+        Return Num node of the folded value of the node.
+        """
+        self.result.folded += 1
+        return Num(Token(NUMBER, value, first_offset(node)))
+
+    def visit_BinOp(self, node):
+        argument = self.argument is node
+        left = self.visit(node.left)
+        right = self.visit(node.right)
+        op = node.op.type
+        if isinstance(left, Num) and isinstance(right, Num):
+            try:
+                return self.number(ARITHMETIC_OPERATIONS[op](left.value, right.value), node)
+            except ArithmeticError:
+                pass
+        if self.level >= 2:
+            operand = None
+            # only whole literals keep the type of the operand: x * 1.0 is a float when x is an int
+            if (op == MUL and isinstance(right, Num) and type(right.value) is int and right.value == 1) or (
+                    op == MINUS and isinstance(right, Num) and type(right.value) is int and right.value == 0):
+                operand = left
+            elif (op == MUL and isinstance(left, Num) and type(left.value) is int and left.value == 1
+                  and is_number(right)):
+                operand = right
+            if operand is not None and not (argument and isinstance(operand, Var)):
+                self.result.simplified += 1
+                return operand
+        if left is node.left and right is node.right:
+            return node
+        return BinOp(left, node.op, right)
+
+    def visit_UnaryOp(self, node):
+        value = self.visit(node.value)
+        op = node.op.type
+        if isinstance(value, Num):
+            return self.number(-value.value if op == MINUS else +value.value, node)
+        if self.level >= 2:
+            if op == PLUS and is_number(value):
+                self.result.simplified += 1
+                return value
+            if op == MINUS and isinstance(value, UnaryOp) and value.op.type == MINUS and is_number(value.value):
+                self.result.simplified += 1
+                return value.value
+        return node if value is node.value else UnaryOp(node.op, value)
+
+    def visit_ArrayLiteral(self, node):
+        elements = [self.visit(element) for element in node.elements]
+        if all(map(lambda optimized, element: optimized is element, elements, node.elements)):
+            return node
+        return ArrayLiteral(node.token, elements)
+
+    def visit_Index(self, node):
+        value = self.visit(node.value)
+        index = self.visit(node.index)
+        if value is node.value and index is node.index:
+            return node
+        return Index(value, node.token, index)
+
+    def visit_Slice(self, node):
+        value = self.visit(node.value)
+        start = self.visit(node.start) if node.start is not None else None
+        end = self.visit(node.end) if node.end is not None else None
+        if value is node.value and start is node.start and end is node.end:
+            return node
+        return Slice(value, node.token, start, end)
+
+    def visit_Num(self, node):
+        return node
+
+    visit_String = visit_Var = visit_NoOp = visit_VarDeclaration = visit_Num
@@ -0,0 +1,146 @@
+"""
+Streaming mode: the program is parsed and run once, then the host calls one of its functions,
+process by default, for every block of samples a source gives and hands what it returns to a
+sink. Variables of the global scope keep their values between the calls, so the program keeps
+its state, e.g. filter memory, from block to block.
+
+Sources are iterables; tuples they give are the arguments of the function, other values its
+only argument. Sinks are functions called with every result.
+"""
+import array
+import math
+import time
+
+from audioscript.interpreter.arrays import ndarray
+from audioscript.interpreter.engines import make_interpreter
+from audioscript.interpreter.memo import MEMO_SIZE
+from audioscript.modules.wav import WavReader, WavWriter
+
+
+class PipelineStatistics(object):
+    """
+    Time every call of the function took, to choose the block size: larger blocks cost less
+    per sample, smaller ones have lower latency.
+    """
+    def __init__(self):
+        self.blocks = 0
+        self.samples = 0
+        self.total = 0.0
+        # seconds of every call
+        self.latencies = array.array('d')
+
+    def add(self, elapsed, samples):
+        self.blocks += 1
+        self.samples += samples
+        self.total += elapsed
+        self.latencies.append(elapsed)
+
+    def percentile(self, fraction):
+        """
+        Return latency which the fraction of the calls did not exceed.
+        """
+        latencies = sorted(self.latencies)
+        return latencies[min(len(latencies) - 1, max(0, math.ceil(fraction * len(latencies)) - 1))]
+
+    def report(self, sample_rate=None):
+        """
+        Return lines describing latency of the calls and throughput.
+        :param sample_rate: Samples per second of all the channels together, to report how many
+        times faster than real time the blocks were processed.
+        """
+        if not self.blocks:
+            return ['Pipeline: no blocks processed']
+        lines = [
+            'Pipeline: {} blocks, {} samples in {:.6f} s'.format(self.blocks, self.samples, self.total),
+            'Latency: min {:.1f} us, mean {:.1f} us, p50 {:.1f} us, p99 {:.1f} us, max {:.1f} us'.format(
+                min(self.latencies) * 1e6, self.total / self.blocks * 1e6, self.percentile(0.5) * 1e6,
+                self.percentile(0.99) * 1e6, max(self.latencies) * 1e6),
+        ]
+        if self.total:
+            throughput = 'Throughput: {:.0f} blocks/s, {:.0f} samples/s'.format(
+                self.blocks / self.total, self.samples / self.total)
+            if sample_rate:
+                throughput += ', {:.1f}x real time'.format(self.samples / self.total / sample_rate)
+            lines.append(throughput)
+        return lines
+
+
+class Pipeline(object):
+    """
+    Runs the program once and its function for every block of a source.
+    """
+    def __init__(self, parser, engine='tree', function='process', memo_size=MEMO_SIZE):
+        """
+        :param parser: Parser (or CachedParser) of the program.
+        :param engine: Name of the execution engine, see make_interpreter.
+        :param function: Name of the function called for every block.
+        :param memo_size: Number of results of every pure function kept, 0 turns memoization off.
+        """
+        self.interpreter = make_interpreter(parser, engine, memo_size)
+        self.function = function
+
+    def run(self, source, sink=None):
+        """
+        Run the program, call the function for every block of the source and return
+        PipelineStatistics of the calls. The global scope is printed once all blocks were
+        processed, as by interpret().
+        :param source: Iterable of blocks, or of tuples of arguments.
+        :param sink: Function called with the value returned for every block, if given.
+        """
+        interpreter = self.interpreter
+        function = self.function
+        statistics = PipelineStatistics()
+        clock = time.perf_counter
+        interpreter.start()
+        for block in source:
+            args = block if block.__class__ is tuple else (block,)
+            start = clock()
+            result = interpreter.call(function, *args)
+            elapsed = clock() - start
+            statistics.add(elapsed, len(args[0]) if args and hasattr(args[0], '__len__') else 1)
+            if sink is not None:
+                sink(result)
+        interpreter.finish()
+        return statistics
+
+
+class WavSource(object):
+    """
+    Blocks of a WAV file as (samples, channel) tuples, every channel of a block in turn, so the
+    function is called as process(block, channel).
+    """
+    def __init__(self, path, block_size):
+        self.reader = WavReader(path, block_size)
+        self.sample_rate = self.reader.sample_rate
+        self.channels = self.reader.channels
+
+    def __iter__(self):
+        reader = self.reader
+        for index in range(reader.blocks()):
+            for channel in range(reader.channels):
+                yield reader.read(index, channel), channel
+
+
+class WavSink(object):
+    """
+    WAV file written with the blocks returned for WavSource, the channels in turn, in the format,
+    sample rate and channels of the file read; blocks returned are on the scale of the blocks
+    given, see the wav module.
+    """
+    def __init__(self, path, source):
+        """
+        :param source: WavSource of the blocks.
+        """
+        reader = source.reader
+        self.writer = WavWriter(path, reader.sample_rate, reader.channels, reader.sample_type)
+        self.channel = 0
+
+    def __call__(self, samples):
+        if samples.__class__ is not ndarray:
+            raise TypeError('Function must return array of samples to write to "{}", got {!r}'.format(
+                self.writer.path, samples))
+        self.writer.write(samples, self.channel)
+        self.channel = (self.channel + 1) % self.writer.channels
+
+    def close(self):
+        self.writer.close()
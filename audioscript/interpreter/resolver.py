@@ -0,0 +1,230 @@
+from audioscript.interpreter.Interpreter import NodeVisitor
+from audioscript.interpreter.scopes import declared_names
+from audioscript.pars.Parser import BlockStat
+
+# Declaration of function parameters, in Resolution.declarations.
+PARAMETER = 'parameter'
+
+
+class StaticScope(object):
+    """
+    Scope seen by the Resolver: slots of the names declared in it so far.
+    """
+    __slots__ = ('slots', 'declarations', 'uncertain', 'enclosing_scope', 'function')
+
+    def __init__(self, enclosing_scope, function=False):
+        """
+        :param function: Whether it is scope of function parameters. Functions see variables of
+        their callers, so names are not resolved past it.
+        """
+        self.slots = {}
+        self.declarations = {}
+        # names declared by statements which may not run, or run more than once
+        self.uncertain = set()
+        self.enclosing_scope = enclosing_scope
+        self.function = function
+
+
+class Resolution(object):
+    """
+    Result of the Resolver.
+    """
+    def __init__(self):
+        # Var node -> slot of the referenced symbol in the frame
+        self.references = {}
+        # Var node -> declaration of the referenced symbol: VarDeclaration, FunctionDeclaration,
+        # ExternalFunctionDeclaration node or PARAMETER
+        self.declarations = {}
+        # name -> declarations of the name anywhere in the program
+        self.names = {}
+        # Program or FunctionDeclaration node -> number of slots of its frame
+        self.sizes = {}
+        # VarDeclaration node -> slots of the names, FunctionDeclaration or
+        # ExternalFunctionDeclaration node -> slot of the function
+        self.slots = {}
+
+
+class Resolver(NodeVisitor):
+    """
+    Resolves references to variables and functions to slots in frames, once after parsing,
+    so engines can read the symbol from the frame instead of looking the name up in every
+    enclosing scope.
+
+    The program and every function call have one frame, shared by the blocks in them; every
+    declaration has its own slot. A reference is resolved only when the declaration Interpreter
+    would find is known before running: it was made earlier, by a statement which always runs, in
+    the scope of the reference or an enclosing one within the same function. Then the slot was
+    written by the declaration before the reference is evaluated, also when a block runs again in
+    a loop. As functions see variables of their callers, references never cross function
+    boundaries and the scope depth of every resolved reference is 0; lookup does not depend on
+    how deep blocks are nested.
+
+    Free variables of functions and names declared by statements of if and while without braces
+    are left unresolved and engines look them up by name.
+    """
+    def __init__(self):
+        self.resolution = None
+        self.scope = None
+        # number of slots of the frame being resolved
+        self.size = 0
+        # nonzero while resolving statements of if or while without braces
+        self.conditional = 0
+
+    def resolve(self, tree):
+        """
+        Return Resolution of the program tree.
+        """
+        self.resolution = Resolution()
+        self.visit(tree)
+        return self.resolution
+
+    def declare(self, name, declaration, certain=True):
+        """
+        Return slot of the name declared in the current scope.
+        :param declaration: Node declaring the name or PARAMETER, None when not declared yet.
+        """
+        slot = self.scope.slots.get(name)
+        if slot is None:
+            slot = self.scope.slots[name] = self.size
+            self.size += 1
+        if declaration is not None:
+            # the first one, declaring the name again in the scope is an error
+            self.scope.declarations.setdefault(name, declaration)
+            self.resolution.names.setdefault(name, []).append(declaration)
+        if not certain:
+            self.scope.uncertain.add(name)
+        return slot
+
+    def reference(self, node):
+        name = node.value
+        scope = self.scope
+        while scope is not None:
+            if name in scope.uncertain:
+                return
+            slot = scope.slots.get(name)
+            if slot is not None:
+                self.resolution.references[node] = slot
+                self.resolution.declarations[node] = scope.declarations[name]
+                return
+            if scope.function:
+                return
+            scope = scope.enclosing_scope
+
+    def nested(self, node, scope):
+        """
+        Resolve node in new scope.
+        """
+        outer, conditional = self.scope, self.conditional
+        self.scope, self.conditional = scope, 0
+        self.visit(node)
+        self.scope, self.conditional = outer, conditional
+
+    def branch(self, node):
+        """
+        Resolve statement of if or while.
+        """
+        if isinstance(node, BlockStat):
+            self.visit(node)
+        else:
+            self.conditional += 1
+            self.visit(node)
+            self.conditional -= 1
+
+    def visit_Program(self, node):
+        self.scope, self.size = StaticScope(None), 0
+        if node.declarations is not None:
+            self.visit(node.declarations)
+        if node.code is not None:
+            self.visit(node.code)
+        self.resolution.sizes[node] = self.size
+
+    def visit_Declarations(self, node):
+        for module in node.modules:
+            self.visit(module)
+
+    def visit_ModuleDeclaration(self, node):
+        for function in node.functions:
+            self.resolution.slots[function] = self.declare(function.name, function)
+
+    def visit_BlockStat(self, node):
+        self.nested(node.list, StaticScope(self.scope))
+
+    def visit_StatList(self, node):
+        for statement in node.statements:
+            self.visit(statement)
+
+    def visit_FunctionDeclaration(self, node):
+        self.resolution.slots[node] = self.declare(node.name.value, node, not self.conditional)
+        outer, conditional, size = self.scope, self.conditional, self.size
+        self.scope, self.conditional, self.size = StaticScope(None, function=True), 0, 0
+        for name in node.arguments:
+            self.declare(name, PARAMETER)
+        self.visit(node.body)
+        self.resolution.sizes[node] = self.size
+        self.scope, self.conditional, self.size = outer, conditional, size
+
+    def visit_FunctionCall(self, node):
+        self.reference(node.function)
+        for arg in node.args:
+            self.visit(arg)
+
+    def visit_BinOp(self, node):
+        self.visit(node.left)
+        self.visit(node.right)
+
+    visit_ConditionalVal = visit_BinOp
+
+    def visit_UnaryOp(self, node):
+        self.visit(node.value)
+
+    def visit_ArrayLiteral(self, node):
+        for element in node.elements:
+            self.visit(element)
+
+    def visit_Index(self, node):
+        self.visit(node.value)
+        self.visit(node.index)
+
+    def visit_Slice(self, node):
+        self.visit(node.value)
+        for bound in (node.start, node.end):
+            if bound is not None:
+                self.visit(bound)
+
+    def visit_Num(self, node):
+        pass
+
+    visit_String = visit_NoOp = visit_Num
+
+    def visit_If(self, node):
+        self.visit(node.cond)
+        self.branch(node.block)
+
+    def visit_While(self, node):
+        if not isinstance(node.block, BlockStat):
+            # the statement declares names in this scope again on every iteration,
+            # the condition and the statement may see them from the previous one
+            for name in declared_names(node.block):
+                self.declare(name, None, certain=False)
+        self.visit(node.cond)
+        self.branch(node.block)
+
+    def visit_Assign(self, node):
+        self.visit(node.right)
+        self.reference(node.left)
+
+    def visit_VarDeclaration(self, node):
+        self.resolution.slots[node] = tuple(self.declare(name.value, node, not self.conditional)
+                                            for name in node.names)
+
+    def visit_Return(self, node):
+        self.visit(node.value)
+
+    def visit_Var(self, node):
+        self.reference(node)
+
+    def visit_SharedExpression(self, node):
+        self.visit(node.expression)
+
+    def visit_SharingRegion(self, node):
+        self.visit(node.statement)
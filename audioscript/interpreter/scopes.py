@@ -0,0 +1,58 @@
+from audioscript.pars.Parser import AST, BlockStat, FunctionDeclaration, Return, VarDeclaration
+
+
+def declared_names(node):
+    """
+    Return names the statement declares in the scope it runs in; declarations in nested blocks
+    and function bodies are not included.
+    """
+    if isinstance(node, VarDeclaration):
+        return [name.value for name in node.names]
+    if isinstance(node, FunctionDeclaration):
+        return [node.name.value]
+    if isinstance(node, BlockStat):
+        return []
+    names = []
+    for field in node.__slots__:
+        value = getattr(node, field)
+        for child in (value if isinstance(value, list) else (value,)):
+            if isinstance(child, AST):
+                names.extend(declared_names(child))
+    return names
+
+
+def returns(node):
+    """
+    Return whether the statement has a return statement running in the scope it runs in.
+    """
+    if isinstance(node, Return):
+        return True
+    if isinstance(node, (BlockStat, FunctionDeclaration)):
+        return False
+    for field in node.__slots__:
+        value = getattr(node, field)
+        for child in (value if isinstance(value, list) else (value,)):
+            if isinstance(child, AST) and returns(child):
+                return True
+    return False
+
+
+def scoped_blocks(node, blocks=None):
+    """
+    Return set of the BlockStat nodes in the tree which need scope of their own: function bodies,
+    whose scope return checks, and blocks whose statements declare names or return. Other blocks
+    can run in the scope they are in, as nothing is inserted in their scope and the scopes of
+    their nested blocks are checked by return only in function bodies.
+    """
+    if blocks is None:
+        blocks = set()
+    if isinstance(node, FunctionDeclaration):
+        blocks.add(node.body)
+    elif isinstance(node, BlockStat) and (declared_names(node.list) or returns(node.list)):
+        blocks.add(node)
+    for field in node.__slots__:
+        value = getattr(node, field)
+        for child in (value if isinstance(value, list) else (value,)):
+            if isinstance(child, AST):
+                scoped_blocks(child, blocks)
+    return blocks
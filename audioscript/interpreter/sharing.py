@@ -0,0 +1,303 @@
+from audioscript.interpreter.resolver import Resolver
+from audioscript.pars.Parser import (AST, Assign, BinOp, ExternalFunctionDeclaration, FunctionCall, FunctionDeclaration,
+                                     If, Num, Return, SharedExpression, SharingRegion, StatList, String, UnaryOp, Var,
+                                     VarDeclaration, While)
+
+# Nodes which are statements; other statements in a statement list are expressions.
+STATEMENT_NODES = frozenset(('StatList', 'BlockStat', 'If', 'While', 'Return', 'Assign', 'VarDeclaration',
+                             'FunctionDeclaration', 'NoOp', 'SharingRegion'))
+
+
+def children(node):
+    """
+    Return child nodes of the node, in the order of the fields.
+    """
+    nodes = []
+    for field in node.__slots__:
+        value = getattr(node, field)
+        for child in (value if isinstance(value, list) else (value,)):
+            if isinstance(child, AST):
+                nodes.append(child)
+    return nodes
+
+
+def rebuild(node, replace):
+    """
+    Return node with every child replaced by replace(child), the node itself when none changes.
+    """
+    values = {}
+    changed = False
+    for field in node.__slots__:
+        value = getattr(node, field)
+        if isinstance(value, list):
+            new = [replace(child) if isinstance(child, AST) else child for child in value]
+            changed = changed or any(map(lambda a, b: a is not b, new, value))
+        elif isinstance(value, AST):
+            new = replace(value)
+            changed = changed or new is not value
+        else:
+            new = value
+        values[field] = new
+    if not changed:
+        return node
+    copy = node.__class__.__new__(node.__class__)
+    for field, value in values.items():
+        setattr(copy, field, value)
+    return copy
+
+
+class Effects(object):
+    """
+    Names a statement may assign or declare in the scopes it runs in, and user functions it calls.
+    """
+    def __init__(self):
+        self.assigned = set()
+        self.declared = set()
+        self.called = set()
+
+    def add(self, node):
+        """
+        Add effects of the node; bodies of functions declared in it are not included.
+        """
+        if isinstance(node, Assign):
+            self.assigned.add(node.left.value)
+        elif isinstance(node, VarDeclaration):
+            self.declared.update(name.value for name in node.names)
+        elif isinstance(node, FunctionDeclaration):
+            self.declared.add(node.name.value)
+            return self
+        elif isinstance(node, FunctionCall):
+            self.called.add(node.function.value)
+        for child in children(node):
+            self.add(child)
+        return self
+
+
+class Sharing(object):
+    """
+    Shares values of expressions over numbers, strings, variables and pure external functions,
+    which give the same value while none of the variables they use is assigned or declared again:
+
+    - expressions of a while statement which do not change in the loop are computed on the first
+      iteration which evaluates them and reused in the next ones;
+    - expressions repeated in the statements of a statement list are computed once, where the
+      first of them is evaluated, and reused until a variable they use changes.
+
+    Changes are found from assignments and declarations in the statements and in the user
+    functions they call, with the functions they call in turn; functions see variables of their
+    callers, so every assignment in them counts. Values are computed where the expression was
+    evaluated first, not before, so errors are raised where they were and expressions which were
+    not evaluated are not evaluated now.
+
+    An external function is pure when it is declared so in Modules and the name is not declared
+    anywhere else in the program.
+    """
+    def __init__(self, tree):
+        declarations = Resolver().resolve(tree).names
+        self.pure = frozenset(name for name, declared in declarations.items()
+                              if len(declared) == 1 and isinstance(declared[0], ExternalFunctionDeclaration)
+                              and declared[0].pure)
+        self.effects = self.function_effects(declarations)
+        self.slots = 0
+        # number of loop invariant expressions and of repeated expressions shared
+        self.hoisted = 0
+        self.reused = 0
+        # expression node -> (structural key, names used) or None when it is not pure
+        self._keys = {}
+
+    def function_effects(self, declarations):
+        """
+        Return names of user functions -> names the function or functions it calls may assign.
+        """
+        direct = {}
+        for name, declared in declarations.items():
+            for declaration in declared:
+                if isinstance(declaration, FunctionDeclaration):
+                    effects = direct.setdefault(name, Effects())
+                    for statement in children(declaration.body):
+                        effects.add(statement)
+        assigned = {name: set(effects.assigned) for name, effects in direct.items()}
+        changed = True
+        while changed:
+            changed = False
+            for name, effects in direct.items():
+                for called in effects.called & assigned.keys():
+                    if not assigned[called] <= assigned[name]:
+                        assigned[name] |= assigned[called]
+                        changed = True
+        return assigned
+
+    def kills(self, node):
+        """
+        Return names whose variables may change while the statement runs.
+        """
+        effects = Effects().add(node)
+        names = effects.assigned | effects.declared
+        for called in effects.called:
+            names |= self.effects.get(called, set())
+        return names
+
+    def key(self, node):
+        """
+        Return (structural key, names used) of a pure expression, None when it is not pure.
+        """
+        try:
+            return self._keys[node]
+        except KeyError:
+            pass
+        if isinstance(node, Num):
+            # 1 and 1.0 are different values
+            key = ('Num', type(node.value), node.value), frozenset()
+        elif isinstance(node, String):
+            key = ('String', node.value), frozenset()
+        elif isinstance(node, Var):
+            key = ('Var', node.value), frozenset((node.value,))
+        elif isinstance(node, (BinOp, UnaryOp)) or (
+                isinstance(node, FunctionCall) and node.function.value in self.pure):
+            operands = [self.key(child) for child in (
+                node.args if isinstance(node, FunctionCall) else children(node))]
+            if None in operands:
+                key = None
+            else:
+                if isinstance(node, FunctionCall):
+                    head = ('FunctionCall', node.function.value)
+                    names = frozenset((node.function.value,))
+                else:
+                    head = (type(node).__name__, node.op.type)
+                    names = frozenset()
+                key = (head + tuple(operand[0] for operand in operands),
+                       names.union(*(operand[1] for operand in operands)))
+        else:
+            key = None
+        self._keys[node] = key
+        return key
+
+    def slot(self):
+        self.slots += 1
+        return self.slots - 1
+
+    def share(self, node):
+        """
+        Return node with values of its expressions shared.
+        """
+        if isinstance(node, (SharedExpression, Num, String, Var)):
+            return node
+        if isinstance(node, While):
+            return self.loop(node)
+        node = rebuild(node, self.share)
+        if isinstance(node, StatList):
+            return self.common(node)
+        return node
+
+    def candidates(self, node, shared, found):
+        """
+        Append to found the largest expressions in the node, outside of function bodies, for which
+        shared(node) is true.
+        """
+        if isinstance(node, (SharedExpression, FunctionDeclaration)):
+            return
+        if isinstance(node, (BinOp, UnaryOp, FunctionCall)) and shared(node):
+            found.append(node)
+            return
+        for child in children(node):
+            self.candidates(child, shared, found)
+
+    def loop(self, node):
+        """
+        Share expressions of the while statement which do not change in the loop.
+        """
+        kills = self.kills(node)
+        found = []
+        self.candidates(node, lambda expression: self.key(expression) is not None
+                        and not self.key(expression)[1] & kills, found)
+        replacements = {}
+        slots = {}
+        for expression in found:
+            key = self.key(expression)[0]
+            if key not in slots:
+                slots[key] = self.slot()
+                self.hoisted += 1
+            replacements[expression] = SharedExpression(expression, slots[key])
+        if not replacements:
+            return rebuild(node, self.share)
+
+        def replace(child):
+            if child in replacements:
+                return replacements[child]
+            return rebuild(child, replace)
+        node = rebuild(rebuild(node, replace), self.share)
+        return SharingRegion(node, sorted(slots.values()))
+
+    def common(self, node):
+        """
+        Share expressions repeated in the statements of the statement list, while the variables
+        they use do not change.
+        """
+        # name -> number of times it changed so far
+        versions = {}
+        # expression node -> (structural key, versions of the names it uses) where it is evaluated
+        values = {}
+        roots = []
+
+        def change(names):
+            for name in names:
+                versions[name] = versions.get(name, 0) + 1
+
+        def evaluate(expression):
+            if isinstance(expression, (SharedExpression, FunctionDeclaration)):
+                return
+            for child in children(expression):
+                evaluate(child)
+            if isinstance(expression, FunctionCall) and expression.function.value not in self.pure:
+                change(self.effects.get(expression.function.value, ()))
+            elif isinstance(expression, (BinOp, UnaryOp, FunctionCall)):
+                key = self.key(expression)
+                if key is not None:
+                    values[expression] = key[0], tuple(sorted((name, versions.get(name, 0)) for name in key[1]))
+
+        for statement in node.statements:
+            if isinstance(statement, Assign):
+                roots.append(statement.right)
+                evaluate(statement.right)
+                change((statement.left.value,))
+            elif isinstance(statement, Return):
+                roots.append(statement.value)
+                evaluate(statement.value)
+            elif isinstance(statement, If):
+                roots.append(statement.cond)
+                evaluate(statement.cond)
+                change(self.kills(statement.block))
+            elif type(statement).__name__ in STATEMENT_NODES:
+                change(self.kills(statement))
+            else:
+                roots.append(statement)
+                evaluate(statement)
+
+        counts = {}
+        for value in values.values():
+            counts[value] = counts.get(value, 0) + 1
+        found = []
+        for root in roots:
+            self.candidates(root, lambda expression: counts.get(values.get(expression), 0) > 1, found)
+        groups = {}
+        for expression in found:
+            groups.setdefault(values[expression], []).append(expression)
+        replacements = {}
+        slots = []
+        for expressions in groups.values():
+            if len(expressions) > 1:
+                slot = self.slot()
+                slots.append(slot)
+                self.reused += len(expressions) - 1
+                for expression in expressions:
+                    replacements[expression] = SharedExpression(expression, slot)
+        if not replacements:
+            return node
+
+        def replace(child):
+            if child in replacements:
+                return replacements[child]
+            if isinstance(child, (StatList, FunctionDeclaration)):
+                return child
+            return rebuild(child, replace)
+        return SharingRegion(rebuild(node, replace), slots)
@@ -41,10 +41,16 @@ class BuiltinTypeSymbol(Symbol):
 
 
 class FunctionSymbol(Symbol):
-    def __init__(self, name, body, arguments=None):
+    def __init__(self, name, body, arguments=None, frame_size=0, memo=None):
+        """
+        :param frame_size: Number of slots in frame of the function, given by the Resolver.
+        :param memo: Memo of results of the function when it is pure, None otherwise.
+        """
         super(FunctionSymbol, self).__init__(name)
         self.arguments = arguments if arguments is not None else []
         self.body = body
+        self.frame_size = frame_size
+        self.memo = memo
 
     def __str__(self):
         return '<{class_name}(name={name}, arguments={arguments})>'.format(
@@ -57,10 +63,16 @@ class FunctionSymbol(Symbol):
 
 
 class ExternalFunctionSymbol(Symbol):
-    def __init__(self, name, arguments_types=None, return_type = None):
+    def __init__(self, name, arguments_types=None, return_type = None, memo=None, external=None):
+        """
+        :param memo: Memo of results of the function when it is pure, None otherwise.
+        :param external: ExternalFunction the symbol is bound to, which calls go to.
+        """
         super(ExternalFunctionSymbol, self).__init__(name)
         self.arguments_types = arguments_types if arguments_types is not None else []
         self.return_type = return_type
+        self.memo = memo
+        self.external = external
 
     def __str__(self):
         return '<{class_name}(name={name}, arguments types={arguments}, return type={return_type})>'.format(
@@ -74,16 +86,22 @@ class ExternalFunctionSymbol(Symbol):
 
 
 class ScopedSymbolTable(object):
-    def __init__(self, scope_name, scope_level, enclosing_scope=None):
+    def __init__(self, scope_name, scope_level, enclosing_scope=None, frame=None):
+        """
+        :param frame: List of symbols by slots given by the Resolver, None in slots whose symbols
+        were not inserted. Blocks share the frame of the function or program they are in.
+        """
         self._symbols = OrderedDict()
         self.scope_name = scope_name
         self.scope_level = scope_level
         self.enclosing_scope = enclosing_scope
+        self.frame = frame
 
     def _init_builtins(self):
         self.insert(BuiltinTypeSymbol('NUMBER'))
         self.insert(BuiltinTypeSymbol('STRING'))
         self.insert(BuiltinTypeSymbol('VAR'))
+        self.insert(BuiltinTypeSymbol('ARRAY'))
 
     def __str__(self):
         h1 = 'SCOPE (SCOPED SYMBOL TABLE)'
@@ -109,9 +127,17 @@ class ScopedSymbolTable(object):
 
     __repr__ = __str__
 
-    def insert(self, symbol):
+    def insert(self, symbol, slot=None):
         #print('Insert: %s' % symbol.name)
         self._symbols[symbol.name] = symbol
+        if slot is not None:
+            self.frame[slot] = symbol
+
+    def declares(self, names):
+        """
+        Return whether a symbol of one of the names is in this scope.
+        """
+        return not names.isdisjoint(self._symbols)
 
     def lookup(self, name, current_scope_only=False):
         #print('Lookup: %s. (Scope name: %s)' % (name, self.scope_name))
@@ -124,6 +150,43 @@ class ScopedSymbolTable(object):
         if current_scope_only:
             return None
 
-        # recursively go up the chain and lookup the name
-        if self.enclosing_scope is not None:
-            return self.enclosing_scope.lookup(name)
+        # go up the chain and lookup the name; a loop, as the chain grows with the call depth
+        scope = self.enclosing_scope
+        while scope is not None:
+            symbol = scope._symbols.get(name)
+            if symbol is not None:
+                return symbol
+            scope = scope.enclosing_scope
+
+
+class ScopePool(object):
+    """
+    ScopedSymbolTables of blocks and function calls which were left, reused for the next ones
+    instead of allocating new tables. A scope may be left only when nothing refers to it any more;
+    scopes which are not left, as an error stopped the program, are simply not reused.
+    """
+    def __init__(self):
+        self.free = []
+
+    def enter(self, scope_name, enclosing_scope, frame=None):
+        """
+        Return empty scope nested in the enclosing scope.
+        """
+        if not self.free:
+            return ScopedSymbolTable(scope_name, enclosing_scope.scope_level + 1, enclosing_scope, frame)
+        scope = self.free.pop()
+        scope.scope_name = scope_name
+        scope.scope_level = enclosing_scope.scope_level + 1
+        scope.enclosing_scope = enclosing_scope
+        scope.frame = frame
+        return scope
+
+    def leave(self, scope):
+        """
+        Return the scope enclosing the scope, which is cleared for reuse.
+        """
+        enclosing_scope = scope.enclosing_scope
+        scope._symbols.clear()
+        scope.enclosing_scope = scope.frame = None
+        self.free.append(scope)
+        return enclosing_scope
@@ -0,0 +1,617 @@
+import importlib.util
+import os
+import tempfile
+
+from audioscript.interpreter import arrays
+from audioscript.interpreter.Interpreter import NodeVisitor
+from audioscript.interpreter.externals import ExternalTable
+from audioscript.interpreter.host import host_call
+from audioscript.interpreter.memo import MEMO_SIZE, MISSING, Memos
+from audioscript.interpreter.scopes import scoped_blocks
+from audioscript.lexer.Lexer import get_tokens
+from audioscript.pars.Parser import NoOp, Var
+from interpreter.symbol_table import (ScopedSymbolTable, ScopePool, VarSymbol, FunctionSymbol, BuiltinTypeSymbol,
+                                      ExternalFunctionSymbol)
+
+globals().update(get_tokens())
+
+# Version of the generated code; saved modules of another version are not run.
+FORMAT_VERSION = 5
+
+OPERATORS = {PLUS: '+', MINUS: '-', MUL: '*', DIV: '/', EQ: '==', NEQ: '!=', LT: '<', MT: '>', LEQT: '<=',
+             MEQT: '>='}
+# Nodes which are statements on their own; other nodes are expressions and their value is dropped.
+STATEMENT_NODES = frozenset(('StatList', 'BlockStat', 'If', 'While', 'Return', 'NoOp', 'SharingRegion'))
+INDENT = '    '
+
+
+class PythonTranspiler(NodeVisitor):
+    """
+    Translates program tree into source of a Python module, which CPython compiles and runs.
+
+    Control flow and arithmetic become Python statements and operators. Variables stay in
+    ScopedSymbolTables and are looked up by name, as functions see the variables of their callers.
+    Assignments, calls and declarations call the helpers of PythonRuntime, which check types as
+    Interpreter does. Expressions made by visit() evaluate to the value and the ones made by typed()
+    to (type name, value) tuples, used where the type is checked.
+
+    The module defines FORMAT_VERSION, LOCATIONS (positions of the referenced names in the
+    source, for error messages), a function for every function declaration and program(scope).
+    Functions with SharedExpressions keep their (type name, value) pairs in local dictionary shared.
+    """
+    def __init__(self, parser):
+        self.parser = parser
+        self.lines = []
+        self.depth = 0
+        self.functions = []
+        self.locations = []
+        self._location_indexes = {}
+        self.temporaries = 0
+        # whether the function being written uses shared
+        self.sharing = False
+        # BlockStat nodes which need scope of their own, the others run in the enclosing scope
+        self.scoped = frozenset()
+        # number of scopes of blocks entered in the function being written
+        self.blocks = 0
+
+    def transpile(self, tree, source_name='<audioscript>'):
+        """
+        Return source of the module running the program.
+        :param source_name: Name of the script, written in the module docstring.
+        """
+        self.visit(tree)
+        program = self.lines
+        lines = [
+            '"""',
+            'Generated from {} by audioscript.interpreter.transpiler, do not edit.'.format(source_name),
+            '"""',
+            'FORMAT_VERSION = {}'.format(FORMAT_VERSION),
+            'LOCATIONS = (',
+        ]
+        lines.extend(INDENT + repr(location) + ',' for location in self.locations)
+        lines.append(')')
+        for function in self.functions:
+            lines.append('')
+            lines.append('')
+            lines.extend(function)
+        lines.append('')
+        lines.append('')
+        lines.extend(program)
+        lines.append('')
+        return '\n'.join(lines)
+
+    def line(self, text):
+        self.lines.append(INDENT * self.depth + text)
+
+    def location(self, token):
+        """
+        Return index of the token position in LOCATIONS.
+        """
+        offset = getattr(token, 'offset', None)
+        location = '' if offset is None else ' at ' + self.parser.describe_location(offset)
+        if location not in self._location_indexes:
+            self._location_indexes[location] = len(self.locations)
+            self.locations.append(location)
+        return self._location_indexes[location]
+
+    def temporary(self):
+        self.temporaries += 1
+        return '_t{}'.format(self.temporaries)
+
+    def statement(self, node):
+        if type(node).__name__ in STATEMENT_NODES:
+            self.visit(node)
+        else:
+            # typed, so that calls of functions which did not return any do not fail
+            self.line(self.typed(node))
+
+    def block(self, node):
+        """
+        Write the statement indented, as body of the compound statement written before.
+        """
+        self.depth += 1
+        count = len(self.lines)
+        self.statement(node)
+        if len(self.lines) == count:
+            self.line('pass')
+        self.depth -= 1
+
+    def typed(self, node):
+        typed = getattr(self, 'typed_' + type(node).__name__, None)
+        if typed is None:
+            # assignment or declaration; their helpers return None
+            return self.visit(node)
+        return typed(node)
+
+    def define_shared(self):
+        """
+        Define shared at the start of the function being written, when it uses it.
+        """
+        if self.sharing:
+            self.lines.insert(1, INDENT + 'shared = {}')
+
+    def visit_Program(self, node):
+        self.scoped = scoped_blocks(node)
+        self.line('def program(scope):')
+        self.depth += 1
+        count = len(self.lines)
+        if node.declarations is not None:
+            self.visit(node.declarations)
+        if node.code is not None:
+            self.statement(node.code)
+        if len(self.lines) == count:
+            self.line('pass')
+        self.depth -= 1
+        self.define_shared()
+
+    def visit_Declarations(self, node):
+        for ext_type in node.types:
+            self.visit(ext_type)
+        for module in node.modules:
+            self.visit(module)
+
+    def visit_DeclaredType(self, node):
+        self.line('declare_type(scope, {!r})'.format(node.name))
+
+    def visit_ModuleDeclaration(self, node):
+        for function in node.functions:
+            self.line('bind_external(scope, {!r}, {!r}, {!r}, {!r}, {!r})'.format(
+                node.name, function.name, function.return_type, tuple(function.arguments_types), function.pure))
+
+    def visit_BlockStat(self, node):
+        if node not in self.scoped:
+            self.statement(node.list)
+            return
+        self.line('scope = enter_scope("block", scope)')
+        self.blocks += 1
+        self.statement(node.list)
+        self.blocks -= 1
+        self.line('scope = leave_scope(scope)')
+
+    def visit_StatList(self, node):
+        for statement in node.statements:
+            if not isinstance(statement, NoOp):
+                self.statement(statement)
+
+    def visit_FunctionDeclaration(self, node):
+        name = 'function_{}_{}'.format(len(self.functions), node.name.value)
+        outer_lines, outer_depth, outer_sharing, outer_blocks = self.lines, self.depth, self.sharing, self.blocks
+        self.lines, self.depth, self.sharing, self.blocks = ['def {}(scope):'.format(name)], 0, False, 0
+        # the function which did not return any returns None
+        self.block(node.body)
+        self.define_shared()
+        self.functions.append(self.lines)
+        self.lines, self.depth, self.sharing, self.blocks = outer_lines, outer_depth, outer_sharing, outer_blocks
+        return 'define_function(scope, {!r}, {}, {!r}, {}, {!r})'.format(
+            node.name.value, self.location(node.name), tuple(node.arguments), name, node.pure)
+
+    def typed_FunctionCall(self, node):
+        name = node.function.value
+        location = self.location(node.function.token)
+        variables = tuple(isinstance(arg, Var) for arg in node.args)
+        args = ''.join(', ' + self.typed(arg) for arg in node.args)
+        # the function is looked up before the arguments are evaluated
+        return 'call(scope, scope.lookup({!r}) or missing_function({!r}, {}), {}, {!r}{})'.format(
+            name, name, location, location, variables, args)
+
+    def visit_FunctionCall(self, node):
+        return self.typed_FunctionCall(node) + '[1]'
+
+    def typed_BinOp(self, node):
+        left = self.temporary()
+        right = self.temporary()
+        value = self.temporary()
+        return "(('ARRAY', floating({}, {!r}, {}[1], {})) if ({} := ({} := {})[1] {} ({} := {})).__class__ is ndarray " \
+               "else ({}[0], {}))".format(
+                   value, node.op.type, left, right, value, left, self.typed(node.left), OPERATORS[node.op.type],
+                   right, self.visit(node.right), left, value)
+
+    def visit_BinOp(self, node):
+        left = self.temporary()
+        right = self.temporary()
+        value = self.temporary()
+        return '(floating({}, {!r}, {}, {}) if ({} := ({} := {}) {} ({} := {})).__class__ is ndarray else {})'.format(
+            value, node.op.type, left, right, value, left, self.visit(node.left), OPERATORS[node.op.type], right,
+            self.visit(node.right), value)
+
+    def typed_Num(self, node):
+        return "('NUMBER', {!r})".format(node.value)
+
+    def visit_Num(self, node):
+        return repr(node.value)
+
+    def typed_String(self, node):
+        return "('STRING', {!r})".format(node.value)
+
+    visit_String = visit_Num
+
+    def typed_UnaryOp(self, node):
+        value = self.temporary()
+        return "('ARRAY' if ({} := {}).__class__ is ndarray else 'NUMBER', {})".format(value, self.visit(node), value)
+
+    def visit_UnaryOp(self, node):
+        operand = self.temporary()
+        value = self.temporary()
+        return '(floating({}, {!r}, {}) if ({} := {}({} := {})).__class__ is ndarray else {})'.format(
+            value, node.op.type, operand, value, '-' if node.op.type == MINUS else '+', operand,
+            self.visit(node.value), value)
+
+    def typed_ArrayLiteral(self, node):
+        return "('ARRAY', {})".format(self.visit(node))
+
+    def visit_ArrayLiteral(self, node):
+        return 'make_array([{}], {})'.format(
+            ', '.join(self.visit(element) for element in node.elements), self.location(node.token))
+
+    def typed_Index(self, node):
+        return "('NUMBER', {})".format(self.visit(node))
+
+    def visit_Index(self, node):
+        return 'element({}, {}, {})'.format(self.visit(node.value), self.visit(node.index), self.location(node.token))
+
+    def typed_Slice(self, node):
+        return "('ARRAY', {})".format(self.visit(node))
+
+    def visit_Slice(self, node):
+        return 'part({}, {}, {}, {})'.format(
+            self.visit(node.value), 'None' if node.start is None else self.visit(node.start),
+            'None' if node.end is None else self.visit(node.end), self.location(node.token))
+
+    def visit_If(self, node):
+        self.line('if {}:'.format(self.visit(node.cond)))
+        self.block(node.block)
+
+    def visit_While(self, node):
+        self.line('while {}:'.format(self.visit(node.cond)))
+        self.block(node.block)
+
+    def visit_Assign(self, node):
+        return 'assign(scope, {!r}, {}, {})'.format(
+            node.left.value, self.location(node.left.token), self.typed(node.right))
+
+    def visit_VarDeclaration(self, node):
+        names = tuple((variable.value, self.location(variable)) for variable in node.names)
+        return 'declare_variables(scope, {!r}, {!r})'.format(node.type.value, names)
+
+    def visit_Return(self, node):
+        self.line('if scope.scope_level == 1 or scope.enclosing_scope.scope_name != "function":')
+        self.line(INDENT + 'cannot_return()')
+        self.line('runtime.returned = {}'.format(self.typed(node.value)))
+        if self.blocks:
+            # scopes of the blocks left by return; call leaves the scope of the function
+            self.line('leave_scope(' * self.blocks + 'scope' + ')' * self.blocks)
+        self.line('return runtime.returned')
+
+    def typed_Var(self, node):
+        symbol = self.temporary()
+        return '(({} := {}).type.name, {}.value)'.format(symbol, self.lookup(node), symbol)
+
+    def visit_Var(self, node):
+        return self.lookup(node) + '.value'
+
+    def lookup(self, node):
+        return '(scope.lookup({!r}) or missing_symbol({!r}, {}))'.format(
+            node.value, node.value, self.location(node.token))
+
+    def visit_ConditionalVal(self, node):
+        left = self.visit(node.left)
+        right = self.visit(node.right)
+        op = node.op.type
+        if op == AND or op == OR:
+            # both operands are evaluated, as in Interpreter
+            operands = self.temporary()
+            return '(({} := ({}, {}))[0] {} {}[1])'.format(
+                operands, left, right, 'and' if op == AND else 'or', operands)
+        return '({} {} {})'.format(left, OPERATORS[op], right)
+
+    def visit_NoOp(self, node):
+        pass
+
+    def typed_SharedExpression(self, node):
+        self.sharing = True
+        return '(shared[{0}] if {0} in shared else shared.setdefault({0}, {1}))'.format(
+            node.slot, self.typed(node.expression))
+
+    def visit_SharedExpression(self, node):
+        return self.typed_SharedExpression(node) + '[1]'
+
+    def visit_SharingRegion(self, node):
+        self.sharing = True
+        self.line('for _slot in {!r}: shared.pop(_slot, None)'.format(tuple(node.slots)))
+        self.statement(node.statement)
+
+
+class PythonRuntime(object):
+    """
+    Runs module made by PythonTranspiler: provides the helpers the generated code calls and
+    keeps external functions and the value returned by the last return statement.
+    """
+    def __init__(self, locations, memo_size=MEMO_SIZE):
+        """
+        :param locations: LOCATIONS of the module.
+        :param memo_size: Number of results of every pure function kept, 0 turns memoization off.
+        """
+        self.locations = locations
+        self.global_scope = None
+        self.scopes = ScopePool()
+        # external functions bound from modules declared in Declarations
+        self.externals = ExternalTable()
+        # (type name, value) returned by the last return statement, like Interpreter.GLOBAL_RETURN
+        self.returned = None
+        self.memos = Memos(memo_size)
+
+    def namespace(self):
+        """
+        Return names the generated code uses, besides the ones it defines.
+        """
+        return {
+            'runtime': self,
+            'enter_scope': self.scopes.enter,
+            'leave_scope': self.scopes.leave,
+            'missing_symbol': self.missing_symbol,
+            'missing_function': self.missing_function,
+            'cannot_return': self.cannot_return,
+            'assign': self.assign,
+            'call': self.call,
+            'declare_variables': self.declare_variables,
+            'define_function': self.define_function,
+            'declare_type': self.declare_type,
+            'bind_external': self.bind_external,
+            'ndarray': arrays.ndarray,
+            'floating': arrays.floating,
+            'make_array': self.make_array,
+            'element': self.element,
+            'part': self.part,
+        }
+
+    def run(self, program):
+        """
+        Run program function of the module in a new global scope and print the scope.
+        """
+        self.start(program)
+        self.finish()
+
+    def start(self, program):
+        """
+        Run program function of the module in a new global scope, which is kept until finish().
+        """
+        print('ENTER scope: global')
+        self.global_scope = ScopedSymbolTable(
+            scope_name='global',
+            scope_level=1,
+            enclosing_scope=None,
+        )
+        self.global_scope._init_builtins()
+        program(self.global_scope)
+
+    def finish(self):
+        print(self.global_scope)
+        print('LEAVE scope: global')
+        self.memos.print_report()
+
+    def missing_symbol(self, name, location):
+        raise Exception(
+            "Error: Symbol not found '%s'%s" % (name, self.locations[location])
+        )
+
+    def missing_function(self, name, location):
+        raise Exception(
+            "Error: Unidentified function \"%s\"%s" % (name, self.locations[location])
+        )
+
+    def cannot_return(self):
+        raise Exception(
+            "Cannot return outside of function"
+        )
+
+    def assign(self, scope, var_name, location, value):
+        value_type, value_value = value
+
+        var_symbol = scope.lookup(var_name)
+        if var_symbol is None:
+            raise Exception(
+                "Error: Unidentified variable \"%s\"%s" % (var_name, self.locations[location])
+            )
+        type_name = var_symbol.type.name
+        if type_name == 'VAR' and (value_type != 'STRING' and value_type != 'NUMBER' and value_type != 'VAR'):
+            raise TypeError("TypeError: Expected {} and got {}".format('VAR', value_type)
+                            + self.locations[location])
+        elif type_name != 'VAR' and type_name != value_type:
+            raise TypeError("TypeError: Expected {} and got {}".format(var_symbol.type, value_type)
+                            + self.locations[location])
+
+        var_symbol.value = value_value
+        self.returned = None
+
+    def call(self, scope, func_symbol, location, variables, *values):
+        """
+        Call function with evaluated (type name, value) arguments and return its (type name, value).
+        """
+        if isinstance(func_symbol, ExternalFunctionSymbol):
+            call = func_symbol.external.caller(variables)
+            return func_symbol.return_type.name, call([v[0] for v in values], [v[1] for v in values],
+                                                      lambda: self.locations[location])
+
+        memo = func_symbol.memo
+        key = memo.key([value[1] for value in values]) if memo is not None else None
+        if key is not None:
+            returned = memo.get(key)
+            if returned is not MISSING:
+                self.returned = returned
+                return returned
+
+        function_scope = self.scopes.enter("function", scope)
+        var_type = function_scope.lookup('VAR')
+        for arg_name, value in zip(func_symbol.arguments, values):
+            arg_type = var_type if value[1].__class__ is not arrays.ndarray else function_scope.lookup('ARRAY')
+            function_scope.insert(VarSymbol(arg_name, arg_type, value[1]))
+
+        returned = func_symbol.body(function_scope)
+        self.scopes.leave(function_scope)
+        if returned is None:
+            # value of the function which did not return any
+            return self.returned
+        if key is not None:
+            memo.put(key, returned)
+        return returned
+
+    def make_array(self, values, location):
+        return arrays.make_array(values, lambda: self.locations[location])
+
+    def element(self, array, index, location):
+        return arrays.element(array, index, lambda: self.locations[location])
+
+    def part(self, array, start, end, location):
+        return arrays.part(array, start, end, lambda: self.locations[location])
+
+    def declare_variables(self, scope, type_name, names):
+        var_type = scope.lookup(type_name)
+
+        for name, location in names:
+            var_symbol = VarSymbol(name, var_type, None)
+            if scope.lookup(name, current_scope_only=True):
+                raise Exception(
+                    "Error: Duplicate identifier '%s' found%s" % (name, self.locations[location])
+                )
+            scope.insert(var_symbol)
+
+    def define_function(self, scope, name, location, arguments, body, pure):
+        # generated function is kept in place of the body node
+        func_symbol = FunctionSymbol(name, body, list(arguments), memo=self.memos.memo(body, name, pure))
+        if scope.lookup(name, current_scope_only=True):
+            raise Exception(
+                "Error: Duplicate identifier '%s' found%s" % (name, self.locations[location])
+            )
+        scope.insert(func_symbol)
+
+    def declare_type(self, scope, name):
+        if name != 'STRING' and name != 'NUMBER':
+            scope.insert(BuiltinTypeSymbol(name))
+
+    def bind_external(self, scope, module_name, function_name, return_type_name, args_types, pure):
+        if return_type_name is not None:
+            return_type = scope.lookup(return_type_name)
+        else:
+            return_type = BuiltinTypeSymbol("NULL")
+
+        args_symbols = []
+        for arg_type in args_types:
+            arg_sym = scope.lookup(arg_type)
+            if arg_sym is None:
+                raise TypeError(
+                    "Type \"{}\" was not declared and is being used in function \"{}\" declaration".format(
+                        arg_type, function_name)
+                )
+            args_symbols.append(arg_sym)
+
+        memo = self.memos.memo((module_name, function_name), function_name, pure)
+        external = self.externals.bind(module_name, function_name, [arg.name for arg in args_symbols], memo)
+        scope.insert(ExternalFunctionSymbol(function_name, args_symbols, return_type, memo, external))
+
+
+def save_module(source, path):
+    """
+    Write generated module source to the path, replacing the file at once.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    descriptor, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'w') as f:
+            f.write(source)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def load_module(path):
+    """
+    Import module saved by save_module. Python keeps its bytecode in __pycache__,
+    so the module is compiled only once.
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    version = getattr(module, 'FORMAT_VERSION', None)
+    if version != FORMAT_VERSION:
+        raise ImportError('{} was generated by transpiler version {}, expected {}'.format(
+            path, version, FORMAT_VERSION))
+    return module
+
+
+def run_module(module, memo_size=MEMO_SIZE):
+    """
+    Run module made by PythonTranspiler, loaded with load_module.
+    :param memo_size: Number of results of every pure function kept, 0 turns memoization off.
+    """
+    runtime = PythonRuntime(module.LOCATIONS, memo_size)
+    vars(module).update(runtime.namespace())
+    runtime.run(module.program)
+    return runtime
+
+
+class PythonInterpreter(object):
+    """
+    Execution engine which transpiles the program into Python source, compiles it with compile()
+    and runs the code object. Scopes, symbols, printed output and error messages are the same
+    as in Interpreter.
+    """
+    def __init__(self, parser, memo_size=MEMO_SIZE):
+        """
+        :param memo_size: Number of results of every pure function kept, 0 turns memoization off.
+        """
+        self.parser = parser
+        self.memo_size = memo_size
+        self.runtime = None
+        # transpiler of the program and globals of its module, kept to compile calls of the host
+        self.transpiler = None
+        self.namespace = None
+        # (function name, number of arguments) -> HostCall
+        self.host_calls = {}
+
+    def transpile(self, source_name='<audioscript>'):
+        """
+        Return source of the module running the program.
+        :param source_name: Name of the script, written in the module docstring.
+        """
+        self.transpiler = PythonTranspiler(self.parser)
+        return self.transpiler.transpile(self.parser.parse(), source_name)
+
+    def interpret(self):
+        self.start()
+        self.finish()
+
+    def start(self):
+        """
+        Run the program like interpret(), but keep its global scope, so the host can call() its
+        functions, until finish().
+        """
+        source = self.transpile()
+        code = compile(source, '<audioscript>', 'exec')
+        self.namespace = {'__name__': '<audioscript>'}
+        exec(code, self.namespace)
+        self.runtime = PythonRuntime(self.namespace['LOCATIONS'], self.memo_size)
+        self.namespace.update(self.runtime.namespace())
+        self.runtime.start(self.namespace['program'])
+
+    def call(self, name, *values):
+        """
+        Call function of the started program with the values as arguments, see HostCall, and
+        return the value it returned, None when it returned none.
+        """
+        call = host_call(self.host_calls, name, len(values))
+        runtime = self.runtime
+        if call.compiled is None:
+            expression = self.transpiler.typed(call.node)
+            # the call may add locations of its own
+            runtime.locations = tuple(self.transpiler.locations)
+            call.compiled = eval(compile('lambda scope: ' + expression, '<audioscript>', 'eval'), self.namespace)
+        scope = call.enter(runtime.scopes, runtime.global_scope, values)
+        runtime.returned = None
+        call.compiled(scope)
+        runtime.scopes.leave(scope)
+        return runtime.returned[1] if runtime.returned is not None else None
+
+    def finish(self):
+        self.runtime.finish()
@@ -0,0 +1,242 @@
+from audioscript.interpreter.Interpreter import NodeVisitor
+from audioscript.interpreter.resolver import PARAMETER, Resolver
+from audioscript.pars.Parser import ExternalFunctionDeclaration, Var, VarDeclaration
+
+BUILTIN_TYPES = ('NUMBER', 'STRING', 'VAR')
+# Type of array values and of the variables holding them.
+ARRAY_TYPE = 'ARRAY'
+
+
+class TypeCheck(object):
+    """
+    Result of the TypeChecker.
+    """
+    def __init__(self):
+        # Assign nodes whose type check always passes
+        self.assignments = set()
+        # FunctionCall node calling external function whose argument checks always pass ->
+        # static type of the returned value
+        self.calls = {}
+        # messages of the type errors found
+        self.errors = []
+
+
+class TypeChecker(NodeVisitor):
+    """
+    Checks types of the program before it runs, with the rules Interpreter applies in
+    visit_Assign and the argument checks of ExternalFunction.
+
+    The static type of an expression is the type name Interpreter gives its value, or None when
+    it is known only at run time: values returned by user functions, parameters, which hold arrays
+    when given ones, and variables whose declaration is not known. The declaration of a referenced name is known when the Resolver resolved the
+    reference, or when the name is declared only once in the whole program, as then every lookup
+    which succeeds finds that declaration.
+
+    Assignments and external function calls whose checks pass for every execution are collected,
+    so engines can skip the checks; variables passed where NUMBER or STRING is expected are still
+    checked by value at run time. Assignments and arguments which fail for every execution are
+    reported as errors.
+    """
+    def __init__(self, parser):
+        self.parser = parser
+        self.result = None
+        self.resolution = None
+        self.types = set(BUILTIN_TYPES)
+        self.types.add(ARRAY_TYPE)
+
+    def location(self, token):
+        offset = getattr(token, 'offset', None)
+        if offset is None:
+            return ''
+        return ' at ' + self.parser.describe_location(offset)
+
+    def check(self, tree, resolution=None):
+        """
+        Return TypeCheck of the program tree.
+        :param resolution: Resolution of the tree, resolved when not given.
+        """
+        self.result = TypeCheck()
+        self.resolution = resolution if resolution is not None else Resolver().resolve(tree)
+        self.visit(tree)
+        return self.result
+
+    def error(self, expected, got, token):
+        self.result.errors.append("TypeError: Expected {} and got {}".format(expected, got) + self.location(token))
+
+    def declaration(self, node):
+        """
+        Return declaration of the name referenced by Var node, None when not known.
+        """
+        declaration = self.resolution.declarations.get(node)
+        if declaration is None:
+            declarations = self.resolution.names.get(node.value, ())
+            if len(declarations) == 1 and node.value not in self.types:
+                declaration = declarations[0]
+        return declaration
+
+    def declared_type(self, node):
+        """
+        Return name of the declared type of the variable referenced by Var node, None when not known.
+        """
+        declaration = self.declaration(node)
+        if declaration is PARAMETER:
+            # var, or array when given one
+            return None
+        if isinstance(declaration, VarDeclaration) and declaration.type.value in self.types:
+            return declaration.type.value
+
+    def visit_Program(self, node):
+        if node.declarations is not None:
+            self.visit(node.declarations)
+        if node.code is not None:
+            self.visit(node.code)
+
+    def visit_Declarations(self, node):
+        for ext_type in node.types:
+            self.types.add(ext_type.name)
+        for module in node.modules:
+            for function in module.functions:
+                for arg_type in function.arguments_types:
+                    if arg_type not in self.types:
+                        self.result.errors.append(
+                            "Type \"{}\" was not declared and is being used in function \"{}\" declaration".format(
+                                arg_type, function.name)
+                        )
+
+    def visit_BlockStat(self, node):
+        self.visit(node.list)
+
+    def visit_StatList(self, node):
+        for statement in node.statements:
+            self.visit(statement)
+
+    def visit_FunctionDeclaration(self, node):
+        self.visit(node.body)
+
+    def visit_If(self, node):
+        self.visit(node.cond)
+        self.visit(node.block)
+
+    visit_While = visit_If
+
+    def visit_Return(self, node):
+        self.visit(node.value)
+
+    def visit_VarDeclaration(self, node):
+        pass
+
+    visit_NoOp = visit_VarDeclaration
+
+    def visit_Num(self, node):
+        return 'NUMBER'
+
+    def visit_String(self, node):
+        return 'STRING'
+
+    def visit_UnaryOp(self, node):
+        value = self.visit(node.value)
+        if value == ARRAY_TYPE:
+            return ARRAY_TYPE
+        if value in BUILTIN_TYPES:
+            return 'NUMBER'
+
+    def visit_BinOp(self, node):
+        left = self.visit(node.left)
+        right = self.visit(node.right)
+        # arithmetic with an array gives array, whatever the type of the left operand
+        if left == ARRAY_TYPE or right == ARRAY_TYPE:
+            return ARRAY_TYPE
+        if right is not None and left in BUILTIN_TYPES:
+            return left
+
+    def visit_ArrayLiteral(self, node):
+        for element in node.elements:
+            element_type = self.visit(element)
+            if element_type is not None and element_type not in ('NUMBER', 'VAR'):
+                self.error('NUMBER', element_type, node.token)
+        return ARRAY_TYPE
+
+    def subscripted(self, node):
+        """
+        Check that the value indexed or sliced by the node is an array.
+        """
+        value_type = self.visit(node.value)
+        if value_type is not None and value_type != ARRAY_TYPE:
+            self.error(ARRAY_TYPE, value_type, node.token)
+
+    def visit_Index(self, node):
+        self.subscripted(node)
+        self.visit(node.index)
+        return 'NUMBER'
+
+    def visit_Slice(self, node):
+        self.subscripted(node)
+        for bound in (node.start, node.end):
+            if bound is not None:
+                self.visit(bound)
+        return ARRAY_TYPE
+
+    def visit_ConditionalVal(self, node):
+        self.visit(node.left)
+        self.visit(node.right)
+
+    def visit_Var(self, node):
+        return self.declared_type(node)
+
+    def visit_SharedExpression(self, node):
+        return self.visit(node.expression)
+
+    def visit_SharingRegion(self, node):
+        self.visit(node.statement)
+
+    def visit_Assign(self, node):
+        value_type = self.visit(node.right)
+        var_type = self.declared_type(node.left)
+        if value_type is None or var_type is None:
+            return
+        if var_type == 'VAR' and value_type not in BUILTIN_TYPES:
+            self.error('VAR', value_type, node.left.token)
+        elif var_type != 'VAR' and var_type != value_type:
+            self.error(var_type, value_type, node.left.token)
+        else:
+            self.result.assignments.add(node)
+
+    def visit_FunctionCall(self, node):
+        types = [self.visit(arg) for arg in node.args]
+        function = self.declaration(node.function)
+        if not isinstance(function, ExternalFunctionDeclaration):
+            return
+        proven = len(node.args) == len(function.arguments_types)
+        for arg, formal, arg_type in zip(node.args, function.arguments_types, types):
+            if formal not in self.types:
+                proven = False
+            elif isinstance(arg, Var):
+                arg_type = self.declared_type(arg)
+                # numbers and strings are told apart by the value
+                if formal == 'NUMBER' or formal == 'STRING' or arg_type is None:
+                    proven = False
+                elif arg_type != formal:
+                    self.error(formal, arg_type, node.function.token)
+                    proven = False
+            elif arg_type == 'NUMBER' or arg_type == 'VAR':
+                if formal != 'NUMBER' and formal != 'VAR':
+                    self.error(formal, 'NUMBER', node.function.token)
+                    proven = False
+            elif arg_type == 'STRING':
+                if formal != 'STRING' and formal != 'VAR':
+                    self.error(formal, 'STRING', node.function.token)
+                    proven = False
+            elif arg_type is None:
+                proven = False
+            elif arg_type != formal:
+                self.error(formal, arg_type, node.function.token)
+                proven = False
+        if function.return_type is None:
+            return_type = 'NULL'
+        elif function.return_type in self.types:
+            return_type = function.return_type
+        else:
+            return_type = None
+        if proven:
+            self.result.calls[node] = return_type
+        return return_type
@@ -0,0 +1,230 @@
+import operator
+
+from audioscript.interpreter.Interpreter import Interpreter
+from audioscript.interpreter.arrays import element, floating, make_array, ndarray, part
+from audioscript.interpreter.memo import MEMO_SIZE, MISSING
+from audioscript.lexer.Lexer import get_tokens
+from interpreter.symbol_table import VarSymbol
+
+globals().update(get_tokens())
+
+ARITHMETIC_OPERATIONS = {PLUS: operator.add, MINUS: operator.sub, MUL: operator.mul, DIV: operator.truediv}
+CONDITIONAL_OPERATIONS = {EQ: operator.eq, NEQ: operator.ne, LT: operator.lt, MT: operator.gt,
+                          LEQT: operator.le, MEQT: operator.ge}
+
+
+class UnboxedInterpreter(Interpreter):
+    """
+    Interpreter evaluating expressions to plain Python values instead of VarSymbols made for
+    every intermediate result; VarSymbols are made only for declared variables and parameters.
+
+    visit() of an expression returns its value. Where the type is checked, typed() is used: it
+    returns the value as well and leaves the type name in value_type. Value returned by the last
+    return statement is kept in returned_type and returned_value, in place of GLOBAL_RETURN.
+    Values of SharedExpressions are kept as (type name, value) pairs.
+    """
+    _typed_visitors = {}
+
+    def __init__(self, parser, memo_size=MEMO_SIZE):
+        super().__init__(parser, memo_size)
+        self.value_type = None
+        self.returned_type = None
+        self.returned_value = None
+
+    def typed(self, node):
+        """
+        Return value of the expression and leave its type name in value_type.
+        """
+        try:
+            typed = self._typed_visitors[node.__class__]
+        except KeyError:
+            typed = getattr(UnboxedInterpreter, 'typed_' + node.__class__.__name__, None)
+            if typed is None:
+                typed = UnboxedInterpreter.typed_statement
+            self._typed_visitors[node.__class__] = typed
+        return typed(self, node)
+
+    def typed_statement(self, node):
+        # assignment or declaration, which have no value
+        self.visit(node)
+        self.value_type = None
+
+    def visit_FunctionCall(self, node):
+        cache = self.callee(node)
+        func_symbol = cache.symbol
+
+        if cache.function is not None:
+            types = []
+            values = []
+            for arg in node.args:
+                values.append(self.typed(arg))
+                types.append(self.value_type)
+            self.value_type = func_symbol.return_type.name
+            return cache.function(types, values, lambda: self.location(node.function.token))
+
+        values = [self.visit(arg) for arg in node.args]
+        memo = func_symbol.memo
+        key = memo.key(values) if memo is not None else None
+        if key is not None:
+            result = memo.get(key)
+            if result is not MISSING:
+                self.returned_type, self.returned_value = result
+                self.value_type = self.returned_type
+                return self.returned_value
+
+        function_scope = self.scopes.enter("function", self.current_scope)
+        self.current_scope = function_scope
+
+        for name, value in zip(func_symbol.arguments, values):
+            self.declare(VarSymbol(name, function_scope.lookup('ARRAY' if value.__class__ is ndarray else 'VAR'), value))
+
+        self.visit(func_symbol.body)
+        if key is not None and self.FUNCTION_CALL_RETURN_FLAG:
+            memo.put(key, (self.returned_type, self.returned_value))
+        self.FUNCTION_CALL_RETURN_FLAG = False
+
+        self.current_scope = self.leave_scope(function_scope)
+        self.value_type = self.returned_type
+        return self.returned_value
+
+    typed_FunctionCall = visit_FunctionCall
+
+    def host_value(self, node):
+        self.returned_type = self.returned_value = None
+        return self.visit(node)
+
+    def typed_BinOp(self, node):
+        left = self.typed(node.left)
+        left_type = self.value_type
+        right = self.visit(node.right)
+        value = ARITHMETIC_OPERATIONS[node.op.type](left, right)
+        if value.__class__ is ndarray:
+            self.value_type = 'ARRAY'
+            return floating(value, node.op.type, left, right)
+        self.value_type = left_type
+        return value
+
+    def visit_BinOp(self, node):
+        left = self.visit(node.left)
+        right = self.visit(node.right)
+        value = ARITHMETIC_OPERATIONS[node.op.type](left, right)
+        if value.__class__ is ndarray:
+            return floating(value, node.op.type, left, right)
+        return value
+
+    def typed_Num(self, node):
+        self.value_type = 'NUMBER'
+        return node.value
+
+    def visit_Num(self, node):
+        return node.value
+
+    def typed_String(self, node):
+        self.value_type = 'STRING'
+        return node.value
+
+    visit_String = visit_Num
+
+    def typed_UnaryOp(self, node):
+        value = self.visit_UnaryOp(node)
+        self.value_type = 'ARRAY' if value.__class__ is ndarray else 'NUMBER'
+        return value
+
+    def visit_UnaryOp(self, node):
+        value = self.visit(node.value)
+        result = -value if node.op.type == MINUS else +value
+        if result.__class__ is ndarray:
+            return floating(result, node.op.type, value)
+        return result
+
+    def typed_ArrayLiteral(self, node):
+        value = self.visit_ArrayLiteral(node)
+        self.value_type = 'ARRAY'
+        return value
+
+    def visit_ArrayLiteral(self, node):
+        return make_array([self.visit(element) for element in node.elements], lambda: self.location(node.token))
+
+    def typed_Index(self, node):
+        value = self.visit_Index(node)
+        self.value_type = 'NUMBER'
+        return value
+
+    def visit_Index(self, node):
+        return element(self.visit(node.value), self.visit(node.index), lambda: self.location(node.token))
+
+    def typed_Slice(self, node):
+        value = self.visit_Slice(node)
+        self.value_type = 'ARRAY'
+        return value
+
+    def visit_Slice(self, node):
+        start = self.visit(node.start) if node.start is not None else None
+        end = self.visit(node.end) if node.end is not None else None
+        return part(self.visit(node.value), start, end, lambda: self.location(node.token))
+
+    def visit_Assign(self, node):
+        value = self.typed(node.right)
+        value_type = self.value_type
+
+        node = node.left
+        var_name = node.value
+
+        var_symbol = self.current_scope.lookup(var_name)
+        if var_symbol is None:
+            raise Exception(
+                "Error: Unidentified variable \"%s\"%s" % (var_name, self.location(node.token))
+            )
+        if var_symbol.type.name == 'VAR' and (value_type != 'STRING' and value_type != 'NUMBER' and value_type != 'VAR'):
+            raise TypeError("TypeError: Expected {} and got {}".format('VAR', value_type) + self.location(node.token))
+        elif var_symbol.type.name != 'VAR' and var_symbol.type.name != value_type:
+            raise TypeError("TypeError: Expected {} and got {}".format(var_symbol.type, value_type) + self.location(node.token))
+
+        var_symbol.value = value
+        self.returned_type = self.returned_value = None
+
+    def visit_Return(self, node):
+        if self.current_scope.scope_level == 1 or self.current_scope.enclosing_scope.scope_name != "function":
+            raise Exception(
+                "Cannot return outside of function"
+            )
+        self.returned_value = self.typed(node.value)
+        self.returned_type = self.value_type
+        self.FUNCTION_CALL_RETURN_FLAG = True
+
+    def lookup(self, node):
+        var_symbol = self.current_scope.lookup(node.value)
+        if var_symbol is None:
+            raise Exception(
+                "Error: Symbol not found '%s'%s" % (node.value, self.location(node.token))
+            )
+        return var_symbol
+
+    def typed_Var(self, node):
+        var_symbol = self.lookup(node)
+        self.value_type = var_symbol.type.name
+        return var_symbol.value
+
+    def visit_Var(self, node):
+        return self.lookup(node).value
+
+    def typed_SharedExpression(self, node):
+        try:
+            self.value_type, value = self.shared[node.slot]
+        except KeyError:
+            value = self.typed(node.expression)
+            self.shared[node.slot] = (self.value_type, value)
+        return value
+
+    visit_SharedExpression = typed_SharedExpression
+
+    def visit_ConditionalVal(self, node):
+        lval = self.visit(node.left)
+        rval = self.visit(node.right)
+
+        op = node.op.type
+        if op == AND:
+            return lval and rval
+        elif op == OR:
+            return lval or rval
+        return CONDITIONAL_OPERATIONS[op](lval, rval)
@@ -0,0 +1,442 @@
+from audioscript.interpreter.Interpreter import InlineCache
+from audioscript.interpreter.arrays import element, floating, make_array, ndarray, part
+from audioscript.interpreter.bytecode import OPCODES, BytecodeCompiler
+from audioscript.interpreter.externals import ExternalTable
+from audioscript.interpreter.host import host_call
+from audioscript.interpreter.memo import MEMO_SIZE, MISSING, Memos
+from audioscript.lexer.Lexer import get_tokens
+from interpreter.symbol_table import (ScopedSymbolTable, ScopePool, VarSymbol, FunctionSymbol, BuiltinTypeSymbol,
+                                      ExternalFunctionSymbol)
+
+# tokens name the operations of floating, opcodes take precedence as in bytecode
+globals().update(get_tokens())
+globals().update(OPCODES)
+
+
+class VirtualMachine(object):
+    """
+    Stack based virtual machine running code compiled by BytecodeCompiler.
+
+    Calls of user functions push a frame on an explicit frame stack instead of recursing, so the
+    call depth is not limited by the Python stack. Every frame keeps values of its SharedExpressions,
+    as (type name, value) pairs by slot, created when the first one is computed. Scopes, symbols, printed output and error
+    messages are the same as in Interpreter.
+
+    `return f(...)` of a user function pushes no frame: f returns to the caller at once. Its scopes
+    are kept, as f sees the variables of the function, so the memory still grows with the depth,
+    but less. Every call site caches the function it found, as Interpreter does, so deep recursion
+    does not look the name up through the scopes of all the callers; variables of the callers are
+    still looked up so.
+
+    Results of pure functions are kept with the frame of the call until it returns; a tail call
+    adds the called function to the frame it returns from.
+    """
+    def __init__(self, parser, memo_size=MEMO_SIZE):
+        """
+        :param memo_size: Number of results of every pure function kept, 0 turns memoization off.
+        """
+        self.parser = parser
+        self.global_scope = None
+        self.scopes = ScopePool()
+        # CallSite -> InlineCache
+        self.inline_caches = {}
+        # external functions bound from modules declared in Declarations
+        self.externals = ExternalTable()
+        # (type name, value) returned by the last return statement, like Interpreter.GLOBAL_RETURN
+        self.returned = None
+        self.memos = Memos(memo_size)
+        # names of the functions whose calls are cached; declaring one of them or leaving a scope
+        # which declares one changes the epoch, so the cached calls look the function up again
+        self.called = set()
+        self.epoch = 0
+        # (function name, number of arguments) -> HostCall
+        self.host_calls = {}
+
+    def location(self, token):
+        """
+        Return position of the token in the source for error messages.
+        """
+        offset = getattr(token, 'offset', None)
+        if offset is None:
+            return ''
+        return ' at ' + self.parser.describe_location(offset)
+
+    def compile(self):
+        return BytecodeCompiler().compile(self.parser.parse())
+
+    def interpret(self):
+        self.start()
+        self.finish()
+
+    def start(self):
+        """
+        Run the program like interpret(), but keep its global scope, so the host can call() its
+        functions, until finish().
+        """
+        code = self.compile()
+
+        print('ENTER scope: global')
+        self.global_scope = ScopedSymbolTable(
+            scope_name='global',
+            scope_level=1,
+            enclosing_scope=None,
+        )
+        self.global_scope._init_builtins()
+        self.run(code, self.global_scope)
+
+    def call(self, name, *values):
+        """
+        Call function of the started program with the values as arguments, see HostCall, and
+        return the value it returned, None when it returned none.
+        """
+        call = host_call(self.host_calls, name, len(values))
+        if call.compiled is None:
+            call.compiled = BytecodeCompiler().compile_statement(call.node)
+        scope = call.enter(self.scopes, self.global_scope, values)
+        self.returned = None
+        self.run(call.compiled, scope)
+        self.scopes.leave(scope)
+        return self.returned[1] if self.returned is not None else None
+
+    def finish(self):
+        """
+        Leave the global scope of the started program, printing it as interpret() does.
+        """
+        print(self.global_scope)
+        print('LEAVE scope: global')
+        self.memos.print_report()
+
+    def run(self, code_object, scope):
+        """
+        Execute code object in the scope until HALT.
+        """
+        # frames of the functions being called: (code object, return index, caller scope, call opcode,
+        # caller shared values, (memo, key) pairs the returned value is kept under or None)
+        frames = []
+        shared = None
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        code = code_object.code
+        constants = code_object.constants
+        names = code_object.names
+        scopes = self.scopes
+        caches = self.inline_caches
+        global_scope = self.global_scope
+        called = self.called
+        epoch = self.epoch
+        pc = 0
+
+        while True:
+            opcode = code[pc]
+            argument = code[pc + 1]
+            pc += 2
+
+            if opcode == LOAD_NAME:
+                var_symbol = scope.lookup(names[argument])
+                if var_symbol is None:
+                    raise Exception(
+                        "Error: Symbol not found '%s'%s" % (names[argument], self.location(code_object.tokens[argument]))
+                    )
+                push(var_symbol.value)
+            elif opcode == LOAD_CONST:
+                push(constants[argument])
+            elif opcode == BINARY_ADD:
+                right = pop()
+                left = stack[-1]
+                stack[-1] = value = left + right
+                if value.__class__ is ndarray:
+                    stack[-1] = floating(value, PLUS, left, right)
+            elif opcode == BINARY_SUBTRACT:
+                right = pop()
+                left = stack[-1]
+                stack[-1] = value = left - right
+                if value.__class__ is ndarray:
+                    stack[-1] = floating(value, MINUS, left, right)
+            elif opcode == BINARY_MULTIPLY:
+                right = pop()
+                left = stack[-1]
+                stack[-1] = value = left * right
+                if value.__class__ is ndarray:
+                    stack[-1] = floating(value, MUL, left, right)
+            elif opcode == BINARY_DIVIDE:
+                right = pop()
+                left = stack[-1]
+                stack[-1] = value = left / right
+                if value.__class__ is ndarray:
+                    stack[-1] = floating(value, DIV, left, right)
+            elif opcode == ARRAY_TYPE:
+                if stack[-1].__class__ is ndarray:
+                    stack[-2] = 'ARRAY'
+            elif opcode == POP_JUMP_IF_FALSE:
+                if not pop():
+                    pc = argument
+            elif opcode == JUMP:
+                pc = argument
+            elif opcode == COMPARE_LT:
+                right = pop()
+                stack[-1] = stack[-1] < right
+            elif opcode == COMPARE_GT:
+                right = pop()
+                stack[-1] = stack[-1] > right
+            elif opcode == COMPARE_EQ:
+                right = pop()
+                stack[-1] = stack[-1] == right
+            elif opcode == COMPARE_NE:
+                right = pop()
+                stack[-1] = stack[-1] != right
+            elif opcode == COMPARE_LE:
+                right = pop()
+                stack[-1] = stack[-1] <= right
+            elif opcode == COMPARE_GE:
+                right = pop()
+                stack[-1] = stack[-1] >= right
+            elif opcode == STORE_NAME:
+                value = pop()
+                value_type = pop()
+                var_name = names[argument]
+                var_symbol = scope.lookup(var_name)
+                if var_symbol is None:
+                    raise Exception(
+                        "Error: Unidentified variable \"%s\"%s" % (var_name, self.location(code_object.tokens[argument]))
+                    )
+                type_name = var_symbol.type.name
+                if type_name == 'VAR' and (value_type != 'STRING' and value_type != 'NUMBER' and value_type != 'VAR'):
+                    raise TypeError("TypeError: Expected {} and got {}".format('VAR', value_type)
+                                    + self.location(code_object.tokens[argument]))
+                elif type_name != 'VAR' and type_name != value_type:
+                    raise TypeError("TypeError: Expected {} and got {}".format(var_symbol.type, value_type)
+                                    + self.location(code_object.tokens[argument]))
+                var_symbol.value = value
+                self.returned = None
+            elif opcode == LOAD_NAME_TYPED:
+                var_symbol = scope.lookup(names[argument])
+                if var_symbol is None:
+                    raise Exception(
+                        "Error: Symbol not found '%s'%s" % (names[argument], self.location(code_object.tokens[argument]))
+                    )
+                push(var_symbol.type.name)
+                push(var_symbol.value)
+            elif opcode == CALL or opcode == CALL_TYPED or opcode == CALL_STATEMENT or opcode == TAIL_CALL:
+                site = constants[argument]
+                cache = caches.get(site)
+                if cache is not None and cache.epoch == epoch:
+                    cache.hits += 1
+                    func_symbol = cache.symbol
+                else:
+                    func_symbol = scope.lookup(site.name)
+                    if func_symbol is None:
+                        raise Exception(
+                            "Error: Unidentified function \"%s\"%s" % (site.name, self.location(site.token))
+                        )
+                    if cache is None:
+                        cache = caches[site] = InlineCache(site.variables)
+                        called.add(site.name)
+                    cache.misses += 1
+                    cache.epoch = epoch
+                    cache.symbol = func_symbol
+                    if isinstance(func_symbol, ExternalFunctionSymbol):
+                        cache.function = func_symbol.external.caller(site.variables)
+                    else:
+                        cache.function = None
+                count = len(site.variables)
+                if count:
+                    values = stack[-2 * count:]
+                    del stack[-2 * count:]
+                else:
+                    values = []
+
+                if cache.function is not None:
+                    result = cache.function(values[0::2], values[1::2], lambda: self.location(site.token))
+                    if opcode == CALL_TYPED or opcode == TAIL_CALL:
+                        push(func_symbol.return_type.name)
+                    if opcode != CALL_STATEMENT:
+                        push(result)
+                    continue
+
+                memo = func_symbol.memo
+                key = memo.key(values[1::2]) if memo is not None else None
+                if key is not None:
+                    returned = memo.get(key)
+                    if returned is not MISSING:
+                        self.returned = returned
+                        # the value of a tail call is returned by the RETURN which follows
+                        if opcode == CALL_TYPED or opcode == TAIL_CALL:
+                            push(returned[0])
+                        if opcode != CALL_STATEMENT:
+                            push(returned[1])
+                        continue
+
+                if opcode == TAIL_CALL:
+                    # the function returns to the caller of this one, whose frame is kept; the scopes
+                    # are kept too, as the function sees the variables of this one; CHECK_RETURN before
+                    # the arguments made sure there is a caller
+                    if key is not None:
+                        frame = frames[-1]
+                        if frame[5] is None:
+                            frames[-1] = frame[:5] + ([(memo, key)],)
+                        else:
+                            frame[5].append((memo, key))
+                else:
+                    frames.append((code_object, pc, scope, opcode, shared, None if key is None else [(memo, key)]))
+                function_scope = scopes.enter("function", scope)
+                # types are declared only in the global scope, the callers need not be searched
+                var_type = global_scope.lookup('VAR')
+                for name, value in zip(func_symbol.arguments, values[1::2]):
+                    if name in called:
+                        epoch += 1
+                    function_scope.insert(VarSymbol(
+                        name, var_type if value.__class__ is not ndarray else global_scope.lookup('ARRAY'), value))
+
+                shared = None
+                code_object = func_symbol.body
+                code = code_object.code
+                constants = code_object.constants
+                names = code_object.names
+                pc = 0
+                scope = function_scope
+            elif opcode == CHECK_RETURN:
+                if scope.scope_level == 1 or scope.enclosing_scope.scope_name != "function":
+                    raise Exception(
+                        "Cannot return outside of function"
+                    )
+            elif opcode == RETURN or opcode == END_FUNCTION:
+                if opcode == RETURN:
+                    value = pop()
+                    self.returned = (pop(), value)
+                code_object, pc, caller, call, shared, memoized = frames.pop()
+                # only results of return statements are kept, without one the call has no result of its own
+                if memoized is not None and opcode == RETURN:
+                    for memo, key in memoized:
+                        memo.put(key, self.returned)
+                # scopes of the function and of the blocks return left
+                while scope is not caller:
+                    if scope.declares(called):
+                        epoch += 1
+                    scope = scopes.leave(scope)
+                code = code_object.code
+                constants = code_object.constants
+                names = code_object.names
+                returned = self.returned
+                # the value is needed even when function did not return any
+                if call == CALL_TYPED:
+                    push(returned[0])
+                    push(returned[1])
+                elif call == CALL:
+                    push(returned[1])
+            elif opcode == POP_TOP:
+                pop()
+            elif opcode == ENTER_BLOCK:
+                scope = scopes.enter("block", scope)
+            elif opcode == LEAVE_BLOCK:
+                if scope.declares(called):
+                    epoch += 1
+                scope = scopes.leave(scope)
+            elif opcode == UNARY_MINUS:
+                value = stack[-1]
+                stack[-1] = result = -value
+                if result.__class__ is ndarray:
+                    stack[-1] = floating(result, MINUS, value)
+            elif opcode == UNARY_PLUS:
+                value = stack[-1]
+                stack[-1] = result = +value
+                if result.__class__ is ndarray:
+                    stack[-1] = floating(result, PLUS, value)
+            elif opcode == LOGICAL_AND:
+                right = pop()
+                stack[-1] = stack[-1] and right
+            elif opcode == LOGICAL_OR:
+                right = pop()
+                stack[-1] = stack[-1] or right
+            elif opcode == DECLARE_VARS:
+                declaration = constants[argument]
+                var_type = scope.lookup(declaration.type)
+                for variable in declaration.names:
+                    var_symbol = VarSymbol(variable.value, var_type, None)
+                    if scope.lookup(variable.value, current_scope_only=True):
+                        raise Exception(
+                            "Error: Duplicate identifier '%s' found%s" % (variable.value, self.location(variable))
+                        )
+                    if variable.value in called:
+                        epoch += 1
+                    scope.insert(var_symbol)
+            elif opcode == DEFINE_FUNCTION:
+                definition = constants[argument]
+                name = definition.name
+                # compiled body is kept in place of the body node
+                func_symbol = FunctionSymbol(name.value, definition.code, definition.arguments,
+                                             memo=self.memos.memo(definition, name.value, definition.pure))
+                if scope.lookup(name.value, current_scope_only=True):
+                    raise Exception(
+                        "Error: Duplicate identifier '%s' found%s" % (name.value, self.location(name))
+                    )
+                if name.value in called:
+                    epoch += 1
+                scope.insert(func_symbol)
+            elif opcode == DECLARE_TYPE:
+                name = constants[argument]
+                if name != 'STRING' and name != 'NUMBER':
+                    scope.insert(BuiltinTypeSymbol(name))
+            elif opcode == BIND_EXTERNAL:
+                self.bind_external(constants[argument], scope)
+            elif opcode == LOAD_SHARED:
+                value = constants[argument]
+                if shared is not None and value.slot in shared:
+                    value_type, value_value = shared[value.slot]
+                    if value.typed:
+                        push(value_type)
+                    push(value_value)
+                    pc = value.end
+            elif opcode == STORE_SHARED:
+                value = constants[argument]
+                if shared is None:
+                    shared = {}
+                shared[value.slot] = (stack[-2], stack[-1])
+                if not value.typed:
+                    del stack[-2]
+            elif opcode == CLEAR_SHARED:
+                if shared:
+                    for slot in constants[argument]:
+                        shared.pop(slot, None)
+            elif opcode == BUILD_ARRAY:
+                operation = constants[argument]
+                if operation.count:
+                    values = stack[-operation.count:]
+                    del stack[-operation.count:]
+                else:
+                    values = []
+                push(make_array(values, lambda: self.location(operation.token)))
+            elif opcode == BINARY_SUBSCRIPT:
+                index = pop()
+                operation = constants[argument]
+                stack[-1] = element(stack[-1], index, lambda: self.location(operation.token))
+            elif opcode == BINARY_SLICE:
+                end = pop()
+                start = pop()
+                operation = constants[argument]
+                stack[-1] = part(stack[-1], start, end, lambda: self.location(operation.token))
+            elif opcode == HALT:
+                self.epoch = epoch
+                return
+            else:
+                raise Exception('Invalid opcode {} at {} in {}'.format(opcode, pc - 2, code_object.name))
+
+    def bind_external(self, binding, scope):
+        if binding.return_type is not None:
+            return_type = scope.lookup(binding.return_type)
+        else:
+            return_type = BuiltinTypeSymbol("NULL")
+
+        args_symbols = []
+        for arg_type in binding.arguments_types:
+            arg_sym = scope.lookup(arg_type)
+            if arg_sym is None:
+                raise TypeError(
+                    "Type \"{}\" was not declared and is being used in function \"{}\" declaration".format(
+                        arg_type, binding.name)
+                )
+            args_symbols.append(arg_sym)
+
+        memo = self.memos.memo(binding, binding.name, binding.pure)
+        external = self.externals.bind(binding.module, binding.name, [arg.name for arg in args_symbols], memo)
+        scope.insert(ExternalFunctionSymbol(binding.name, args_symbols, return_type, memo, external))
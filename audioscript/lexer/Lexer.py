@@ -1,60 +1,84 @@
+from array import array
+import codecs
+import os
+import re
+
+from lexer.line_index import LineIndex
+
 # Token types
 #
+# Token type is a small integer code, position in TOKEN_TYPES.
+# Second item of each pair is the name used when printing the type.
 # EOF (end-of-file) token is used to indicate that
 # there is no more input left for lexical analysis
-tokens = {'NUMBER':'NUMBER',
-          'STRING':'STRING',
-          'PLUS':'PLUS',
-          'MINUS':'MINUS',
-          'MUL':'MUL',
-          'DIV':'DIV',
-          'LPAREN':'(',
-          'RPAREN':')',
-          'LCURLY':'{',
-          'RCURLY':'}',
-          'ID':'ID',
-          'ASSIGN':'ASSIGN',
-          'SEMI':'SEMI',
-          'EOF':'EOF',
-          'COMMA':',',
-          'EQ':'==',
-          'NEQ':'!=',
-          'LT':'<',
-          'MT':'>',
-          'LEQT':'<=',
-          'MEQT':'>=',
-          'IF':'IF',
-          'WHILE':'WHILE',
-          'ELSE':'ELSE',
-          'OR':'OR',
-          'AND':'AND',
-          'VAR':'VAR',
-          'DEF':'DEF',
-          'RETURN':'RETURN',
-          'DECLARATIONS':'DECLARATIONS',
-          'TYPES':'TYPES',
-          'MODULES':'MODULES',
-          'COLON':'COLON'
-
-}
+TOKEN_TYPES = (('NUMBER', 'NUMBER'),
+               ('STRING', 'STRING'),
+               ('PLUS', 'PLUS'),
+               ('MINUS', 'MINUS'),
+               ('MUL', 'MUL'),
+               ('DIV', 'DIV'),
+               ('LPAREN', '('),
+               ('RPAREN', ')'),
+               ('LCURLY', '{'),
+               ('RCURLY', '}'),
+               ('ID', 'ID'),
+               ('ASSIGN', 'ASSIGN'),
+               ('SEMI', 'SEMI'),
+               ('EOF', 'EOF'),
+               ('COMMA', ','),
+               ('EQ', '=='),
+               ('NEQ', '!='),
+               ('LT', '<'),
+               ('MT', '>'),
+               ('LEQT', '<='),
+               ('MEQT', '>='),
+               ('IF', 'IF'),
+               ('WHILE', 'WHILE'),
+               ('ELSE', 'ELSE'),
+               ('OR', 'OR'),
+               ('AND', 'AND'),
+               ('VAR', 'VAR'),
+               ('DEF', 'DEF'),
+               ('RETURN', 'RETURN'),
+               ('DECLARATIONS', 'DECLARATIONS'),
+               ('TYPES', 'TYPES'),
+               ('MODULES', 'MODULES'),
+               ('COLON', 'COLON'),
+               ('PURE', 'PURE'),
+               ('LBRACKET', '['),
+               ('RBRACKET', ']'),
+               ('ARRAY', 'ARRAY'))
+
+tokens = {name: code for code, (name, _) in enumerate(TOKEN_TYPES)}
+
+TOKEN_NAMES = [printed for _, printed in TOKEN_TYPES]
 
 def get_tokens():
     return tokens
 
+def token_name(type):
+    """Return printable name of the token type code."""
+    return TOKEN_NAMES[type]
+
 globals().update(get_tokens())
 
 class Token(object):
     """
     Class representing Token object constructed by lexer.
     """
-    def __init__(self, type, value):
+    __slots__ = ('type', 'value', 'offset')
+
+    def __init__(self, type, value, offset=None):
         """
         Construct Token object of given type and value.
         :param type: One of token types defined in global space.
         :param value: Value of the token (for example 3 fo INTEGER token).
+        :param offset: Offset of the token in the source. Shared tokens
+                       (keywords, punctuation) have no offset.
         """
         self.type = type
         self.value = value
+        self.offset = offset
 
     def __str__(self):
         """String representation of the class instance.
@@ -63,28 +87,94 @@ class Token(object):
             Token(PLUS, '+')
         """
         return 'Token({type}, {value})'.format(
-            type=self.type,
+            type=TOKEN_NAMES[self.type],
             value=repr(self.value)
         )
 
+    def __reduce__(self):
+        """Pickle compactly; shared tokens are unpickled as the shared objects again."""
+        if TOKEN_SINGLETONS[self.type] is self:
+            return shared_token, (self.type,)
+        return Token, (self.type, self.value, self.offset)
+
     def __repr__(self):
         return self.__str__()
 
 # RESERVED KEYWORDS THAT CANNOT BE USED AS IDENTIFIERS
 RESERVED_KEYWORDS = {
-    'if': Token('IF', 'IF'),
-    'else': Token('ELSE', 'ELSE'),
-    'and': Token('AND', 'AND'),
-    'or': Token('OR', 'OR'),
-    'var': Token('VAR', 'VAR'),
-    'while': Token('WHILE', 'WHILE'),
-    'def': Token('DEF', 'DEF'),
-    'return': Token('RETURN', 'RETURN'),
-    'declarations': Token('DECLARATIONS', 'DECLARATIONS'),
-    'types': Token('TYPES', 'TYPES'),
-    'modules': Token('MODULES', 'MODULES')
+    'if': Token(IF, 'IF'),
+    'else': Token(ELSE, 'ELSE'),
+    'and': Token(AND, 'AND'),
+    'or': Token(OR, 'OR'),
+    'var': Token(VAR, 'VAR'),
+    'while': Token(WHILE, 'WHILE'),
+    'def': Token(DEF, 'DEF'),
+    'return': Token(RETURN, 'RETURN'),
+    'declarations': Token(DECLARATIONS, 'DECLARATIONS'),
+    'types': Token(TYPES, 'TYPES'),
+    'modules': Token(MODULES, 'MODULES'),
+    'pure': Token(PURE, 'PURE'),
+    'array': Token(ARRAY, 'ARRAY')
+}
+
+# Value carried by tokens whose text is always the same.
+FIXED_VALUES = {
+    'EQ': '==', 'NEQ': '!=', 'LEQT': '<=', 'MEQT': '>=', 'ASSIGN': '=',
+    'LT': '<', 'MT': '>', 'COMMA': ',', 'SEMI': ';', 'COLON': ':',
+    'PLUS': '+', 'MINUS': '-', 'MUL': '*', 'DIV': '/', 'LPAREN': '(',
+    'RPAREN': ')', 'LCURLY': '{', 'RCURLY': '}', 'LBRACKET': '[', 'RBRACKET': ']'
 }
 
+# Tokens that always look the same are allocated once and shared, just like keywords.
+FIXED_TOKENS = {name: Token(tokens[name], value) for name, value in FIXED_VALUES.items()}
+
+EOF_TOKEN = Token(EOF, None)
+
+# Token type code -> shared token of that type (None for ID, NUMBER and STRING).
+TOKEN_SINGLETONS = [None] * len(TOKEN_TYPES)
+for _token in list(FIXED_TOKENS.values()) + list(RESERVED_KEYWORDS.values()) + [EOF_TOKEN]:
+    TOKEN_SINGLETONS[_token.type] = _token
+del _token
+
+
+def shared_token(type):
+    return TOKEN_SINGLETONS[type]
+
+
+# Number of characters (or bytes for binary sources) read from a stream at once.
+CHUNK_SIZE = 1 << 16
+
+
+def read_chunks(source, chunk_size=CHUNK_SIZE, encoding='utf-8'):
+    """
+    Generate text of the source in chunks.
+    :param source: Text itself, path to the script (os.PathLike), file object
+                   opened in text or binary mode or mmap object.
+    :param chunk_size: Maximal size of a single chunk.
+    :param encoding: Encoding used to decode binary sources.
+    """
+    if isinstance(source, str):
+        yield source
+        return
+
+    if isinstance(source, os.PathLike):
+        with open(source, 'r', encoding=encoding) as f:
+            yield from read_chunks(f, chunk_size)
+        return
+
+    decoder = None
+    chunk = source.read(chunk_size)
+    while chunk:
+        if not isinstance(chunk, str):
+            if decoder is None:
+                decoder = codecs.getincrementaldecoder(encoding)()
+            chunk = decoder.decode(chunk)
+        yield chunk
+        chunk = source.read(chunk_size)
+
+    if decoder is not None:
+        yield decoder.decode(b'', final=True)
+
 
 class Lexer(object):
     """
@@ -92,22 +182,54 @@ class Lexer(object):
     """
     def __init__(self, text):
         """
-        Construct lexer that will be used to tokenize given line of text.
-        :param text: Line of text to tokenize
+        Construct lexer that will be used to tokenize given text.
+        Anything accepted by read_chunks can be passed, streams are read lazily
+        chunk by chunk so only the current chunk is kept in memory.
+        :param text: Text to tokenize, path, file object or mmap
         """
-        self.text = text
-        # self.pos is an index into self.text
+        self._open(text)
+        # self.text holds the current chunk and self.pos is an index into it,
+        # self._base is the offset of the chunk in the whole source
+        self.text = ''
         self.pos = 0
-        self.current_char = self.text[self.pos]
+        self._base = 0
+        self.current_char = None
+        # offset of the most recently returned token
+        self.token_offset = 0
+        self._next_chunk()
+
+    def _open(self, text):
+        """Start reading the source, positions are resolved with self.line_index."""
+        if isinstance(text, str):
+            self.line_index = LineIndex(text)
+            self._chunks = read_chunks(text)
+        else:
+            self.line_index = LineIndex()
+            self._chunks = self.line_index.index_chunks(read_chunks(text))
+
+    def error_offset(self):
+        """Return offset of the character that cannot be tokenized."""
+        return self._base + self.pos
 
     def error(self):
-        raise Exception('Invalid character')
+        raise Exception('Invalid character at {}'.format(self.line_index.describe(self.error_offset())))
+
+    def _next_chunk(self):
+        """Replace current chunk with the next non-empty one."""
+        for chunk in self._chunks:
+            if chunk:
+                self._base += len(self.text)
+                self.text = chunk
+                self.pos = 0
+                self.current_char = chunk[0]
+                return
+        self.current_char = None  # Indicates end of input
 
     def advance(self):
         """Advance the `pos` pointer and set the `current_char` variable."""
         self.pos += 1
         if self.pos > len(self.text) - 1:
-            self.current_char = None  # Indicates end of input
+            self._next_chunk()
         else:
             self.current_char = self.text[self.pos]
 
@@ -122,20 +244,23 @@ class Lexer(object):
         """
         Skip every character in line after comment sign '#'.
         """
-        while self.current_char != '\n':
+        while self.current_char is not None and self.current_char != '\n':
+            self.advance()
+        if self.current_char is not None:
             self.advance()
-        self.advance()
 
     def string(self):
         """Return a string token"""
         result = ''
         self.advance()
-        while self.current_char is not '\"':
+        while self.current_char != '\"':
+            if self.current_char is None:
+                self.error()
             result += self.current_char
             self.advance()
 
         self.advance()
-        return Token('STRING', result)
+        return Token(STRING, result, self.token_offset)
 
     def number(self):
         """Return a number token that contains float or integer value."""
@@ -154,9 +279,9 @@ class Lexer(object):
             ):
                 result += self.current_char
                 self.advance()
-            token = Token('NUMBER', float(result))
+            token = Token(NUMBER, float(result), self.token_offset)
         else:
-            token = Token('NUMBER', int(result))
+            token = Token(NUMBER, int(result), self.token_offset)
 
         return token
 
@@ -167,14 +292,16 @@ class Lexer(object):
             result += self.current_char
             self.advance()
 
-        token = RESERVED_KEYWORDS.get(result.lower(), Token(ID, result))
-        return token
+        token = RESERVED_KEYWORDS.get(result.lower())
+        return token if token is not None else Token(ID, result, self.token_offset)
 
     def get_next_token(self):
         """
         Return next token from text.
         """
         while self.current_char is not None:
+            # start of the token returned in this iteration
+            self.token_offset = self._base + self.pos
 
             if self.current_char.isspace():
                 self.skip_whitespace()
@@ -190,15 +317,15 @@ class Lexer(object):
                 self.advance()
                 if self.current_char == '=':
                     self.advance()
-                    return Token(EQ, '==')
+                    return FIXED_TOKENS['EQ']
                 else:
-                    return Token(ASSIGN, '=')
+                    return FIXED_TOKENS['ASSIGN']
 
             if self.current_char == '!':
                 self.advance()
                 if self.current_char == '=':
                     self.advance()
-                    return Token(NEQ, '!=')
+                    return FIXED_TOKENS['NEQ']
                 else:
                     self.error()
 
@@ -206,61 +333,69 @@ class Lexer(object):
                 self.advance()
                 if self.current_char == '=':
                     self.advance()
-                    return Token(LEQT, '<=')
+                    return FIXED_TOKENS['LEQT']
                 else:
-                    return Token(LT, '<')
+                    return FIXED_TOKENS['LT']
 
             if self.current_char == '>':
                 self.advance()
                 if self.current_char == '=':
                     self.advance()
-                    return Token(MEQT, '>=')
+                    return FIXED_TOKENS['MEQT']
                 else:
-                    return Token(MT, '>')
+                    return FIXED_TOKENS['MT']
 
             if self.current_char == ',':
                 self.advance()
-                return Token(COMMA, ',')
+                return FIXED_TOKENS['COMMA']
 
             if self.current_char == ';':
                 self.advance()
-                return Token(SEMI, ';')
+                return FIXED_TOKENS['SEMI']
 
             if self.current_char == ':':
                 self.advance()
-                return Token(COLON, ':')
+                return FIXED_TOKENS['COLON']
 
             if self.current_char == '+':
                 self.advance()
-                return Token(PLUS, '+')
+                return FIXED_TOKENS['PLUS']
 
             if self.current_char == '-':
                 self.advance()
-                return Token(MINUS, '-')
+                return FIXED_TOKENS['MINUS']
 
             if self.current_char == '*':
                 self.advance()
-                return Token(MUL, '*')
+                return FIXED_TOKENS['MUL']
 
             if self.current_char == '/':
                 self.advance()
-                return Token(DIV, '/')
+                return FIXED_TOKENS['DIV']
 
             if self.current_char == '(':
                 self.advance()
-                return Token(LPAREN, '(')
+                return FIXED_TOKENS['LPAREN']
 
             if self.current_char == ')':
                 self.advance()
-                return Token(RPAREN, ')')
+                return FIXED_TOKENS['RPAREN']
 
             if self.current_char == '{':
                 self.advance()
-                return Token(LCURLY, '{')
+                return FIXED_TOKENS['LCURLY']
+
+            if self.current_char == '[':
+                self.advance()
+                return FIXED_TOKENS['LBRACKET']
+
+            if self.current_char == ']':
+                self.advance()
+                return FIXED_TOKENS['RBRACKET']
 
             if self.current_char == '}':
                 self.advance()
-                return Token(RCURLY, '}')
+                return FIXED_TOKENS['RCURLY']
 
             if self.current_char == '\"':
                 return self.string()
@@ -268,7 +403,315 @@ class Lexer(object):
             if self.current_char == '#':
                 self.advance()
                 self.skip_comment()
+                continue
 
             self.error()
 
-        return Token(EOF, None)
+        self.token_offset = self._base + self.pos
+        return EOF_TOKEN
+
+    def tokenize(self):
+        """
+        Generate every token of the text, excluding the closing EOF token.
+        """
+        token = self.get_next_token()
+        while token.type != EOF:
+            yield token
+            token = self.get_next_token()
+
+    def tokenize_arrays(self):
+        """
+        Tokenize the rest of the text into TokenStream.
+        """
+        stream = TokenStream(self.line_index)
+        append = stream.append
+        token = self.get_next_token()
+        while token.type != EOF:
+            append(token.type, token.value if token.type in VALUE_TYPES else None, self.token_offset)
+            token = self.get_next_token()
+        append(EOF, None, self.token_offset)
+        return stream
+
+
+# Types of tokens that carry own value and are not shared.
+VALUE_TYPES = frozenset((ID, NUMBER, STRING))
+
+
+class TokenStream(object):
+    """
+    Tokenized source stored as parallel arrays: type codes, values and
+    source offsets. Only ID, NUMBER and STRING tokens have values, the others
+    are represented by type code alone. The last token is always EOF.
+
+    TokenStream can be passed to Parser in place of a lexer.
+    """
+    def __init__(self, line_index=None):
+        self.types = array('B')
+        self.values = []
+        self.offsets = array('q')
+        self.line_index = line_index
+        # index of the token returned by next call to get_next_token
+        self.pos = 0
+        self._tokens = None
+
+    def __len__(self):
+        return len(self.types)
+
+    def append(self, type, value, offset):
+        self.types.append(type)
+        self.values.append(value)
+        self.offsets.append(offset)
+
+    def token(self, index):
+        """Return Token object for token at given index."""
+        value = self.values[index]
+        if value is None:
+            return TOKEN_SINGLETONS[self.types[index]]
+        return Token(self.types[index], value, self.offsets[index])
+
+    @property
+    def token_offset(self):
+        """Offset of the most recently returned token."""
+        return self.offsets[max(self.pos - 1, 0)]
+
+    def _iterate(self):
+        singletons = TOKEN_SINGLETONS
+        for index, value in enumerate(self.values):
+            self.pos = index + 1
+            if value is None:
+                yield singletons[self.types[index]]
+            else:
+                yield Token(self.types[index], value, self.offsets[index])
+
+    def get_next_token(self):
+        """
+        Return next token, EOF is returned again when the stream is exhausted.
+        """
+        if self._tokens is None:
+            self._tokens = self._iterate()
+        return next(self._tokens, EOF_TOKEN)
+
+
+# Token patterns used by RegexLexer. Alternatives are tried in order, so
+# two-character operators have to come before their one-character prefixes.
+TOKEN_PATTERNS = (
+    ('NUMBER', r'\d+(?:\.\d*)?'),
+    ('ID', r'[^\W\d_][^\W_]*'),
+    ('STRING', r'"[^"]*"'),
+    ('EQ', r'=='),
+    ('NEQ', r'!='),
+    ('LEQT', r'<='),
+    ('MEQT', r'>='),
+    ('ASSIGN', r'='),
+    ('LT', r'<'),
+    ('MT', r'>'),
+    ('COMMA', r','),
+    ('SEMI', r';'),
+    ('COLON', r':'),
+    ('PLUS', r'\+'),
+    ('MINUS', r'-'),
+    ('MUL', r'\*'),
+    ('DIV', r'/'),
+    ('LPAREN', r'\('),
+    ('RPAREN', r'\)'),
+    ('LCURLY', r'\{'),
+    ('RCURLY', r'\}'),
+    ('LBRACKET', r'\['),
+    ('RBRACKET', r'\]'),
+)
+
+# Whitespace and comments between tokens.
+SKIP_PATTERN = r'(?:\s+|#[^\n]*)*'
+
+# Every match consumes skipped text and exactly one token. The lookahead with a
+# back reference makes skipping atomic, so a failed token can never backtrack into
+# a comment and tokenize its content. Group 1 is the skipped text, token groups follow.
+MASTER_PATTERN = re.compile('(?=({}))\\1(?:{})'.format(
+    SKIP_PATTERN, '|'.join('({})'.format(pattern) for _, pattern in TOKEN_PATTERNS)
+))
+
+SKIP_REGEX = re.compile(SKIP_PATTERN)
+
+# MASTER_PATTERN group index -> shared token for fixed tokens or token type otherwise.
+GROUP_KINDS = [None, None] + [
+    FIXED_TOKENS[name] if name in FIXED_TOKENS else tokens[name]
+    for name, _ in TOKEN_PATTERNS
+]
+
+
+class RegexLexer(Lexer):
+    """
+    lexer that matches whole tokens with one compiled master pattern instead
+    of walking the text character by character. Produces the same tokens as Lexer.
+    """
+    def __init__(self, text):
+        """
+        Construct lexer that will be used to tokenize given text.
+        Anything accepted by read_chunks can be passed, streams are read lazily
+        chunk by chunk and a token split between two chunks is carried over.
+        :param text: Text to tokenize, path, file object or mmap
+        """
+        self._open(text)
+        # self.text is a buffer with unconsumed text and self.pos is an index into it,
+        # self._base is the offset of the buffer in the whole source
+        self.text = ''
+        self.pos = 0
+        self._base = 0
+        # offset of the most recently returned token
+        self.token_offset = 0
+        self._tokens = self.scan()
+
+    def error_offset(self):
+        """Return offset of the character that cannot be tokenized."""
+        return self._base + SKIP_REGEX.match(self.text, self.pos).end()
+
+    def _incomplete(self):
+        """
+        Check whether text left in the buffer, which does not match any token,
+        can be continued by the next chunk.
+        """
+        text = self.text
+        pos = SKIP_REGEX.match(text, self.pos).end()
+        # strings and '!=' are the only tokens whose prefix does not match anything
+        return pos >= len(text) - 1 or text[pos] == '"'
+
+    def _matches(self):
+        """
+        Generate MASTER_PATTERN matches of consecutive tokens of the source.
+        Token starts at index m.end(1) of the current buffer.
+        """
+        at_end = False
+
+        while True:
+            text = self.text
+            end_of_text = len(text)
+            pending = False
+
+            for m in MASTER_PATTERN.finditer(text, self.pos):
+                # finditer searched past the current position: either only whitespace,
+                # comments or the beginning of a token is left, or the character is invalid
+                if m.start() != self.pos:
+                    break
+                # token touching the end of the buffer may continue in the next chunk
+                if m.end() == end_of_text and not at_end:
+                    pending = True
+                    break
+                self.pos = m.end()
+                yield m
+
+            if at_end:
+                if SKIP_REGEX.fullmatch(text, self.pos) is None:
+                    self.error()
+                self._base += len(text)
+                self.text = ''
+                self.pos = 0
+                return
+
+            if not pending and not self._incomplete():
+                self.error()
+
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                at_end = True
+            else:
+                self._base += self.pos
+                self.text = text[self.pos:] + chunk
+                self.pos = 0
+
+    def scan(self):
+        """
+        Generate tokens from the source, starting at current position.
+        """
+        kinds = GROUP_KINDS
+
+        for m in self._matches():
+            self.token_offset = offset = self._base + m.end(1)
+            index = m.lastindex
+            kind = kinds[index]
+            if kind.__class__ is Token:
+                yield kind
+                continue
+
+            result = m.group(index)
+            if kind == ID:
+                token = RESERVED_KEYWORDS.get(result.lower())
+                yield token if token is not None else Token(ID, result, offset)
+            elif kind == NUMBER:
+                yield Token(NUMBER, float(result) if '.' in result else int(result), offset)
+            else:
+                yield Token(STRING, result[1:-1], offset)
+
+        self.token_offset = self._base
+
+    def get_next_token(self):
+        """
+        Return next token from text.
+        """
+        return next(self._tokens, EOF_TOKEN)
+
+    def tokenize(self):
+        """
+        Generate every token of the text, excluding the closing EOF token.
+        """
+        return self._tokens
+
+    def tokenize_arrays(self):
+        """
+        Tokenize the rest of the text into TokenStream without creating Token objects.
+        """
+        stream = TokenStream(self.line_index)
+        types = stream.types.append
+        values = stream.values.append
+        offsets = stream.offsets.append
+        kinds = GROUP_KINDS
+        keywords = RESERVED_KEYWORDS
+        # identifiers repeat a lot, equal names share one string object
+        names = {}
+
+        for m in self._matches():
+            offsets(self._base + m.end(1))
+            index = m.lastindex
+            kind = kinds[index]
+            if kind.__class__ is Token:
+                types(kind.type)
+                values(None)
+                continue
+
+            result = m.group(index)
+            if kind == ID:
+                token = keywords.get(result.lower())
+                if token is not None:
+                    types(token.type)
+                    values(None)
+                else:
+                    types(ID)
+                    values(names.setdefault(result, result))
+            elif kind == NUMBER:
+                types(NUMBER)
+                values(float(result) if '.' in result else int(result))
+            else:
+                types(STRING)
+                values(result[1:-1])
+
+        stream.append(EOF, None, self._base)
+        return stream
+
+
+# Lexing engines that can be selected by name.
+LEXER_ENGINES = {
+    'char': Lexer,
+    'regex': RegexLexer
+}
+
+
+def make_lexer(text, engine='regex'):
+    """
+    Construct lexer for given text using one of LEXER_ENGINES.
+    :param text: Text to tokenize, path, file object or mmap
+    :param engine: Name of the lexing engine ('regex' or 'char').
+    """
+    try:
+        lexer_class = LEXER_ENGINES[engine]
+    except KeyError:
+        raise ValueError('Unknown lexer engine "{}"'.format(engine))
+    return lexer_class(text)
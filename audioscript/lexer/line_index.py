@@ -0,0 +1,55 @@
+from array import array
+from bisect import bisect_right
+
+
+class LineIndex(object):
+    """
+    Index of line starts of a source, used to turn token offsets into line
+    and column numbers. Lines and columns are counted from 1.
+    """
+    def __init__(self, text=None):
+        """
+        Construct line index.
+        :param text: Whole source text. It is indexed only when the first position
+                     is requested. Streamed sources are indexed chunk by chunk with feed().
+        """
+        self._text = text
+        self._starts = array('q', [0])
+        self._length = 0
+
+    def feed(self, chunk):
+        """
+        Index next chunk of the source.
+        """
+        starts = self._starts
+        base = self._length
+        find = chunk.find
+        pos = find('\n')
+        while pos != -1:
+            starts.append(base + pos + 1)
+            pos = find('\n', pos + 1)
+        self._length = base + len(chunk)
+
+    def index_chunks(self, chunks):
+        """
+        Generate given chunks indexing each of them on the way.
+        """
+        for chunk in chunks:
+            self.feed(chunk)
+            yield chunk
+
+    def position(self, offset):
+        """
+        Return (line, column) of the character at given offset.
+        """
+        if self._text is not None:
+            self.feed(self._text)
+            self._text = None
+        line = bisect_right(self._starts, offset)
+        return line, offset - self._starts[line - 1] + 1
+
+    def describe(self, offset):
+        """
+        Return human readable position of the offset.
+        """
+        return 'line {}, column {}'.format(*self.position(offset))
@@ -0,0 +1,9 @@
+"""
+Modules shipped with AudioScript, which scripts declare in Modules by their short name, like
+the Python modules they may declare.
+"""
+
+# short name declared in scripts -> name of the Python module imported for it
+BUILTIN_MODULES = {
+    'wav': 'audioscript.modules.wav',
+}
@@ -0,0 +1,417 @@
+"""
+WAV files for scripts, declared in Modules as wav. Readers and writers are handles of types the
+script declares in Types, e.g.:
+
+    Declarations{
+        Types: wavreader, wavwriter;
+        Modules{
+            wav{
+                wavreader reader(STRING, NUMBER);
+                wavwriter writer(STRING, NUMBER, NUMBER, NUMBER);
+                wavwriter copy(STRING, wavreader);
+                wavwriter convert(STRING, wavreader, NUMBER);
+                VAR blocks(wavreader);
+                VAR channels(wavreader);
+                VAR rate(wavreader);
+                VAR amplitude(wavreader);
+                array read(wavreader, NUMBER, NUMBER);
+                write(wavwriter, array, NUMBER);
+                close(wavwriter);
+            }
+        }
+    }
+
+Functions are named by single words, as names in scripts have no underscores.
+
+The file read is memory-mapped and blocks are read as arrays sharing the memory of the mapping,
+nothing is copied. Pages of the blocks read before are given back to the system when the next
+block is read, so the memory used stays the same however long the file is. Written blocks are
+converted and written to the file once every channel of their frames was written.
+
+Samples are read as the file stores them: from 0 to 255 centered at 128 in 8-bit files, from
+-32768 to 32767 in 16-bit ones, from -1 to 1 in floating point ones and so on, see amplitude().
+Writers take samples on the scale of a format too:
+
+    writer(path, rate, channels, bits) writes PCM samples of 8, 16 or 32 bits, taking them on
+    the scale of the file written;
+    copy(path, reader) writes in the format of the file read, with its rate and channels, so
+    samples read are written back unchanged;
+    convert(path, reader, bits) writes PCM samples of the bits, taking them on the scale of the
+    file read: they are divided by its amplitude, less 128 for 8-bit files, and multiplied by
+    the amplitude of the file written, plus 128 for 8-bit files.
+
+PCM samples are written rounded and clipped to the range of the file written, floating point
+ones as they are.
+"""
+import mmap
+import numbers
+import struct
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+# (format, bits per sample) -> type of the samples stored so
+SAMPLE_TYPES = {
+    (WAVE_FORMAT_PCM, 8): 'u1',
+    (WAVE_FORMAT_PCM, 16): '<i2',
+    (WAVE_FORMAT_PCM, 32): '<i4',
+    (WAVE_FORMAT_IEEE_FLOAT, 32): '<f4',
+    (WAVE_FORMAT_IEEE_FLOAT, 64): '<f8',
+}
+
+
+def whole(value, what, minimum=0):
+    """
+    Return the number, which must be whole and at least minimum, as int.
+    :param what: Name of the value for the error message.
+    """
+    if not isinstance(value, numbers.Real) or value != int(value) or value < minimum:
+        raise ValueError('{} must be a whole number of at least {}, got {!r}'.format(what, minimum, value))
+    return int(value)
+
+
+def full_scale(sample_type):
+    """
+    Return amplitude of the loudest sample of the type.
+    :param sample_type: numpy.dtype of the samples.
+    """
+    if sample_type.kind == 'f':
+        return 1.0
+    # unsigned 8-bit samples are centered at 128, so their amplitude is the same
+    return float(1 << (sample_type.itemsize * 8 - 1))
+
+
+def center(sample_type):
+    """
+    Return value of silent samples of the type.
+    """
+    return 128.0 if sample_type.kind == 'u' else 0.0
+
+
+def sample_format(sample_type):
+    """
+    Return format and bits per sample of files storing samples of the type, None when none does.
+    """
+    for fmt, stored_type in SAMPLE_TYPES.items():
+        if numpy.dtype(stored_type) == sample_type:
+            return fmt
+    return None
+
+
+def need_numpy():
+    if numpy is None:
+        raise ImportError('wav module needs NumPy, which is not installed')
+
+
+class WavReader(object):
+    """
+    WAV file mapped into memory, read by blocks of frames.
+    """
+    def __init__(self, path, block_size):
+        """
+        :param block_size: Number of frames of every block, the last one may be shorter.
+        """
+        need_numpy()
+        self.path = path
+        self.block_size = whole(block_size, 'Block size', 1)
+        with open(path, 'rb') as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if hasattr(mmap, 'MADV_SEQUENTIAL'):
+            self.map.madvise(mmap.MADV_SEQUENTIAL)
+        audio_format, self.channels, self.sample_rate, bits, offset, size = self.parse()
+        sample_type = SAMPLE_TYPES.get((audio_format, bits))
+        if sample_type is None:
+            raise ValueError('"{}" has samples of {} bits in format {}, which are not supported'.format(
+                path, bits, audio_format))
+        self.sample_type = numpy.dtype(sample_type)
+        self.frame_size = self.sample_type.itemsize * self.channels
+        self.frames = size // self.frame_size
+        self.data_offset = offset
+        # frames by channel, sharing the memory of the mapping
+        self.samples = numpy.frombuffer(self.map, self.sample_type, self.frames * self.channels,
+                                        offset).reshape(self.frames, self.channels)
+        # index of the block read last, whose pages are kept
+        self.current = None
+
+    def parse(self):
+        """
+        Return format, channels, sample rate, bits per sample, offset and size of the samples of the file.
+        """
+        data = self.map
+        if len(data) < 12 or data[0:4] != b'RIFF' or data[8:12] != b'WAVE':
+            raise ValueError('"{}" is not a WAV file'.format(self.path))
+        offset = 12
+        fmt = None
+        while offset + 8 <= len(data):
+            chunk = data[offset:offset + 4]
+            size, = struct.unpack_from('<I', data, offset + 4)
+            body = offset + 8
+            if chunk == b'fmt ':
+                audio_format, channels, sample_rate, _, _, bits = struct.unpack_from('<HHIIHH', data, body)
+                if audio_format == WAVE_FORMAT_EXTENSIBLE and size >= 26:
+                    # the format is given by the first two bytes of the sub format GUID
+                    audio_format, = struct.unpack_from('<H', data, body + 24)
+                fmt = (audio_format, channels, sample_rate, bits)
+            elif chunk == b'data':
+                if fmt is None:
+                    raise ValueError('"{}" has no format chunk before its samples'.format(self.path))
+                # files cut short keep the samples they have
+                return fmt + (body, min(size, len(data) - body))
+            # chunks are aligned to two bytes
+            offset = body + size + (size & 1)
+        raise ValueError('"{}" has no samples'.format(self.path))
+
+    def blocks(self):
+        return -(-self.frames // self.block_size)
+
+    def read(self, index, channel):
+        """
+        Return samples of the channel in the block, sharing the memory of the mapping.
+        """
+        index = whole(index, 'Block index')
+        channel = whole(channel, 'Channel')
+        if index >= self.blocks():
+            raise IndexError('Block {} out of {} blocks of "{}"'.format(index, self.blocks(), self.path))
+        if channel >= self.channels:
+            raise IndexError('Channel {} out of {} channels of "{}"'.format(channel, self.channels, self.path))
+        if index != self.current:
+            if self.current is not None:
+                self.release(self.current, index)
+            self.current = index
+        start = index * self.block_size
+        return self.samples[start:start + self.block_size, channel]
+
+    def pages(self, index):
+        """
+        Return offsets of the first page of the block and of the page past it in the mapping.
+        """
+        start = self.data_offset + index * self.block_size * self.frame_size
+        end = min(start + self.block_size * self.frame_size, self.data_offset + self.frames * self.frame_size)
+        return start // mmap.PAGESIZE * mmap.PAGESIZE, min(-(-end // mmap.PAGESIZE) * mmap.PAGESIZE, len(self.map))
+
+    def release(self, index, current):
+        """
+        Let the system drop the pages of the block, which are read from the file again when used;
+        pages shared with the current block are kept.
+        """
+        if not hasattr(mmap, 'MADV_DONTNEED'):
+            return
+        start, end = self.pages(index)
+        current_start, current_end = self.pages(current)
+        if start < current_end and current_start < end:
+            if start < current_start:
+                end = current_start
+            else:
+                start = current_end
+        if start < end:
+            self.map.madvise(mmap.MADV_DONTNEED, start, end - start)
+
+    def full_scale(self):
+        """
+        Return the amplitude of the loudest sample the file can store.
+        """
+        return full_scale(self.sample_type)
+
+    def __repr__(self):
+        return '<wav reader "{}": {} frames of {} channels at {} Hz>'.format(
+            self.path, self.frames, self.channels, self.sample_rate)
+
+
+class WavWriter(object):
+    """
+    WAV file written by blocks of the samples of every channel.
+    """
+    def __init__(self, path, sample_rate, channels, sample_type='<i2', scale_type=None):
+        """
+        :param sample_type: Type of the samples written, one of SAMPLE_TYPES.
+        :param scale_type: Type of the samples whose scale the written samples are on, converted
+        to the scale of sample_type; None when they are on its scale.
+        """
+        need_numpy()
+        self.path = path
+        self.channels = whole(channels, 'Channels', 1)
+        self.sample_rate = whole(sample_rate, 'Sample rate', 1)
+        self.sample_type = numpy.dtype(sample_type)
+        if sample_format(self.sample_type) is None:
+            raise ValueError('Samples of type {} cannot be written'.format(self.sample_type))
+        if self.sample_type.kind == 'f':
+            self.minimum = self.maximum = None
+        else:
+            limits = numpy.iinfo(self.sample_type)
+            self.minimum, self.maximum = limits.min, limits.max
+        # samples are multiplied by gain and shifted by offset to the scale of the file
+        self.gain, self.offset = 1.0, 0.0
+        if scale_type is not None:
+            scale_type = numpy.dtype(scale_type)
+            self.gain = full_scale(self.sample_type) / full_scale(scale_type)
+            self.offset = center(self.sample_type) - center(scale_type) * self.gain
+        self.file = open(path, 'wb')
+        self.file.write(self.header(0))
+        # arrays of samples of every channel not written yet, and their number
+        self.pending = [[] for _ in range(self.channels)]
+        self.queued = [0] * self.channels
+        self.frames = 0
+
+    def header(self, frames):
+        """
+        Return header of the file holding the frames, up to its samples.
+        """
+        audio_format, bits = sample_format(self.sample_type)
+        frame_size = self.sample_type.itemsize * self.channels
+        size = frames * frame_size
+        if audio_format == WAVE_FORMAT_PCM:
+            fmt = struct.pack('<4sIHHIIHH', b'fmt ', 16, audio_format, self.channels, self.sample_rate,
+                              self.sample_rate * frame_size, frame_size, bits)
+        else:
+            # formats other than PCM have the size of their extension and the number of frames
+            fmt = struct.pack('<4sIHHIIHHH4sII', b'fmt ', 18, audio_format, self.channels, self.sample_rate,
+                              self.sample_rate * frame_size, frame_size, bits, 0, b'fact', 4, frames)
+        # samples of odd size are padded to two bytes
+        riff_size = 4 + len(fmt) + 8 + size + (size & 1)
+        return struct.pack('<4sI4s', b'RIFF', riff_size, b'WAVE') + fmt + struct.pack('<4sI', b'data', size)
+
+    def write(self, samples, channel):
+        """
+        Add the samples to the channel and write the frames whose every channel was written.
+        """
+        channel = whole(channel, 'Channel')
+        if channel >= self.channels:
+            raise IndexError('Channel {} out of {} channels of "{}"'.format(channel, self.channels, self.path))
+        if self.file is None:
+            raise ValueError('"{}" was closed'.format(self.path))
+        if len(samples):
+            self.pending[channel].append(samples)
+            self.queued[channel] += len(samples)
+        count = min(self.queued)
+        if count:
+            self.flush(count)
+
+    def convert(self, samples):
+        """
+        Return the samples on the scale of the file, rounded and clipped to its range when it is PCM.
+        """
+        if self.gain != 1.0 or self.offset:
+            samples = samples * self.gain + self.offset
+        if self.minimum is None:
+            return samples
+        return numpy.clip(numpy.rint(samples), self.minimum, self.maximum)
+
+    def flush(self, count):
+        """
+        Write the first count frames of the pending samples.
+        """
+        frames = numpy.empty((count, self.channels), self.sample_type)
+        for channel, pending in enumerate(self.pending):
+            filled = 0
+            while filled < count:
+                samples = pending[0]
+                taken = min(len(samples), count - filled)
+                frames[filled:filled + taken, channel] = self.convert(samples[:taken])
+                filled += taken
+                if taken == len(samples):
+                    pending.pop(0)
+                else:
+                    pending[0] = samples[taken:]
+            self.queued[channel] -= count
+        self.file.write(frames)
+        self.frames += count
+
+    def close(self):
+        """
+        Write the pending samples, with silence for the channels written less, and the header.
+        """
+        if self.file is None:
+            return
+        count = max(self.queued)
+        if count:
+            for channel, queued in enumerate(self.queued):
+                if queued < count:
+                    # silent samples on the scale of the samples given
+                    self.pending[channel].append(
+                        numpy.full(count - queued, (center(self.sample_type) - self.offset) / self.gain))
+                    self.queued[channel] = count
+            self.flush(count)
+        if self.frames * self.sample_type.itemsize * self.channels & 1:
+            self.file.write(b'\0')
+        self.file.seek(0)
+        self.file.write(self.header(self.frames))
+        self.file.close()
+        self.file = None
+
+    def __repr__(self):
+        return '<wav writer "{}": {} frames of {} channels{}>'.format(
+            self.path, self.frames, self.channels, '' if self.file is not None else ', closed')
+
+
+def reader(path, block_size):
+    return WavReader(path, block_size)
+
+
+def pcm_type(bits):
+    """
+    Return type of PCM samples of the bits.
+    """
+    sample_type = SAMPLE_TYPES.get((WAVE_FORMAT_PCM, whole(bits, 'Bits per sample', 8)))
+    if sample_type is None:
+        raise ValueError('PCM samples of {} bits cannot be written, only of {}'.format(
+            bits, ', '.join(str(pcm_bits) for audio_format, pcm_bits in SAMPLE_TYPES
+                            if audio_format == WAVE_FORMAT_PCM)))
+    return sample_type
+
+
+def writer(path, sample_rate, channels, bits):
+    return WavWriter(path, sample_rate, channels, pcm_type(bits))
+
+
+def copy(path, reader):
+    """
+    Return writer of samples in the format of the file read.
+    """
+    return WavWriter(path, reader.sample_rate, reader.channels, reader.sample_type)
+
+
+def convert(path, reader, bits):
+    """
+    Return writer of PCM samples of the bits, converted from the scale of the file read.
+    """
+    return WavWriter(path, reader.sample_rate, reader.channels, pcm_type(bits), reader.sample_type)
+
+
+def blocks(reader):
+    """
+    Return number of blocks of the file.
+    """
+    return reader.blocks()
+
+
+def frames(reader):
+    return reader.frames
+
+
+def channels(reader):
+    return reader.channels
+
+
+def rate(reader):
+    return reader.sample_rate
+
+
+def amplitude(reader):
+    return reader.full_scale()
+
+
+def read(reader, index, channel):
+    return reader.read(index, channel)
+
+
+def write(writer, samples, channel):
+    writer.write(samples, channel)
+
+
+def close(writer):
+    writer.close()
@@ -1,21 +1,26 @@
-from lexer.Lexer import get_tokens, Token
+from lexer.Lexer import get_tokens, token_name, Token, TOKEN_SINGLETONS
 
 globals().update(get_tokens())
 
 class AST(object):
     """
     Base class for all AbstractSyntaxTree node types.
+    Nodes declare their fields in __slots__, so they carry no per-instance __dict__.
     """
-    pass
+    __slots__ = ()
 
 
 class Program(AST):
+    __slots__ = ('declarations', 'code')
+
     def __init__(self, declarations, code):
         self.declarations = declarations
         self.code = code
 
 
 class BinOp(AST):
+    __slots__ = ('left', 'token', 'op', 'right')
+
     def __init__(self, left, op, right):
         self.left = left
         self.token = self.op = op
@@ -23,18 +28,72 @@ class BinOp(AST):
 
 
 class String(AST):
+    __slots__ = ('token', 'value')
+
     def __init__(self, token):
         self.token = token
         self.value = token.value
 
 
 class Num(AST):
+    __slots__ = ('token', 'value')
+
     def __init__(self, token):
         self.token = token
         self.value = token.value
 
 
+class ArrayLiteral(AST):
+    """
+    Represents array literal, [element, ...].
+    """
+    __slots__ = ('token', 'elements')
+
+    def __init__(self, token, elements):
+        """
+        :param token: Opening bracket token, with its offset.
+        :param elements: Numeric expression nodes of the elements.
+        """
+        self.token = token
+        self.elements = elements
+
+
+class Index(AST):
+    """
+    Represents element of an array, value[index].
+    """
+    __slots__ = ('value', 'token', 'index')
+
+    def __init__(self, value, token, index):
+        """
+        :param value: Expression node of the array.
+        :param token: Opening bracket token, with its offset.
+        """
+        self.value = value
+        self.token = token
+        self.index = index
+
+
+class Slice(AST):
+    """
+    Represents part of an array, value[start:end]; either bound may be left out.
+    """
+    __slots__ = ('value', 'token', 'start', 'end')
+
+    def __init__(self, value, token, start, end):
+        """
+        :param start: Expression node of the first index, None from the beginning.
+        :param end: Expression node of the index past the last, None to the end.
+        """
+        self.value = value
+        self.token = token
+        self.start = start
+        self.end = end
+
+
 class Return(AST):
+    __slots__ = ('value',)
+
     def  __init__(self, value):
         self.value = value
 
@@ -43,6 +102,8 @@ class UnaryOp(AST):
     """
     Represents unary operation(plus and minus sign) node.
     """
+    __slots__ = ('token', 'op', 'value')
+
     def __init__(self, op, numeric_value):
         """
         Unary operation node.
@@ -57,16 +118,25 @@ class FunctionDeclaration(AST):
     """
     Represents function
     """
-    def __init__(self, name, arguments, function_body):
+    __slots__ = ('name', 'arguments', 'body', 'pure')
+
+    def __init__(self, name, arguments, function_body, pure=False):
+        """
+        :param pure: Whether the function was defined pure: its result depends only on the
+        arguments, so calls with the same arguments may return the result of an earlier one.
+        """
         self.name = name
         self.arguments = arguments
         self.body = function_body
+        self.pure = pure
 
 
 class FunctionCall(AST):
     """
     Represents function call
     """
+    __slots__ = ('function', 'args')
+
     def __init__(self, function, args):
         self.function = function
         self.args = args
@@ -76,6 +146,8 @@ class BlockStat(AST):
     """
     Represents block statement
     """
+    __slots__ = ('list',)
+
     def __init__(self, statements_list):
         self.list = statements_list
 
@@ -84,6 +156,8 @@ class StatList(AST):
     """
     Represents list of statements.
     """
+    __slots__ = ('statements',)
+
     def __init__(self, statements):
         """
         List of statements AST node.
@@ -96,6 +170,8 @@ class Assign(AST):
     """
     Represents assignment operation.
     """
+    __slots__ = ('left', 'token', 'op', 'right')
+
     def __init__(self, left, op, right):
         """
         Assign operation node.
@@ -110,6 +186,8 @@ class Assign(AST):
 
 class VarDeclaration(AST):
     """ The VarDeclaration node represents variable declaration."""
+    __slots__ = ('type', 'names')
+
     def __init__(self, type, names):
         self.type = type
         self.names = names
@@ -117,6 +195,8 @@ class VarDeclaration(AST):
 
 class Var(AST):
     """The Var node is constructed out of ID token."""
+    __slots__ = ('token', 'value')
+
     def __init__(self, token):
         """
         Variable node.
@@ -127,16 +207,22 @@ class Var(AST):
 
 
 class If(AST):
+    __slots__ = ('cond', 'block')
+
     def __init__(self, conditional_node, block_node):
         self.cond = conditional_node
         self.block = block_node
 
 class While(AST):
+    __slots__ = ('cond', 'block')
+
     def __init__(self, conditional_node, block_node):
         self.cond = conditional_node
         self.block = block_node
 
 class ConditionalVal(AST):
+    __slots__ = ('left', 'op', 'right')
+
     def __init__(self, left, op, right):
         self.left = left
         self.op = op
@@ -147,12 +233,14 @@ class NoOp(AST):
     """
     Node representing empty production(nothing happens)
     """
-    pass
+    __slots__ = ()
 
 class DeclaredType(AST):
     """
     Node representing exteral type
     """
+    __slots__ = ('name',)
+
     def __init__(self, name):
         self.name = name
 
@@ -160,15 +248,25 @@ class ExternalFunctionDeclaration(AST):
     """
     Node representing external function
     """
-    def __init__(self, function_name, return_type = None, arguments_types = None):
+    __slots__ = ('name', 'return_type', 'arguments_types', 'pure')
+
+    def __init__(self, function_name, return_type = None, arguments_types = None, pure=False):
+        """
+        :param pure: Whether the function was declared pure: its result depends only on the
+        arguments and calling it has no other effect, so calls with the same arguments may be
+        evaluated once.
+        """
         self.name = function_name
         self.return_type = return_type
         self.arguments_types = arguments_types
+        self.pure = pure
 
 class ModuleDeclaration(AST):
     """
     Node representing declared module
     """
+    __slots__ = ('name', 'functions')
+
     def __init__(self, module_name, functions):
         self.name = module_name
         self.functions = functions
@@ -177,26 +275,118 @@ class Declarations(AST):
     """
     Node representing external types and modules
     """
+    __slots__ = ('types', 'modules')
+
     def __init__(self, types, modules):
         self.types = types
         self.modules = modules
 
+class SharedExpression(AST):
+    """
+    Node made by the optimizer: expression whose value is computed once and reused by the
+    SharedExpressions with the same slot, until its SharingRegion is run again.
+    """
+    __slots__ = ('expression', 'slot')
+
+    def __init__(self, expression, slot):
+        self.expression = expression
+        self.slot = slot
+
+class SharingRegion(AST):
+    """
+    Node made by the optimizer: statement in which SharedExpressions of the slots are computed
+    anew, each time the statement runs.
+    """
+    __slots__ = ('statement', 'slots')
+
+    def __init__(self, statement, slots):
+        self.statement = statement
+        self.slots = slots
+
+# FIRST sets and operator sets used to select parsing branches.
+STATEMENT_FIRST = frozenset((ID, IF, PLUS, MINUS, NUMBER, LPAREN, LBRACKET, SEMI, LCURLY, VAR, ARRAY, WHILE, DEF,
+                             PURE, RETURN))
+NUMERIC_FIRST = frozenset((NUMBER, LPAREN, LBRACKET, MINUS, PLUS))
+ASSIGNED_VALUE_FIRST = NUMERIC_FIRST | {ID}
+CALL_ARGUMENTS_FIRST = frozenset((ID, PLUS, MINUS, NUMBER, LPAREN, LBRACKET, COMMA, STRING))
+NAME_TYPES = frozenset((ID, VAR, ARRAY))
+# Keywords of builtin types variables are declared with.
+DECLARED_TYPES = frozenset((VAR, ARRAY))
+ADDITIVE_OPERATORS = frozenset((PLUS, MINUS))
+MULTIPLICATIVE_OPERATORS = frozenset((MUL, DIV))
+ARITHMETIC_OPERATORS = ADDITIVE_OPERATORS | MULTIPLICATIVE_OPERATORS
+RELATIONAL_OPERATORS = frozenset((EQ, NEQ, LT, MT, LEQT, MEQT))
+LOGICAL_OPERATORS = frozenset((AND, OR))
+UNARY_PRECEDENCE = 3
+BINARY_PRECEDENCE = {PLUS: 1, MINUS: 1, MUL: 2, DIV: 2}
+PREFIX_PRECEDENCE = {PLUS: UNARY_PRECEDENCE, MINUS: UNARY_PRECEDENCE, LPAREN: 0}
+
+
 class Parser(object):
     def __init__(self, lexer):
+        """
+        Construct parser.
+        :param lexer: Lexer, the whole input is tokenized into TokenStream before
+                      parsing, or TokenStream itself.
+        """
         self.lexer = lexer
-        # set current token to the first token taken from the input
-        self.current_token = self.lexer.get_next_token()
+        stream = lexer.tokenize_arrays() if hasattr(lexer, 'tokenize_arrays') else lexer
+        self.stream = stream
+        self.types = stream.types.tolist()
+        self.values = stream.values
+        self.offsets = stream.offsets
+        # index of the current token in the stream and its type
+        self.pos = 0
+        self.current_type = self.types[0]
+
+    @property
+    def current_token(self):
+        """
+        Token object of the current token.
+        """
+        return self.stream.token(self.pos)
+
+    def value_token(self, token_type):
+        """
+        Create Token object for the current token, which carries a value (ID, NUMBER, STRING).
+        """
+        return Token(token_type, self.values[self.pos], self.offsets[self.pos])
+
+    def peek(self, k=1):
+        """
+        Return type of the token k positions after the current one.
+        """
+        index = self.pos + k
+        types = self.types
+        return types[index] if index < len(types) else EOF
+
+    def describe_location(self, offset):
+        """
+        Return line and column of the source offset as text.
+        """
+        if self.stream.line_index is None:
+            return 'offset {}'.format(offset)
+        return self.stream.line_index.describe(offset)
 
     def error(self, expected=None):
-        raise Exception('Invalid syntax, expected {} and got {} instead.'.format(expected, self.current_token.type))
+        if expected is not None:
+            expected = token_name(expected) if isinstance(expected, int) else expected
+        raise Exception('Invalid syntax, expected {} and got {} instead at {}.'.format(
+            expected, token_name(self.current_type), self.describe_location(self.offsets[self.pos])))
+
+    def advance(self):
+        """Move to the next token without checking the current one."""
+        self.pos += 1
+        self.current_type = self.types[self.pos]
 
     def eat(self, token_type):
         # compare the current token type with the passed token
         # type and if they match then "eat" the current token
-        # and assign the next token to the self.current_token,
+        # and move to the next token in the stream,
         # otherwise raise an exception.
-        if self.current_token.type == token_type:
-            self.current_token = self.lexer.get_next_token()
+        if self.current_type == token_type:
+            self.pos += 1
+            self.current_type = self.types[self.pos]
         else:
             self.error(token_type)
 
@@ -212,7 +402,7 @@ class Parser(object):
         """
         declaration-block = "Declarations", whitespace, '{', types-declaration, modules-declarations, whitespace, '}' ;
         """
-        if self.current_token.type != DECLARATIONS:
+        if self.current_type != DECLARATIONS:
             return
 
         self.eat(DECLARATIONS)
@@ -220,10 +410,10 @@ class Parser(object):
         types = []
         modules = []
 
-        if self.current_token.type == TYPES:
+        if self.current_type == TYPES:
             types = self.types_declarations()
 
-        if self.current_token.type == MODULES:
+        if self.current_type == MODULES:
             modules = self.modules_declarations()
 
         self.eat(RCURLY)
@@ -245,13 +435,13 @@ class Parser(object):
         """
         custom-type-list = {custom-type, ','}, [custom-type] ;
         """
-        if self.current_token.type == ID:
-            types_names = [DeclaredType(self.current_token.value)]
+        if self.current_type == ID:
+            types_names = [DeclaredType(self.values[self.pos])]
             self.eat(ID)
 
-            while self.current_token.type is COMMA:
+            while self.current_type == COMMA:
                 self.eat(COMMA)
-                types_names.append(DeclaredType(self.current_token.value))
+                types_names.append(DeclaredType(self.values[self.pos]))
                 self.eat(ID)
         else:
             types_names = []
@@ -266,7 +456,7 @@ class Parser(object):
         self.eat(LCURLY)
 
         modules = []
-        while self.current_token.type != RCURLY:
+        while self.current_type != RCURLY:
             modules.append(self.module_block())
 
         self.eat(RCURLY)
@@ -277,11 +467,11 @@ class Parser(object):
         """
         module-block = name, '{', {extern-function-declaration}, '}' ;
         """
-        module_name = self.current_token.value
+        module_name = self.values[self.pos]
         self.eat(ID)
         self.eat(LCURLY)
         functions = []
-        while self.current_token.value != RCURLY:
+        while self.current_type != RCURLY:
             functions.append(self.extern_function_declaration())
         self.eat(RCURLY)
 
@@ -289,43 +479,43 @@ class Parser(object):
 
     def extern_function_declaration(self):
         """
-        extern-function-declaration = custom-type, whitespace, name, whitespace, '(', extern-args-list, ')', whitespace, ';', ;
+        extern-function-declaration = ["pure"], custom-type, whitespace, name, whitespace, '(', extern-args-list, ')', whitespace, ';', ;
         """
+        pure = self.current_type == PURE
+        if pure:
+            self.eat(PURE)
         name = self.current_token.value
-        if self.current_token.type == VAR:
-            self.eat(VAR)
+        if self.current_type in DECLARED_TYPES:
+            self.eat(self.current_type)
         else:
             self.eat(ID)
 
-        if self.current_token.type == ID:
-            return_type, function_name = name, self.current_token.value
+        if self.current_type == ID:
+            return_type, function_name = name, self.values[self.pos]
             self.eat(ID)
         else:
             function_name = name
             return_type = None
 
         self.eat(LPAREN)
-        if self.current_token.type == ID or self.current_token.type == VAR:
+        if self.current_type in NAME_TYPES:
             types_names = [self.current_token.value]
-            if self.current_token.type == ID:
-                self.eat(ID)
-            else:
-                self.eat(VAR)
+            self.eat(self.current_type)
 
-            while self.current_token.type is COMMA:
+            while self.current_type == COMMA:
                 self.eat(COMMA)
                 types_names.append(self.current_token.value)
-                if self.current_token.type == ID:
-                    self.eat(ID)
+                if self.current_type in DECLARED_TYPES:
+                    self.eat(self.current_type)
                 else:
-                    self.eat(VAR)
+                    self.eat(ID)
         else:
             types_names = []
 
         self.eat(RPAREN)
         self.eat(SEMI)
 
-        return ExternalFunctionDeclaration(function_name, return_type, types_names)
+        return ExternalFunctionDeclaration(function_name, return_type, types_names, pure)
 
 
     def block_statement(self):
@@ -343,7 +533,7 @@ class Parser(object):
 
         results = [node]
 
-        while self.current_token.type in (ID, IF, PLUS, MINUS, NUMBER, LPAREN, SEMI, LCURLY, VAR, WHILE, DEF, RETURN):
+        while self.current_type in STATEMENT_FIRST:
             results.append(self.statement())
 
         return StatList(results)
@@ -359,58 +549,45 @@ class Parser(object):
 	    | if-statement
 	    | empty, semi ;
         """
-        if self.current_token.type == ID or self.current_token.type == VAR:
-            node = self.factorized()
-            self.eat(SEMI)
-        elif self.current_token.type == DEF:
-            self.eat(DEF)
-            node = self.function_declaration()
-        elif self.current_token.type == IF:
-            node = self.if_statement()
-        elif self.current_token.type == WHILE:
-            node = self.while_statement()
-        elif self.current_token.type == NUMBER or self.current_token.type == LPAREN or self.current_token == PLUS or self.current_token == MINUS:
-            node = self.numeric_value()
-            self.eat(SEMI)
-        elif self.current_token.type == STRING:
-            node = self.string_value()
-            self.eat(SEMI)
-        elif self.current_token.type == LCURLY:
-            node = self.block_statement()
-        elif self.current_token.type == RETURN:
-            node = self.return_statement()
-            self.eat(SEMI)
-        else:
-            node = self.empty()
+        parse, needs_semi = STATEMENT_PRODUCTIONS.get(self.current_type, EMPTY_PRODUCTION)
+        node = parse(self)
+        if needs_semi:
             self.eat(SEMI)
         return node
 
     def factorized(self):
-        if self.current_token.type == VAR:
+        if self.current_type in DECLARED_TYPES:
             type = self.current_token
-            self.eat(VAR)
+            self.eat(self.current_type)
             names = self.variable_declaration()
             return VarDeclaration(type, names)
 
+        start = self.pos
         variable = self.variable()
-        if self.current_token.type == ASSIGN:
-            token = self.current_token
+        token_type = self.current_type
+        if token_type == LBRACKET:
+            # element or slice, possibly an operand of arithmetic
+            self.pos = start
+            self.current_type = ID
+            return self.numeric_value()
+        if token_type == ASSIGN:
+            token = TOKEN_SINGLETONS[ASSIGN]
             right = self.assignment_statement()
             return Assign(variable, token, right)
-        elif self.current_token.type == PLUS or self.current_token.type == MINUS or self.current_token.type == MUL or self.current_token.type == DIV:
-            op = self.current_token
-            self.eat(op.type)
+        elif token_type in ARITHMETIC_OPERATORS:
+            op = TOKEN_SINGLETONS[token_type]
+            self.eat(token_type)
             right = self.numeric_value()
             return BinOp(variable, op, right)
-        elif self.current_token.type == LPAREN:
+        elif token_type == LPAREN:
             args = self.function_call()
             return FunctionCall(variable, args)
-        elif self.current_token.type == ID:
+        elif token_type == ID:
             type = variable
             names = self.variable_declaration()
             return VarDeclaration(type, names)
         else:
-            return Var(variable)
+            return variable
 
     def if_statement(self):
         self.eat(IF)
@@ -435,14 +612,15 @@ class Parser(object):
         self.eat(LPAREN)
 
         args = []
-        while self.current_token.type in (ID, PLUS, MINUS, NUMBER, LPAREN, COMMA, STRING):
-            if self.current_token.type == COMMA:
+        while self.current_type in CALL_ARGUMENTS_FIRST:
+            if self.current_type == COMMA:
                 self.eat(COMMA)
-            if self.current_token.type == ID:
+            token_type = self.current_type
+            if token_type == ID:
                 args.append(self.factorized())
-            elif self.current_token.type == NUMBER or self.current_token.type == LPAREN or self.current_token.type == MINUS or self.current_token.type == PLUS:
+            elif token_type in NUMERIC_FIRST:
                 args.append(self.numeric_value())
-            elif self.current_token.type == STRING:
+            elif token_type == STRING:
                 args.append(self.string_value())
             else:
                 self.error()
@@ -454,20 +632,30 @@ class Parser(object):
     def return_statement(self):
         "return-statement = return, variable | numeric-value | string-value | function-call;"
         self.eat(RETURN)
-        token = self.current_token
+        token_type = self.current_type
 
-        if token.type == ID:
+        if token_type == ID:
             node = self.factorized()
-        elif self.current_token.type == NUMBER or self.current_token.type == LPAREN or self.current_token.type == MINUS or self.current_token.type == PLUS:
+        elif token_type in NUMERIC_FIRST:
             node = self.numeric_value()
-        elif self.current_token.type == STRING:
+        elif token_type == STRING:
             node = self.string_value()
         else:
             self.error()
 
         return Return(node)
 
-    def function_declaration(self):
+    def function_definition(self):
+        """
+        function-definition = ["pure"], "def", function-declaration ;
+        """
+        pure = self.current_type == PURE
+        if pure:
+            self.eat(PURE)
+        self.eat(DEF)
+        return self.function_declaration(pure)
+
+    def function_declaration(self, pure=False):
         """
         function-declaration = identifier, lparen, var-list, rparen, function-block ;
         """
@@ -482,19 +670,19 @@ class Parser(object):
         #args = [Token(ID, name) for name in names]
         #body.list.statements.insert(0, (VarDeclaration(Token(ID, VAR), args)))
 
-        return FunctionDeclaration(name, names, body)
+        return FunctionDeclaration(name, names, body, pure)
 
     def var_list(self):
         """
         var-list = identifier, {comma, identifier} | empty ;
         """
-        if self.current_token.type == ID:
-            names = [self.current_token.value]
+        if self.current_type == ID:
+            names = [self.values[self.pos]]
             self.eat(ID)
 
-            while self.current_token.type is COMMA:
+            while self.current_type == COMMA:
                 self.eat(COMMA)
-                names.append(self.current_token.value)
+                names.append(self.values[self.pos])
                 self.eat(ID)
         else:
             names = []
@@ -508,7 +696,7 @@ class Parser(object):
         names = [self.current_token]
         self.eat(ID)
 
-        while self.current_token.type is COMMA:
+        while self.current_type == COMMA:
             self.eat(COMMA)
             names.append(self.current_token)
             self.eat(ID)
@@ -521,11 +709,12 @@ class Parser(object):
         assignment-statement = variable, assign, (numeric-value | string-value | function-call | nill), semi ;
         """
         self.eat(ASSIGN)
-        token = self.current_token
-        if self.current_token.type == NUMBER or self.current_token.type == LPAREN or self.current_token.type == MINUS or self.current_token.type == PLUS or self.current_token.type == ID:
+        if self.current_type in ASSIGNED_VALUE_FIRST:
             node = self.numeric_value()
-        elif self.current_token.type == STRING:
+        elif self.current_type == STRING:
             node = self.string_value()
+        else:
+            self.error()
 
         return node
 
@@ -542,8 +731,10 @@ class Parser(object):
         """
         variable = identifier
         """
-        node = Var(self.current_token)
-        self.eat(ID)
+        if self.current_type != ID:
+            self.error(ID)
+        node = Var(self.value_token(ID))
+        self.advance()
         return node
 
     def empty(self):
@@ -557,14 +748,10 @@ class Parser(object):
         """
         node = self.cond_value()
 
-        while self.current_token.type in (AND, OR):
-            token = self.current_token
-            if token.type == AND:
-                self.eat(AND)
-                node = ConditionalVal(node, token, self.cond_value())
-            elif token.type == OR:
-                self.eat(OR)
-                node = ConditionalVal(node, token, self.cond_value())
+        while self.current_type in LOGICAL_OPERATORS:
+            token = TOKEN_SINGLETONS[self.current_type]
+            self.eat(token.type)
+            node = ConditionalVal(node, token, self.cond_value())
 
         return node
 
@@ -573,95 +760,158 @@ class Parser(object):
         cond-value = numeric-value, lower-logic-operator, numeric-value ;
         """
         lvalue = self.numeric_value()
-        token = self.current_token
+        token = TOKEN_SINGLETONS[self.current_type] or self.current_token
 
-        if token.type == EQ:
-            self.eat(EQ)
-        elif token.type == NEQ:
-            self.eat(NEQ)
-        elif token.type == LT:
-            self.eat(LT)
-        elif token.type == MT:
-            self.eat(MT)
-        elif token.type == LEQT:
-            self.eat(LEQT)
-        elif token.type == MEQT:
-            self.eat(MEQT)
+        if token.type in RELATIONAL_OPERATORS:
+            self.eat(token.type)
         else:
             self.error("CONDITIONAL-TOKEN")
 
-        if self.current_token.type == ID:
+        token_type = self.current_type
+        if token_type == ID:
             node = self.factorized()
-        elif self.current_token.type == NUMBER or self.current_token.type == LPAREN or self.current_token.type == MINUS or self.current_token.type == PLUS:
+        elif token_type in NUMERIC_FIRST:
             node = self.numeric_value()
-        elif self.current_token.type == STRING:
+        elif token_type == STRING:
             node = self.string_value()
+        else:
+            self.error()
         return ConditionalVal(lvalue, token, node)
 
     ############# MATH #############
     def numeric_value(self):
         """
         numeric-value = term, {math-sign, term} ;
-        """
-        node = self.term()
-
-        while self.current_token.type in (PLUS, MINUS):
-            token = self.current_token
-            if token.type == PLUS:
-                self.eat(PLUS)
-            elif token.type == MINUS:
-                self.eat(MINUS)
-
-            node = BinOp(left=node, op=token, right=self.term())
-
-        return node
-
-    def term(self):
-        """term : factor {binary-math-operator, factor}"""
-        node = self.factor()
-
-        while self.current_token.type in (MUL, DIV):
-            token = self.current_token
-            if token.type == MUL:
-                self.eat(MUL)
-            elif token.type == DIV:
-                self.eat(DIV)
-
-            node = BinOp(left=node, op=token, right=self.factor())
+        term = factor, {binary-math-operator, factor} ;
+        factor = unary-operator, factor
+                 | integer
+                 | float
+                 | (variable | function-call | array-literal), {subscript}
+                 | lparen, numeric-value, rparen ;
+
+        Parsed by operator precedence with explicit operand and operator stacks,
+        so nesting of parentheses and unary operators is not limited by the
+        recursion depth. Operator stack holds (precedence, token) pairs; open
+        parenthesis has the lowest precedence, unary operators the highest.
+        """
+        types = self.types
+        values = self.values
+        offsets = self.offsets
+        operands = []
+        operators = []
+        open_parens = 0
+        pos = self.pos
+        token_type = types[pos]
+
+        while True:
+            # Operand: any number of prefixes, then a variable, function call or number.
+            while token_type in PREFIX_PRECEDENCE:
+                if token_type == LPAREN:
+                    open_parens += 1
+                operators.append((PREFIX_PRECEDENCE[token_type], TOKEN_SINGLETONS[token_type]))
+                pos += 1
+                token_type = types[pos]
+
+            if token_type == ID:
+                node = Var(Token(ID, values[pos], offsets[pos]))
+                pos += 1
+                token_type = types[pos]
+                if token_type == LPAREN:
+                    self.pos = pos
+                    self.current_type = token_type
+                    node = FunctionCall(node, self.function_call())
+                    pos = self.pos
+                    token_type = types[pos]
+            elif token_type == NUMBER:
+                node = Num(Token(NUMBER, values[pos], offsets[pos]))
+                pos += 1
+                token_type = types[pos]
+            elif token_type == LBRACKET:
+                self.pos = pos
+                self.current_type = token_type
+                node = self.array_literal()
+                pos = self.pos
+                token_type = types[pos]
+            else:
+                self.pos = pos
+                self.current_type = token_type
+                self.error(ID)
+            if token_type == LBRACKET and not isinstance(node, Num):
+                self.pos = pos
+                self.current_type = token_type
+                while self.current_type == LBRACKET:
+                    node = self.subscript(node)
+                pos = self.pos
+                token_type = types[pos]
+            operands.append(node)
+
+            # Closing parentheses of the expression itself; any other ')' ends it.
+            while token_type == RPAREN and open_parens:
+                precedence, token = operators.pop()
+                while precedence:
+                    self._reduce(operands, precedence, token)
+                    precedence, token = operators.pop()
+                open_parens -= 1
+                pos += 1
+                token_type = types[pos]
+
+            precedence = BINARY_PRECEDENCE.get(token_type)
+            if precedence is None:
+                break
+            while operators and operators[-1][0] >= precedence:
+                self._reduce(operands, *operators.pop())
+            operators.append((precedence, TOKEN_SINGLETONS[token_type]))
+            pos += 1
+            token_type = types[pos]
+
+        self.pos = pos
+        self.current_type = token_type
+        if open_parens:
+            self.error(RPAREN)
+        while operators:
+            self._reduce(operands, *operators.pop())
+        return operands[0]
+
+    def array_literal(self):
+        """
+        array-literal = lbracket, [numeric-value, {comma, numeric-value}], rbracket ;
+        """
+        token = Token(LBRACKET, '[', self.offsets[self.pos])
+        self.eat(LBRACKET)
+        elements = []
+        if self.current_type != RBRACKET:
+            elements.append(self.numeric_value())
+            while self.current_type == COMMA:
+                self.eat(COMMA)
+                elements.append(self.numeric_value())
+        self.eat(RBRACKET)
+        return ArrayLiteral(token, elements)
 
-        return node
+    def subscript(self, node):
+        """
+        subscript = lbracket, (numeric-value | [numeric-value], colon, [numeric-value]), rbracket ;
+        """
+        token = Token(LBRACKET, '[', self.offsets[self.pos])
+        self.eat(LBRACKET)
+        start = self.numeric_value() if self.current_type != COLON else None
+        if self.current_type != COLON:
+            self.eat(RBRACKET)
+            return Index(node, token, start)
+        self.eat(COLON)
+        end = self.numeric_value() if self.current_type != RBRACKET else None
+        self.eat(RBRACKET)
+        return Slice(node, token, start, end)
 
-    def factor(self):
-        """factor = unary-operator, factor
-                    | integer
-                    | float
-                    | variable
-                    | function-call
-                    | lparen, numeric-value, rparen ;
+    @staticmethod
+    def _reduce(operands, precedence, token):
         """
-        token = self.current_token
-        if token.type == PLUS:
-            self.eat(PLUS)
-            node = UnaryOp(token, self.factor())
-            return node
-        elif token.type == MINUS:
-            self.eat(MINUS)
-            node = UnaryOp(token, self.factor())
-            return node
-        elif token.type == NUMBER:
-            self.eat(NUMBER)
-            return Num(token)
-        elif token.type == LPAREN:
-            self.eat(LPAREN)
-            node = self.numeric_value()
-            self.eat(RPAREN)
-            return node
+        Replace top operands with node of the operator popped from the stack.
+        """
+        if precedence == UNARY_PRECEDENCE:
+            operands[-1] = UnaryOp(token, operands[-1])
         else:
-            node = self.variable()
-            if self.current_token.type == LPAREN:
-                args = self.function_call()
-                return FunctionCall(node, args)
-            return node
+            right = operands.pop()
+            operands[-1] = BinOp(left=operands[-1], op=token, right=right)
 
     def parse(self):
         """
@@ -669,7 +919,44 @@ class Parser(object):
         :return:
         """
         node = self.program()
-        if self.current_token.type != EOF:
+        if self.current_type != EOF:
             self.error()
 
         return node
+
+
+# Statement production selected by the type of its first token: (parsing method, whether ';' follows).
+STATEMENT_PRODUCTIONS = {
+    ID: (Parser.factorized, True),
+    VAR: (Parser.factorized, True),
+    ARRAY: (Parser.factorized, True),
+    DEF: (Parser.function_definition, False),
+    PURE: (Parser.function_definition, False),
+    IF: (Parser.if_statement, False),
+    WHILE: (Parser.while_statement, False),
+    NUMBER: (Parser.numeric_value, True),
+    LPAREN: (Parser.numeric_value, True),
+    LBRACKET: (Parser.numeric_value, True),
+    PLUS: (Parser.numeric_value, True),
+    MINUS: (Parser.numeric_value, True),
+    STRING: (Parser.string_value, True),
+    LCURLY: (Parser.block_statement, False),
+    RETURN: (Parser.return_statement, True),
+}
+
+EMPTY_PRODUCTION = (Parser.empty, True)
+
+
+class ParsedTree(object):
+    """
+    Stands in for the parser of an already parsed program, so that it is not parsed again.
+    """
+    def __init__(self, tree, parser):
+        self.tree = tree
+        self.parser = parser
+
+    def parse(self):
+        return self.tree
+
+    def describe_location(self, offset):
+        return self.parser.describe_location(offset)
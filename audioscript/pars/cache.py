@@ -0,0 +1,125 @@
+import hashlib
+import os
+import pickle
+import tempfile
+
+from audioscript.lexer.Lexer import make_lexer
+from audioscript.lexer.line_index import LineIndex
+from audioscript.pars.Parser import Parser
+
+# Bump whenever AST node classes or tokens change, so trees pickled by older code are not loaded.
+FORMAT_VERSION = 4
+CACHE_DIRECTORY = '__ascache__'
+CACHE_SUFFIX = '.ast'
+MAX_ENTRIES = 256
+# Setting this environment variable to a non-empty value turns the cache off.
+DISABLE_VARIABLE = 'AUDIOSCRIPT_NO_CACHE'
+
+
+def cache_enabled():
+    return not os.environ.get(DISABLE_VARIABLE)
+
+
+class CachedParser(object):
+    """
+    Parser of a script file that keeps parsed trees in a cache directory next to the script,
+    similar to __pycache__. Entries are keyed by hash of the source and FORMAT_VERSION, written
+    atomically, so several processes may share the directory, and least recently used entries
+    are removed when there are more than max_entries of them.
+    """
+    def __init__(self, path, lexer_engine='regex', cache_dir=None, max_entries=MAX_ENTRIES):
+        """
+        :param path: path to the script.
+        :param lexer_engine: lexer used when the tree is not cached.
+        :param cache_dir: directory of the cache, by default __ascache__ next to the script.
+        :param max_entries: number of trees kept in the cache directory.
+        """
+        self.path = path
+        self.lexer_engine = lexer_engine
+        self.cache_dir = cache_dir or os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIRECTORY)
+        self.max_entries = max_entries
+        self.line_index = None
+        self.hit = False
+
+    def describe_location(self, offset):
+        return self.line_index.describe(offset)
+
+    def entry_path(self, digest):
+        name = os.path.splitext(os.path.basename(self.path))[0]
+        return os.path.join(self.cache_dir, '{}.{}{}'.format(name, digest[:32], CACHE_SUFFIX))
+
+    def parse(self):
+        """
+        Return tree of the script, from the cache when possible.
+        """
+        with open(self.path, 'rb') as f:
+            source = f.read()
+        text = source.decode('utf-8')
+        self.line_index = LineIndex(text)
+        digest = hashlib.sha256(b'%d:' % FORMAT_VERSION + source).hexdigest()
+        entry = self.entry_path(digest)
+
+        tree = self.load(entry, digest)
+        self.hit = tree is not None
+        if tree is None:
+            tree = Parser(make_lexer(text, self.lexer_engine)).parse()
+            self.store(entry, digest, tree)
+        return tree
+
+    def load(self, entry, digest):
+        """
+        Return cached tree or None when the entry is missing or unusable.
+        """
+        try:
+            with open(entry, 'rb') as f:
+                version, entry_digest, tree = pickle.load(f)
+            # mark entry as recently used for the eviction
+            os.utime(entry)
+        except Exception:
+            return None
+        if version != FORMAT_VERSION or entry_digest != digest:
+            return None
+        return tree
+
+    def store(self, entry, digest, tree):
+        """
+        Write the tree to a temporary file and move it in place in one step, so readers never
+        see a partial entry. Failures only mean that the tree is not cached.
+        """
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, temporary = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump((FORMAT_VERSION, digest, tree), f, pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary, entry)
+        except (OSError, pickle.PicklingError, RecursionError):
+            # too deeply nested trees can not be pickled
+            try:
+                os.remove(temporary)
+            except OSError:
+                pass
+            return
+        self.evict()
+
+    def evict(self):
+        """
+        Remove least recently used entries above max_entries.
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(CACHE_SUFFIX):
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    entries.append((os.stat(path).st_mtime, path))
+                except OSError:
+                    # removed by another process meanwhile
+                    pass
+        entries.sort()
+        for _, path in entries[:max(len(entries) - self.max_entries, 0)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
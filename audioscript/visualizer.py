@@ -16,6 +16,8 @@ class ASTVisualizer(NodeVisitor):
     def __init__(self, parser):
         self.parser = parser
         self.ncount = 1
+        # DOT node number of every visited AST node
+        self.nums = {}
         self.dot_header = [textwrap.dedent("""\
         digraph astgraph {
           node [shape=circle, fontsize=12, fontname="Courier", height=.1];
@@ -32,94 +34,94 @@ class ASTVisualizer(NodeVisitor):
         """
         s = '  node{} [label="Program"]\n'.format(self.ncount)
         self.dot_body.append(s)
-        node._num = self.ncount
+        self.nums[node] = self.ncount
         self.ncount += 1
 
         if node.declarations is not None:
             self.visit(node.declarations)
-            s = '  node{} -> node{}\n'.format(node._num, node.declarations._num)
+            s = '  node{} -> node{}\n'.format(self.nums[node], self.nums[node.declarations])
             self.dot_body.append(s)
 
         self.visit(node.code)
-        s = '  node{} -> node{}\n'.format(node._num, node.code._num)
+        s = '  node{} -> node{}\n'.format(self.nums[node], self.nums[node.code])
         self.dot_body.append(s)
 
     def visit_DeclaredType(self, node):
         s = '  node{} [label="External type: {}"]\n'.format(self.ncount, node.name)
         self.dot_body.append(s)
-        node._num = self.ncount
+        self.nums[node] = self.ncount
         self.ncount += 1
 
     def visit_ExternalFunctionDeclaration(self, node):
         s = '  node{} [label="External Function\\nDeclaration:\\n {} {}({})"]\n'.format(self.ncount, node.return_type, node.name,
                                                                               ', '.join(node.arguments_types))
         self.dot_body.append(s)
-        node._num = self.ncount
+        self.nums[node] = self.ncount
         self.ncount += 1
 
     def visit_ModuleDeclaration(self, node):
         s = '  node{} [label="Module: {}"]\n'.format(self.ncount, node.name)
         self.dot_body.append(s)
-        node._num = self.ncount
+        self.nums[node] = self.ncount
         self.ncount += 1
 
         for function in node.functions:
             self.visit(function)
-            s = '  node{} -> node{}\n'.format(node._num, function._num)
+            s = '  node{} -> node{}\n'.format(self.nums[node], self.nums[function])
             self.dot_body.append(s)
 
     def visit_Declarations(self, node):
         s = '  node{} [label="Declarations"]\n'.format(self.ncount)
         self.dot_body.append(s)
-        node._num = self.ncount
+        self.nums[node] = self.ncount
         self.ncount += 1
 
         for ext_type in node.types:
             self.visit(ext_type)
-            s = '  node{} -> node{}\n'.format(node._num, ext_type._num)
+            s = '  node{} -> node{}\n'.format(self.nums[node], self.nums[ext_type])
             self.dot_body.append(s)
 
         for module in node.modules:
             self.visit(module)
-            s = '  node{} -> node{}\n'.format(node._num, module._num)
+            s = '  node{} -> node{}\n'.format(self.nums[node], self.nums[module])
             self.dot_body.append(s)
 
     def visit_BlockStat(self, node):
         s = '  node{} [label="Block"]\n'.format(self.ncount)
         self.dot_body.append(s)
-        node._num = self.ncount
+        self.nums[node] = self.ncount
         self.ncount += 1
 
         self.visit(node.list)
-        s = '  node{} -> node{}\n'.format(node._num, node.list._num)
+        s = '  node{} -> node{}\n'.format(self.nums[node], self.nums[node.list])
         self.dot_body.append(s)
 
     def visit_StatList(self, node):
         s = '  node{} [label="Statement List"]\n'.format(self.ncount)
         self.dot_body.append(s)
-        node._num = self.ncount
+        self.nums[node] = self.ncount
         self.ncount += 1
 
         for statement in node.statements:
             self.visit(statement)
-            s = '  node{} -> node{}\n'.format(node._num, statement._num)
+            s = '  node{} -> node{}\n'.format(self.nums[node], self.nums[statement])
             self.dot_body.append(s)
 
     def visit_Var(self, node):
         s = '  node{} [label="{}"]\n'.format(self.ncount, node.value)
         self.dot_body.append(s)
-        node._num = self.ncount
+        self.nums[node] = self.ncount
         self.ncount += 1
 
     def visit_VarDeclaration(self, node):
         s = '  node{} [label="Var\\nDeclaration: {}"]\n'.format(self.ncount, node.type.value)
         self.dot_body.append(s)
-        node._num = self.ncount
+        self.nums[node] = self.ncount
         self.ncount += 1
 
         for variable, i in zip(node.names, range(1, len(node.names) + 1)):
-            s = '  node{} -> node{}\n'.format(node._num, node._num + i)
-            ns = '  node{} [label="{}"]\n'.format(node._num + i, variable.value)
+            s = '  node{} -> node{}\n'.format(self.nums[node], self.nums[node] + i)
+            ns = '  node{} [label="{}"]\n'.format(self.nums[node] + i, variable.value)
             self.dot_body.extend((s, ns))
 
         self.ncount += len(node.names)
@@ -127,70 +129,70 @@ class ASTVisualizer(NodeVisitor):
     def visit_Num(self, node):
         s = '  node{} [label="{}"]\n'.format(self.ncount, node.token.value)
         self.dot_body.append(s)
-        node._num = self.ncount
+        self.nums[node] = self.ncount
         self.ncount += 1
 
     def visit_ConditionalVal(self, node):
         s = '  node{} [label="{}"]\n'.format(self.ncount, node.op.value)
         self.dot_body.append(s)
-        node._num = self.ncount
+        self.nums[node] = self.ncount
         self.ncount += 1
 
         self.visit(node.left)
         self.visit(node.right)
 
         for child_node in (node.left, node.right):
-            s = '  node{} -> node{}\n'.format(node._num, child_node._num)
+            s = '  node{} -> node{}\n'.format(self.nums[node], self.nums[child_node])
             self.dot_body.append(s)
 
     def visit_String(self, node):
         s = '  node{} [label="{}"]\n'.format(self.ncount, node.token.value)
         self.dot_body.append(s)
-        node._num = self.ncount
+        self.nums[node] = self.ncount
         self.ncount += 1
 
     def visit_If(self, node):
         s = '  node{} [label="If"]\n'.format(self.ncount)
         self.dot_body.append(s)
-        node._num = self.ncount
+        self.nums[node] = self.ncount
         self.ncount += 1
 
         self.visit(node.cond)
         self.visit(node.block)
-        self.dot_body.append('  node{} -> node{}\n'.format(node._num, node.cond._num))
-        self.dot_body.append('  node{} -> node{}\n'.format(node._num, node.block._num))
+        self.dot_body.append('  node{} -> node{}\n'.format(self.nums[node], self.nums[node.cond]))
+        self.dot_body.append('  node{} -> node{}\n'.format(self.nums[node], self.nums[node.block]))
 
     def visit_Return(self, node):
         s = '  node{} [label="Return"]\n'.format(self.ncount)
         self.dot_body.append(s)
-        node._num = self.ncount
+        self.nums[node] = self.ncount
         self.ncount += 1
 
         self.visit(node.value)
-        s = '  node{} -> node{}\n'.format(node._num, node.value._num)
+        s = '  node{} -> node{}\n'.format(self.nums[node], self.nums[node.value])
         self.dot_body.append(s)
 
     def visit_FunctionDeclaration(self, node):
         s = '  node{} [label="Function \\nDeclaration: {}"]\n'.format(self.ncount, node.name.value)
         self.dot_body.append(s)
-        node._num = self.ncount
+        self.nums[node] = self.ncount
         self.ncount += 1
 
         for arg, i in zip(node.arguments, range(1, len(node.arguments) + 1)):
-            ns = '  node{} [label="{}"]\n'.format(node._num + i, arg)
-            s = '  node{} -> node{}\n'.format(node._num, node._num + i)
+            ns = '  node{} [label="{}"]\n'.format(self.nums[node] + i, arg)
+            s = '  node{} -> node{}\n'.format(self.nums[node], self.nums[node] + i)
             self.dot_body.extend((s, ns))
 
         self.ncount += len(node.arguments)
 
         self.visit(node.body)
-        self.dot_body.append('  node{} -> node{}\n'.format(node._num, node.body._num))
+        self.dot_body.append('  node{} -> node{}\n'.format(self.nums[node], self.nums[node.body]))
 
     def visit_FunctionCall(self, node):
         args_values = [str(val.value) for val in node.args]
         s = '  node{} [label="{}({})"]\n'.format(self.ncount, node.function.value, ', '.join(args_values))
         self.dot_body.append(s)
-        node._num = self.ncount
+        self.nums[node] = self.ncount
         self.ncount += 1
 
 
@@ -198,54 +200,95 @@ class ASTVisualizer(NodeVisitor):
     def visit_While(self, node):
         s = '  node{} [label="While"]\n'.format(self.ncount)
         self.dot_body.append(s)
-        node._num = self.ncount
+        self.nums[node] = self.ncount
         self.ncount += 1
 
         self.visit(node.cond)
         self.visit(node.block)
-        self.dot_body.append('  node{} -> node{}\n'.format(node._num, node.cond._num))
-        self.dot_body.append('  node{} -> node{}\n'.format(node._num, node.block._num))
+        self.dot_body.append('  node{} -> node{}\n'.format(self.nums[node], self.nums[node.cond]))
+        self.dot_body.append('  node{} -> node{}\n'.format(self.nums[node], self.nums[node.block]))
 
     def visit_BinOp(self, node):
         s = '  node{} [label="{}"]\n'.format(self.ncount, node.op.value)
         self.dot_body.append(s)
-        node._num = self.ncount
+        self.nums[node] = self.ncount
         self.ncount += 1
 
         self.visit(node.left)
         self.visit(node.right)
 
         for child_node in (node.left, node.right):
-            s = '  node{} -> node{}\n'.format(node._num, child_node._num)
+            s = '  node{} -> node{}\n'.format(self.nums[node], self.nums[child_node])
             self.dot_body.append(s)
 
     def visit_UnaryOp(self, node):
         s = '  node{} [label="unary {}"]\n'.format(self.ncount, node.op.value)
         self.dot_body.append(s)
-        node._num = self.ncount
+        self.nums[node] = self.ncount
         self.ncount += 1
 
         self.visit(node.value)
-        s = '  node{} -> node{}\n'.format(node._num, node.value._num)
+        s = '  node{} -> node{}\n'.format(self.nums[node], self.nums[node.value])
         self.dot_body.append(s)
 
+    def visit_ArrayLiteral(self, node):
+        s = '  node{} [label="Array"]\n'.format(self.ncount)
+        self.dot_body.append(s)
+        self.nums[node] = self.ncount
+        self.ncount += 1
+
+        for element in node.elements:
+            self.visit(element)
+            s = '  node{} -> node{}\n'.format(self.nums[node], self.nums[element])
+            self.dot_body.append(s)
+
+    def visit_Index(self, node):
+        s = '  node{} [label="[]"]\n'.format(self.ncount)
+        self.dot_body.append(s)
+        self.nums[node] = self.ncount
+        self.ncount += 1
+
+        self.visit(node.value)
+        self.visit(node.index)
+
+        for child_node in (node.value, node.index):
+            s = '  node{} -> node{}\n'.format(self.nums[node], self.nums[child_node])
+            self.dot_body.append(s)
+
+    def visit_Slice(self, node):
+        s = '  node{} [label="[:]"]\n'.format(self.ncount)
+        self.dot_body.append(s)
+        self.nums[node] = self.ncount
+        self.ncount += 1
+
+        self.visit(node.value)
+        s = '  node{} -> node{}\n'.format(self.nums[node], self.nums[node.value])
+        self.dot_body.append(s)
+
+        # either bound may be left out, so their edges are labelled
+        for bound, child_node in (('start', node.start), ('end', node.end)):
+            if child_node is not None:
+                self.visit(child_node)
+                s = '  node{} -> node{} [label="{}"]\n'.format(self.nums[node], self.nums[child_node], bound)
+                self.dot_body.append(s)
+
     def visit_Assign(self, node):
         s = '  node{} [label="{}"]\n'.format(self.ncount, node.op.value)
         self.dot_body.append(s)
-        node._num = self.ncount
+        self.nums[node] = self.ncount
         self.ncount += 1
 
         self.visit(node.left)
         self.visit(node.right)
 
         for child_node in (node.left, node.right):
-            s = '  node{} -> node{}\n'.format(node._num, child_node._num)
+            s = '  node{} -> node{}\n'.format(self.nums[node], self.nums[child_node])
             self.dot_body.append(s)
 
     def visit_NoOp(self, node):
         s = '  node{} [label="NoOp"]\n'.format(self.ncount)
         self.dot_body.append(s)
-        node._num = self.ncount
+        self.nums[node] = self.ncount
         self.ncount += 1
 
     def gendot(self):
@@ -257,9 +300,7 @@ class ASTVisualizer(NodeVisitor):
 def main():
     filepath = input("Input code path:\n>")
     with open(filepath, 'r') as f:
-        text = ""
-        for line in f:
-            text += line.strip()
+        text = f.read()
         lexer = Lexer(text)
         parser = Parser(lexer)
         viz = ASTVisualizer(parser)
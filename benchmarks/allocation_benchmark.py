@@ -0,0 +1,87 @@
+"""
+Count memory blocks allocated while the tree and unboxed interpreters evaluate arithmetic
+in the style of tests/math_operators, with tracemalloc, and time both.
+
+Intermediate results are freed right after use, so tracemalloc would not see them in a
+snapshot; while counting, every VarSymbol made is kept alive and the blocks left allocated
+by the interpreter modules are counted.
+"""
+import argparse
+import contextlib
+import io
+import tracemalloc
+
+import common
+import audioscript.interpreter.Interpreter
+import audioscript.interpreter.unboxed
+from audioscript.interpreter.engines import make_interpreter
+from engines_benchmark import parse
+from interpreter.symbol_table import VarSymbol
+
+WORKLOAD = """var a, b, c, d, e, f, i;
+a = 22.222;
+b = 3;
+i = 0;
+while (i < {iterations}){{
+    c = a + b;
+    d = a - b;
+    e = a * b + c;
+    f = a / b - -d;
+    i = i + 1;
+}}
+"""
+INTERPRETER_MODULES = (audioscript.interpreter.Interpreter, audioscript.interpreter.unboxed)
+ENGINES = ('tree', 'unboxed')
+
+
+class KeptVarSymbol(VarSymbol):
+    """VarSymbol which is never freed, so that tracemalloc sees every one made."""
+    kept = []
+
+    def __init__(self, name, type, value):
+        super().__init__(name, type, value)
+        self.kept.append(self)
+
+
+def run(parsed, engine):
+    with contextlib.redirect_stdout(io.StringIO()):
+        make_interpreter(parsed, engine).interpret()
+
+
+def count_allocations(parsed, engine):
+    """
+    Return number of VarSymbols made, and number and size of blocks allocated by the interpreter
+    modules while running.
+    """
+    for module in INTERPRETER_MODULES:
+        module.VarSymbol = KeptVarSymbol
+    tracemalloc.start()
+    try:
+        run(parsed, engine)
+        snapshot = tracemalloc.take_snapshot()
+        symbols = len(KeptVarSymbol.kept)
+    finally:
+        tracemalloc.stop()
+        for module in INTERPRETER_MODULES:
+            module.VarSymbol = VarSymbol
+        del KeptVarSymbol.kept[:]
+    snapshot = snapshot.filter_traces([tracemalloc.Filter(True, module.__file__) for module in INTERPRETER_MODULES])
+    statistics = snapshot.statistics('filename')
+    return symbols, sum(stat.count for stat in statistics), sum(stat.size for stat in statistics)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--iterations', type=int, default=5000)
+    args = arg_parser.parse_args()
+
+    parsed = parse(WORKLOAD.format(iterations=args.iterations))
+    for engine in ENGINES:
+        symbols, blocks, size = count_allocations(parsed, engine)
+        elapsed = common.measure(lambda: run(parsed, engine))
+        print('{:>8}: {} VarSymbols, {} blocks, {:.0f} KiB allocated, {:.1f} blocks per iteration, {:.3f} s'.format(
+            engine, symbols, blocks, size / 1024, blocks / args.iterations, elapsed))
+
+
+if __name__ == '__main__':
+    main()
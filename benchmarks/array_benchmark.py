@@ -0,0 +1,72 @@
+"""
+Time every engine on mixing two signals of many samples, once with a loop over the samples and
+once with one arithmetic expression over arrays, which NumPy computes, and check that both give
+the same result.
+"""
+import argparse
+import contextlib
+import io
+import re
+
+import common
+from audioscript.interpreter.engines import ENGINES, make_interpreter
+from engines_benchmark import parse
+
+DECLARATIONS = """Declarations{{
+    Modules{{
+        numpy{{
+            array linspace(NUMBER, NUMBER, NUMBER);
+            VAR sum(array);
+        }}
+    }}
+}}
+array a, b, mixed;
+var i, s;
+a = linspace(0, 1, {samples});
+b = linspace(1, 0, {samples});
+s = 0;
+"""
+
+LOOP = DECLARATIONS + """i = 0;
+while (i < {samples}){{
+    s = s + a[i] * 0.75 + b[i] * 0.25;
+    i = i + 1;
+}}
+"""
+
+VECTORIZED = DECLARATIONS + """mixed = a * 0.75 + b * 0.25;
+s = sum(mixed);
+"""
+
+
+def run(parsed, engine):
+    """
+    Run the program and return the value of s it printed.
+    """
+    interpreter = make_interpreter(parsed, engine)
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        interpreter.interpret()
+    return float(re.search(r"name='s'.*= (\S+)", output.getvalue()).group(1))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--samples', type=int, default=20000)
+    args = arg_parser.parse_args()
+
+    loop = parse(LOOP.format(samples=args.samples))
+    vectorized = parse(VECTORIZED.format(samples=args.samples))
+    for engine in ENGINES:
+        looped_sum = run(loop, engine)
+        vectorized_sum = run(vectorized, engine)
+        if abs(looped_sum - vectorized_sum) > 1e-6 * abs(looped_sum):
+            raise AssertionError('{} engine: loop gives {} and arrays {}'.format(engine, looped_sum, vectorized_sum))
+        looped = common.measure(lambda: run(loop, engine), repeat=1)
+        arrays = common.measure(lambda: run(vectorized, engine))
+        print('{:>8} engine: {:.4f} s loop, {:.6f} s arrays, {:.0f}x faster'.format(
+            engine, looped, arrays, looped / arrays))
+
+
+if __name__ == '__main__':
+    main()
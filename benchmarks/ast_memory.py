@@ -0,0 +1,85 @@
+"""
+Compare memory used by AST nodes with __slots__ (current representation)
+with the same nodes as plain objects with a __dict__ (former representation).
+"""
+import argparse
+import tracemalloc
+
+import common
+from audioscript.lexer.Lexer import RegexLexer
+from audioscript.pars.Parser import AST, Parser
+
+
+def collect_nodes(tree):
+    """Return all nodes of the tree."""
+    nodes = []
+    pending = [tree]
+    while pending:
+        item = pending.pop()
+        if isinstance(item, list):
+            pending.extend(item)
+        elif isinstance(item, AST):
+            nodes.append(item)
+            pending.extend(value for _, value in common.node_fields(item))
+    return nodes
+
+
+DICT_CLASSES = {}
+
+
+def dict_class(cls):
+    """Return plain class with the same name as the node class."""
+    if cls not in DICT_CLASSES:
+        DICT_CLASSES[cls] = type(cls.__name__, (object,), {})
+    return DICT_CLASSES[cls]
+
+
+def copy_dict_nodes(nodes):
+    """Copy nodes as objects with __dict__; children and tokens are shared, not copied."""
+    copies = []
+    for node in nodes:
+        copy = dict_class(type(node))()
+        for name, value in common.node_fields(node):
+            setattr(copy, name, value)
+        copies.append(copy)
+    return copies
+
+
+def copy_slotted_nodes(nodes):
+    """Copy nodes as slotted objects; children and tokens are shared, not copied."""
+    copies = []
+    for node in nodes:
+        copy = object.__new__(type(node))
+        for name, value in common.node_fields(node):
+            setattr(copy, name, value)
+        copies.append(copy)
+    return copies
+
+
+def traced_size(build, nodes):
+    """Return memory held by the node copies made by build(nodes), without the list holding them."""
+    tracemalloc.start()
+    copies = build(nodes)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del copies
+    return size - len(nodes) * 8
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--blocks', type=int, default=2000)
+    args = arg_parser.parse_args()
+
+    tree = Parser(RegexLexer(common.generate_script(args.blocks))).parse()
+    nodes = collect_nodes(tree)
+    count = len(nodes)
+    print('{} nodes'.format(count))
+
+    for name, build in (('dict nodes', copy_dict_nodes), ('slotted nodes', copy_slotted_nodes)):
+        size = traced_size(build, nodes)
+        print('{:>14}: {:10.1f} kB, {:6.1f} bytes/node'.format(name, size / 1024, size / count))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""
+Compare parsing a synthetic script with loading its tree from the parse cache.
+"""
+import argparse
+import os
+import shutil
+import tempfile
+
+import common
+from audioscript.pars.cache import CachedParser
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--blocks', type=int, default=2000)
+    args = arg_parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'script.as')
+        with open(path, 'w') as f:
+            f.write(common.generate_script(args.blocks))
+        cache_dir = os.path.join(directory, 'cache')
+
+        def miss():
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            CachedParser(path, cache_dir=cache_dir).parse()
+
+        def hit():
+            parser = CachedParser(path, cache_dir=cache_dir)
+            parser.parse()
+            assert parser.hit
+
+        miss_time = common.measure(miss)
+        hit_time = common.measure(hit)
+        size = sum(os.path.getsize(os.path.join(cache_dir, name)) for name in os.listdir(cache_dir))
+        print('parse and store: {:.3f} s'.format(miss_time))
+        print('load from cache: {:.3f} s, {:.1f} kB on disk'.format(hit_time, size / 1024))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Benchmarks are run directly, e.g. `python benchmarks/lexer_benchmark.py`.
+"""
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# modules inside the package import each other both as 'audioscript.x' and 'x'
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'audioscript')]
+
+HEADER = """Declarations{
+    Modules{
+        math{
+            VAR exp(VAR);
+            VAR sqrt(VAR);
+        }
+    }
+}
+"""
+
+BLOCK = """# generated block {i}
+var a{i}, b{i}, s{i};
+a{i} = {i} * 2 + (3 - 1) / 4.5;
+b{i} = -a{i} + sqrt(16) * (a{i} - 1);
+def f{i}(x, y){{
+    return x * y + {i};
+}}
+if (a{i} >= 0 and b{i} != 1.5)
+    s{i} = f{i}(a{i}, 2);
+while (a{i} < {i} + 3){{
+    a{i} = a{i} + 1;
+}}
+"""
+
+
+def generate_script(blocks):
+    """
+    Generate synthetic AudioScript program.
+    :param blocks: number of repeated statement blocks (each is 12 lines long).
+    """
+    return HEADER + ''.join(BLOCK.format(i=i) for i in range(blocks))
+
+
+def generate_nested_expression(depth):
+    """
+    Generate statement whose expression nests `depth` parentheses and unary minuses,
+    followed by a chain of `depth` additions.
+    """
+    return 'x = {}1{} + {};'.format('-(' * depth, ')' * depth, ' + '.join(['x'] * depth))
+
+
+def measure(function, repeat=3):
+    """Return the best wall time of calling function `repeat` times."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def node_fields(node):
+    """Return (name, value) pairs of node attributes, for nodes with __dict__ or __slots__."""
+    if hasattr(node, '__dict__'):
+        return sorted(vars(node).items())
+    names = []
+    for cls in type(node).__mro__:
+        names.extend(getattr(cls, '__slots__', ()))
+    return sorted((name, getattr(node, name)) for name in set(names) if hasattr(node, name))
+
+
+def dump_ast(node):
+    """Return nested tuples describing the tree, used to check that two trees are identical."""
+    if isinstance(node, (list, tuple)):
+        return [dump_ast(item) for item in node]
+    if hasattr(node, 'type') and hasattr(node, 'value') and type(node).__name__ == 'Token':
+        return ('Token', node.type, node.value)
+    if node is None or isinstance(node, (int, float, str)):
+        return node
+    return (type(node).__name__,) + tuple(
+        (name, dump_ast(value)) for name, value in node_fields(node) if not name.startswith('_')
+    )
@@ -0,0 +1,76 @@
+"""
+Run the example scripts from tests/ on every execution engine and check that
+they print the same, then time the engines on a loop-heavy synthetic script.
+"""
+import argparse
+import contextlib
+import io
+import os
+
+import common
+from audioscript.interpreter.engines import ENGINES, make_interpreter
+from audioscript.lexer.Lexer import make_lexer
+from audioscript.pars.Parser import ParsedTree, Parser
+
+LOOP = """var i, s;
+i = 0;
+s = 0;
+def step(x){{
+    return x * 2 + 1;
+}}
+while (i < {iterations}){{
+    s = s + step(i) - i / 4;
+    if (s > 1000000) {{
+        s = s - 1000000;
+    }}
+    i = i + 1;
+}}
+"""
+
+
+def parse(text):
+    """Parse program in advance, so that timings do not include parsing."""
+    parser = Parser(make_lexer(text))
+    return ParsedTree(parser.parse(), parser)
+
+
+def run(parsed, engine):
+    """Run program on the engine and return what it printed, including the error it stopped with."""
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        try:
+            make_interpreter(parsed, engine).interpret()
+        except Exception as e:
+            print('{}: {}'.format(type(e).__name__, e))
+    return output.getvalue()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--iterations', type=int, default=20000)
+    args = arg_parser.parse_args()
+
+    engines = sorted(ENGINES)
+    tests = os.path.join(common.ROOT, 'tests')
+    different = 0
+    for name in sorted(os.listdir(tests)):
+        if not os.path.isfile(os.path.join(tests, name)):
+            continue
+        with open(os.path.join(tests, name)) as f:
+            parsed = parse(f.read())
+        outputs = [run(parsed, engine) for engine in engines]
+        same = all(output == outputs[0] for output in outputs)
+        different += not same
+        print('{:>24}: {}'.format(name, 'same' if same else 'DIFFERENT'))
+
+    parsed = parse(LOOP.format(iterations=args.iterations))
+    for engine in engines:
+        elapsed = common.measure(lambda: run(parsed, engine))
+        print('{:>8} engine: {:.3f} s, {:.0f} iterations/s'.format(engine, elapsed, args.iterations / elapsed))
+
+    if different:
+        raise SystemExit('{} scripts printed differently'.format(different))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+Time every engine on a loop calling external functions of one and two arguments, given as
+variables and as expressions.
+"""
+import argparse
+import contextlib
+import io
+
+import common
+from audioscript.interpreter.engines import ENGINES, make_interpreter
+from engines_benchmark import parse
+
+LOOP = """Declarations{{
+    Modules{{
+        math{{
+            VAR sqrt(VAR);
+            NUMBER pow(NUMBER, NUMBER);
+            VAR fabs(NUMBER);
+        }}
+    }}
+}}
+var i, s;
+i = 0;
+s = 0;
+while (i < {iterations}){{
+    s = s + sqrt(i) + pow(i, 0.5) + fabs(i - 10);
+    i = i + 1;
+}}
+"""
+
+
+def run(parsed, engine):
+    with contextlib.redirect_stdout(io.StringIO()):
+        make_interpreter(parsed, engine).interpret()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--iterations', type=int, default=20000)
+    args = arg_parser.parse_args()
+
+    parsed = parse(LOOP.format(iterations=args.iterations))
+    for engine in ENGINES:
+        elapsed = common.measure(lambda: run(parsed, engine), repeat=5)
+        print('{:>8} engine: {:.3f} s'.format(engine, elapsed))
+
+
+if __name__ == '__main__':
+    main()
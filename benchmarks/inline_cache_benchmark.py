@@ -0,0 +1,53 @@
+"""
+Time the tree and unboxed interpreters on a loop calling user and external functions from a
+function called in turn, and print hits and misses of the inline caches of the calls.
+"""
+import argparse
+import contextlib
+import io
+
+import common
+from audioscript.interpreter.engines import make_interpreter
+from engines_benchmark import parse
+
+LOOP = """var i, s;
+i = 0;
+s = 0;
+def step(x){{
+    return x * 2 + 1;
+}}
+def gain(x){{
+    return x + sqrt(x) + step(x);
+}}
+while (i < {iterations}){{
+    {{
+        s = s + gain(i) - step(i) / 4;
+    }}
+    i = i + 1;
+}}
+"""
+ENGINES = ('tree', 'unboxed')
+
+
+def run(parsed, engine):
+    interpreter = make_interpreter(parsed, engine)
+    with contextlib.redirect_stdout(io.StringIO()):
+        interpreter.interpret()
+    return interpreter
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--iterations', type=int, default=20000)
+    args = arg_parser.parse_args()
+
+    parsed = parse(common.HEADER + LOOP.format(iterations=args.iterations))
+    for engine in ENGINES:
+        elapsed = common.measure(lambda: run(parsed, engine))
+        print('{:>8} engine: {:.3f} s'.format(engine, elapsed))
+    for line in run(parsed, 'tree').inline_cache_report():
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+"""
+Compare lexing engines on a large synthetic script.
+"""
+import argparse
+
+import common
+from audioscript.lexer.Lexer import LEXER_ENGINES
+
+
+def token_list(engine, text):
+    return [(token.type, token.value) for token in LEXER_ENGINES[engine](text).tokenize()]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--blocks', type=int, default=2000)
+    args = arg_parser.parse_args()
+
+    text = common.generate_script(args.blocks)
+    reference = token_list('char', text)
+    print('{} lines, {} tokens'.format(text.count('\n'), len(reference)))
+
+    for engine in sorted(LEXER_ENGINES):
+        assert token_list(engine, text) == reference, 'engine "{}" differs'.format(engine)
+        elapsed = common.measure(lambda: token_list(engine, text))
+        print('{:>8}: {:8.3f} s {:12.0f} tokens/s'.format(engine, elapsed, len(reference) / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Time every engine on a loop calling a pure user function and a pure external function with few
+distinct arguments, with memoization on and off, and print hits and misses of the memos.
+"""
+import argparse
+import contextlib
+import io
+
+import common
+from audioscript.interpreter.engines import ENGINES, make_interpreter
+from engines_benchmark import parse
+
+LOOP = """Declarations{{
+    Modules{{
+        math{{
+            pure VAR exp(VAR);
+        }}
+    }}
+}}
+var i, k, s;
+i = 0;
+k = 0;
+s = 0;
+pure def fib(n){{
+    var a;
+    if (n < 2)
+        return n;
+    a = fib(n - 1);
+    return a + fib(n - 2);
+}}
+while (i < {iterations}){{
+    s = s + fib(k) + exp(k / 10);
+    k = k + 1;
+    if (k == {distinct})
+        k = 0;
+    i = i + 1;
+}}
+"""
+
+
+def run(parsed, engine, memo_size):
+    interpreter = make_interpreter(parsed, engine, memo_size)
+    report = io.StringIO()
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(report):
+        interpreter.interpret()
+    return report.getvalue()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--iterations', type=int, default=2000)
+    arg_parser.add_argument('--distinct', type=int, default=12,
+                            help='number of distinct arguments the loop calls the functions with')
+    args = arg_parser.parse_args()
+
+    parsed = parse(LOOP.format(iterations=args.iterations, distinct=args.distinct))
+    for engine in ENGINES:
+        plain = common.measure(lambda: run(parsed, engine, 0), repeat=1)
+        memoized = common.measure(lambda: run(parsed, engine, 256))
+        print('{:>8} engine: {:.3f} s without memo, {:.3f} s with memo'.format(engine, plain, memoized))
+    print(run(parsed, 'tree', 256), end='')
+
+
+if __name__ == '__main__':
+    main()
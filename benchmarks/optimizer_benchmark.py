@@ -0,0 +1,65 @@
+"""
+Time every execution engine on a loop of literal expressions, constant conditions and unused
+functions, as generated scripts contain, with the program tree optimized at each level.
+"""
+import argparse
+import sys
+
+import common
+from audioscript.interpreter.engines import ENGINES
+from audioscript.interpreter.optimizer import LEVELS, Optimizer
+from audioscript.pars.Parser import ParsedTree
+from engines_benchmark import parse, run
+
+LOOP = """var i, s, t, debug;
+debug = 0;
+i = 0;
+s = 0;
+def trace(x){{
+    return x * 1;
+}}
+def scale(x){{
+    return x * (60 / 2) - 0;
+}}
+while (i < {iterations}){{
+    s = s + (2 * 3) * 1 - (10 / 4) + -(-i);
+    t = scale(i * 1) + 1 * (2 - 2 * 0.5);
+    if (1 > 2 or 3 < 2) {{
+        s = s - trace(t);
+    }}
+    if (2 * 2 == 4 and i >= 0)
+        s = s + 0.5;
+    i = i + 1 * 1;
+}}
+"""
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--iterations', type=int, default=20000)
+    args = arg_parser.parse_args()
+
+    parsed = parse(LOOP.format(iterations=args.iterations))
+    trees = {}
+    for level in LEVELS:
+        optimization = Optimizer(parsed.parser, level).optimize(parsed.parse())
+        trees[level] = ParsedTree(optimization.tree, parsed.parser)
+        print('-O{}: {}'.format(level, optimization.report()[-1]))
+
+    different = 0
+    for engine in sorted(ENGINES):
+        outputs = [run(trees[level], engine) for level in LEVELS[:2]]
+        # -O2 drops the unused function trace from the printed global scope
+        same = outputs[1] == outputs[0]
+        different += not same
+        times = [common.measure(lambda: run(trees[level], engine)) for level in LEVELS]
+        print('{:>8} engine: {}, {}'.format(engine, ', '.join(
+            '-O{} {:.3f} s'.format(level, elapsed) for level, elapsed in zip(LEVELS, times)),
+            'same output' if same else 'DIFFERENT output at -O1'))
+
+    if different:
+        sys.exit('{} engines printed differently at -O1'.format(different))
+
+
+if __name__ == '__main__':
+    main()
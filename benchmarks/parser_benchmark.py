@@ -0,0 +1,40 @@
+"""
+Measure parse time of a large synthetic script.
+"""
+import argparse
+
+import common
+from audioscript.lexer.Lexer import Lexer, RegexLexer
+from audioscript.pars.Parser import Parser
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--blocks', type=int, default=2000)
+    arg_parser.add_argument('--depths', type=int, nargs='*', default=[1000, 10000, 100000],
+                            help='nesting depths of the pathological expressions')
+    args = arg_parser.parse_args()
+
+    text = common.generate_script(args.blocks)
+    stream = RegexLexer(text).tokenize_arrays()
+    count = len(stream)
+
+    def parse():
+        return Parser(stream).parse()
+
+    reference = common.dump_ast(Parser(Lexer(text)).parse())
+    assert common.dump_ast(parse()) == reference, 'trees parsed with different lexers differ'
+
+    lex_and_parse = common.measure(lambda: Parser(RegexLexer(text)).parse())
+    parse_only = common.measure(parse)
+    print('{} tokens'.format(count))
+    print('lex + parse: {:.3f} s'.format(lex_and_parse))
+    print('parse only:  {:.3f} s, {:.0f} tokens/s'.format(parse_only, count / parse_only))
+
+    for depth in args.depths:
+        stream = RegexLexer(common.generate_nested_expression(depth)).tokenize_arrays()
+        print('nesting depth {:>6}: {:.3f} s'.format(depth, common.measure(parse)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Stream a generated signal through process(block) of a script with every engine and block size,
+printing latency of the calls and throughput, to choose the block size: every call costs the
+same few statements, so larger blocks process more samples per second and smaller ones return
+sooner. The script keeps its gain in a global variable, which the calls change, and the result
+is checked against the same computation in NumPy.
+"""
+import argparse
+import contextlib
+import io
+
+import common
+import numpy
+from audioscript.interpreter.engines import ENGINES
+from audioscript.interpreter.pipeline import Pipeline
+from engines_benchmark import parse
+
+SCRIPT = """var gain, count;
+gain = 1;
+count = 0;
+def process(block){
+    count = count + 1;
+    gain = gain * 0.999;
+    return block * gain;
+}
+"""
+RATE = 48000
+
+
+def expected(signal, block_size):
+    gains = 0.999 ** numpy.arange(1, -(-len(signal) // block_size) + 1)
+    return signal * numpy.repeat(gains, block_size)[:len(signal)]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--seconds', type=float, default=2, help='length of the signal')
+    arg_parser.add_argument('--block-sizes', type=int, nargs='+', default=[64, 256, 1024, 4096])
+    args = arg_parser.parse_args()
+
+    signal = numpy.random.default_rng(0).uniform(-1, 1, int(args.seconds * RATE))
+    parsed = parse(SCRIPT)
+    for engine in ENGINES:
+        for block_size in args.block_sizes:
+            blocks = [signal[start:start + block_size] for start in range(0, len(signal), block_size)]
+            results = []
+            with contextlib.redirect_stdout(io.StringIO()):
+                statistics = Pipeline(parsed, engine).run(blocks, results.append)
+            if not numpy.allclose(numpy.concatenate(results), expected(signal, block_size)):
+                raise AssertionError('{} engine: blocks of {} processed wrong'.format(engine, block_size))
+            print('{:>8} engine, blocks of {:>5}: p50 {:7.1f} us, p99 {:7.1f} us, {:6.0f}x real time'.format(
+                engine, block_size, statistics.percentile(0.5) * 1e6, statistics.percentile(0.99) * 1e6,
+                statistics.samples / statistics.total / RATE))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Run recursive functions on the vm engine to growing depths, one returning 1 + f(n - 1) and
+one tail recursive, and print time and memory they take; the tree engine is run for comparison
+until the Python stack overflows.
+"""
+import argparse
+import contextlib
+import io
+import tracemalloc
+
+import common
+from audioscript.interpreter.engines import make_interpreter
+from engines_benchmark import parse
+
+RECURSIVE = """var r;
+def count(n){{
+    if (n == 0)
+        return 0;
+    return 1 + count(n - 1);
+}}
+r = count({depth});
+"""
+TAIL_RECURSIVE = """var r;
+def loop(n, acc){{
+    if (n == 0)
+        return acc;
+    return loop(n - 1, acc + 1);
+}}
+r = loop({depth}, 0);
+"""
+SCRIPTS = (('1 + f(n - 1)', RECURSIVE), ('return f(n - 1)', TAIL_RECURSIVE))
+
+
+def run(parsed, engine):
+    """Run program and return value printed for r, or the error the program stopped with."""
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        try:
+            make_interpreter(parsed, engine).interpret()
+        except RecursionError:
+            return 'RecursionError'
+    for line in output.getvalue().splitlines():
+        if line.strip().startswith('r:'):
+            return line.rsplit('=', 1)[1].strip()
+
+
+def peak_memory(parsed, engine):
+    """Return peak size of memory allocated while running the program, in KiB."""
+    tracemalloc.start()
+    try:
+        run(parsed, engine)
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--depths', type=int, nargs='+', default=[1000, 10000, 100000])
+    args = arg_parser.parse_args()
+
+    for title, script in SCRIPTS:
+        print(title)
+        for depth in args.depths:
+            parsed = parse(script.format(depth=depth))
+            result = run(parsed, 'vm')
+            elapsed = common.measure(lambda: run(parsed, 'vm'), repeat=1)
+            print('{:>10} deep: vm {:.3f} s, {:.0f} KiB, r = {}; tree: {}'.format(
+                depth, elapsed, peak_memory(parsed, 'vm'), result, run(parsed, 'tree')))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Time the closure engine with references resolved to frame slots and with name lookups, on a
+loop inside a function which runs in blocks nested to various depths.
+"""
+import argparse
+import contextlib
+import io
+
+import common
+from audioscript.interpreter.closure_compiler import ClosureInterpreter
+from audioscript.interpreter.resolver import Resolver
+from engines_benchmark import parse
+
+NESTED = """def work(n, k){{
+    var i, s;
+    i = 0;
+    s = 0;
+    def step(x){{
+        return x * 2 + 1;
+    }}
+    {opening}
+    while (i < n){{
+        s = s + step(i) - i / 4;
+        i = i + 1;
+    }}
+    {closing}
+    return s;
+}}
+var result;
+result = work({iterations}, 3);
+"""
+
+
+def generate(depth, iterations):
+    return NESTED.format(opening='{' * depth, closing='}' * depth, iterations=iterations)
+
+
+def run(parsed, resolve):
+    with contextlib.redirect_stdout(io.StringIO()):
+        ClosureInterpreter(parsed, resolve).interpret()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--iterations', type=int, default=20000)
+    arg_parser.add_argument('--depths', type=int, nargs='+', default=[0, 4, 16, 64])
+    args = arg_parser.parse_args()
+
+    for depth in args.depths:
+        parsed = parse(generate(depth, args.iterations))
+        resolution = Resolver().resolve(parsed.parse())
+        lookup = common.measure(lambda: run(parsed, False))
+        slots = common.measure(lambda: run(parsed, True))
+        print('depth {:>3}: {} references resolved, name lookup {:.3f} s, slots {:.3f} s, {:.2f}x'.format(
+            depth, len(resolution.references), lookup, slots, lookup / slots))
+
+
+if __name__ == '__main__':
+    main()
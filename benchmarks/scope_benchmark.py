@@ -0,0 +1,75 @@
+"""
+Count the scopes every execution engine creates on a loop whose body has nested blocks without
+declarations, a block declaring a variable and a function call, and time the engines.
+"""
+import argparse
+import contextlib
+import io
+
+import common
+from audioscript.interpreter.engines import ENGINES, make_interpreter
+from engines_benchmark import parse
+from interpreter.symbol_table import ScopedSymbolTable
+
+LOOP = """var i, s;
+i = 0;
+s = 0;
+def step(x){{
+    if (x > 2) {{
+        s = s + 1;
+    }}
+    return x * 2 + 1;
+}}
+while (i < {iterations}){{
+    {{
+        s = s + step(i) - i / 4;
+    }}
+    if (s > 1000000) {{
+        s = s - 1000000;
+    }}
+    if (i > 10) {{
+        var t;
+        t = i;
+    }}
+    i = i + 1;
+}}
+"""
+
+
+def count_scopes(parsed, engine):
+    """
+    Return number of ScopedSymbolTables created while running the program.
+    """
+    created = [0]
+    init = ScopedSymbolTable.__init__
+
+    def counting_init(self, *args, **kwargs):
+        created[0] += 1
+        init(self, *args, **kwargs)
+    ScopedSymbolTable.__init__ = counting_init
+    try:
+        run(parsed, engine)
+    finally:
+        ScopedSymbolTable.__init__ = init
+    return created[0]
+
+
+def run(parsed, engine):
+    with contextlib.redirect_stdout(io.StringIO()):
+        make_interpreter(parsed, engine).interpret()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--iterations', type=int, default=20000)
+    args = arg_parser.parse_args()
+
+    parsed = parse(LOOP.format(iterations=args.iterations))
+    for engine in sorted(ENGINES):
+        scopes = count_scopes(parsed, engine)
+        elapsed = common.measure(lambda: run(parsed, engine))
+        print('{:>8} engine: {} scopes created, {:.3f} s'.format(engine, scopes, elapsed))
+
+
+if __name__ == '__main__':
+    main()
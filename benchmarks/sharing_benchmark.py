@@ -0,0 +1,61 @@
+"""
+Time every execution engine on a loop calling pure external functions with arguments which do
+not change in the loop, with the tree optimized at -O2 and with shared expressions at -O3.
+"""
+import argparse
+import sys
+
+import common
+from audioscript.interpreter.engines import ENGINES
+from audioscript.interpreter.optimizer import Optimizer
+from audioscript.pars.Parser import ParsedTree
+from engines_benchmark import parse, run
+
+LOOP = """Declarations{{
+    Modules{{
+        math{{
+            pure VAR exp(VAR);
+            pure VAR sqrt(VAR);
+            pure VAR log(VAR);
+        }}
+    }}
+}}
+var i, s, gain, rate;
+gain = 3;
+rate = 44100;
+i = 0;
+s = 0;
+while (i < {iterations}){{
+    s = s + i * exp(gain / 20) / sqrt(rate * 2) + log(rate) * exp(gain / 20);
+    i = i + 1;
+}}
+"""
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--iterations', type=int, default=20000)
+    args = arg_parser.parse_args()
+
+    parsed = parse(LOOP.format(iterations=args.iterations))
+    trees = []
+    for level in (2, 3):
+        optimization = Optimizer(parsed.parser, level).optimize(parsed.parse())
+        trees.append(ParsedTree(optimization.tree, parsed.parser))
+    print(optimization.report()[-1])
+
+    different = 0
+    for engine in sorted(ENGINES):
+        outputs = [run(tree, engine) for tree in trees]
+        same = outputs[1] == outputs[0]
+        different += not same
+        times = [common.measure(lambda: run(tree, engine)) for tree in trees]
+        print('{:>8} engine: -O2 {:.3f} s, -O3 {:.3f} s, {:.2f}x, {}'.format(
+            engine, times[0], times[1], times[0] / times[1], 'same output' if same else 'DIFFERENT output'))
+
+    if different:
+        sys.exit('{} engines printed differently'.format(different))
+
+
+if __name__ == '__main__':
+    main()
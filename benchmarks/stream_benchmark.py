@@ -0,0 +1,87 @@
+"""
+Measure time to the first token and peak memory of lexing a large script
+read as a whole string, from a file object and from mmap.
+"""
+import argparse
+import mmap
+import os
+import tempfile
+import time
+import tracemalloc
+
+import common
+from audioscript.lexer.Lexer import LEXER_ENGINES
+
+
+def read_text(path):
+    with open(path, 'r') as f:
+        return f.read()
+
+
+def run(engine, open_source, path):
+    """Return time to the first token, number of tokens and peak traced memory."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    with open_source(path) as source:
+        tokens = LEXER_ENGINES[engine](source).tokenize()
+        next(tokens)
+        first = time.perf_counter() - start
+        count = 1 + sum(1 for _ in tokens)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return first, count, peak
+
+
+class WholeText(object):
+    """Context manager giving the whole file content as one string."""
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        return read_text(self.path)
+
+    def __exit__(self, *args):
+        pass
+
+
+class MappedFile(object):
+    """Context manager giving read only mmap of the file."""
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __enter__(self):
+        return self.map
+
+    def __exit__(self, *args):
+        self.map.close()
+        self.file.close()
+
+
+SOURCES = {
+    'text': WholeText,
+    'file': lambda path: open(path, 'r'),
+    'mmap': MappedFile,
+}
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--blocks', type=int, default=2000)
+    args = arg_parser.parse_args()
+
+    with tempfile.NamedTemporaryFile('w', suffix='.as', delete=False) as f:
+        f.write(common.generate_script(args.blocks))
+    try:
+        print('script size: {} kB'.format(os.path.getsize(f.name) // 1024))
+        for engine in sorted(LEXER_ENGINES):
+            for name in ('text', 'file', 'mmap'):
+                first, count, peak = run(engine, SOURCES[name], f.name)
+                print('{:>6} {:>5}: first token after {:8.5f} s, {} tokens, peak memory {:8.1f} kB'.format(
+                    engine, name, first, count, peak / 1024))
+    finally:
+        os.remove(f.name)
+
+
+if __name__ == '__main__':
+    main()
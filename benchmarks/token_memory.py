@@ -0,0 +1,65 @@
+"""
+Compare memory used by a tokenized script kept as Token objects with a
+__dict__ (former representation), as slotted Token objects with shared
+singletons and as TokenStream arrays. Also times parsing from a lexer and
+from a TokenStream.
+"""
+import argparse
+import tracemalloc
+
+import common
+from audioscript.lexer.Lexer import RegexLexer
+from audioscript.pars.Parser import Parser
+
+
+class DictToken(object):
+    """Token as it was before: plain object with __dict__, allocated for every token."""
+    def __init__(self, type, value):
+        self.type = type
+        self.value = value
+
+
+def dict_tokens(text):
+    return [DictToken(token.type, token.value) for token in RegexLexer(text).tokenize()]
+
+
+def slotted_tokens(text):
+    return list(RegexLexer(text).tokenize())
+
+
+def token_stream(text):
+    return RegexLexer(text).tokenize_arrays()
+
+
+def traced_size(build, text):
+    """Return memory held by the result of build(text) and number of its live blocks."""
+    tracemalloc.start()
+    result = build(text)
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = snapshot.statistics('filename')
+    del result
+    return sum(stat.size for stat in stats), sum(stat.count for stat in stats)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--blocks', type=int, default=2000)
+    args = arg_parser.parse_args()
+
+    text = common.generate_script(args.blocks)
+    count = len(token_stream(text))
+    print('{} tokens'.format(count))
+
+    for name, build in (('dict Token', dict_tokens), ('slotted Token', slotted_tokens), ('TokenStream', token_stream)):
+        size, blocks = traced_size(build, text)
+        print('{:>14}: {:10.1f} kB, {:6.1f} bytes/token, {:8} allocated blocks'.format(
+            name, size / 1024, size / count, blocks))
+
+    from_lexer = common.measure(lambda: Parser(RegexLexer(text)).parse())
+    from_stream = common.measure(lambda: Parser(RegexLexer(text).tokenize_arrays()).parse())
+    print('parse from lexer: {:.3f} s, from TokenStream: {:.3f} s'.format(from_lexer, from_stream))
+
+
+if __name__ == '__main__':
+    main()
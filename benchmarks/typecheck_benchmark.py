@@ -0,0 +1,57 @@
+"""
+Time the closure engine on a loop of assignments and external function calls, with the
+checks the TypeChecker proved to pass dropped and with all checks made at run time.
+"""
+import argparse
+import contextlib
+import io
+
+import common
+from audioscript.interpreter.closure_compiler import ClosureInterpreter
+from audioscript.interpreter.type_checker import TypeChecker
+from engines_benchmark import parse
+
+LOOP = """Declarations{{
+    Types: A;
+    Modules{{
+        math{{
+            VAR fabs(VAR);
+            A floor(VAR);
+            VAR ceil(A);
+        }}
+    }}
+}}
+var i, s;
+A a;
+i = 0;
+s = 0;
+while (i < {iterations}){{
+    a = floor(i / 2);
+    s = s + ceil(a) - fabs(i - 5);
+    i = i + 1;
+}}
+"""
+
+
+def run(parsed, check_types):
+    with contextlib.redirect_stdout(io.StringIO()):
+        ClosureInterpreter(parsed, check_types=check_types).interpret()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--iterations', type=int, default=20000)
+    args = arg_parser.parse_args()
+
+    parsed = parse(LOOP.format(iterations=args.iterations))
+    checks = TypeChecker(parsed).check(parsed.parse())
+    print('{} assignments and {} calls proven type-safe, {} errors'.format(
+        len(checks.assignments), len(checks.calls), len(checks.errors)))
+    checked = common.measure(lambda: run(parsed, False))
+    proven = common.measure(lambda: run(parsed, True))
+    print('run time checks: {:.3f} s, proven checks dropped: {:.3f} s, {:.2f}x'.format(
+        checked, proven, checked / proven))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Measure node visits per second of the interpreter running a tight while loop,
+with the dispatch table and with the former per-visit method lookup.
+"""
+import argparse
+import contextlib
+import io
+
+import common
+from audioscript.interpreter.Interpreter import Interpreter
+from audioscript.lexer.Lexer import make_lexer
+from audioscript.pars.Parser import Parser
+
+LOOP = """var i, s;
+i = 0;
+s = 0;
+while (i < {iterations}){{
+    s = s + i * 2;
+    i = i + 1;
+}}
+"""
+
+
+class LookupInterpreter(Interpreter):
+    """Interpreter dispatching as before: method name built and looked up on every visit."""
+    def visit(self, node):
+        method_name = 'visit_' + type(node).__name__
+        visitor = getattr(self, method_name, self.default_visit)
+        if not self.FUNCTION_CALL_RETURN_FLAG:
+            return visitor(node)
+
+
+class CountingInterpreter(Interpreter):
+    visits = 0
+
+    def visit(self, node):
+        self.visits += 1
+        return super().visit(node)
+
+
+def run(interpreter_class, tree):
+    interpreter = interpreter_class(None)
+    with contextlib.redirect_stdout(io.StringIO()):
+        interpreter.visit(tree)
+    return interpreter
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--iterations', type=int, default=20000)
+    args = arg_parser.parse_args()
+
+    tree = Parser(make_lexer(LOOP.format(iterations=args.iterations))).parse()
+    visits = run(CountingInterpreter, tree).visits
+    print('{} visits'.format(visits))
+
+    for name, interpreter_class in (('method lookup', LookupInterpreter), ('dispatch table', Interpreter)):
+        elapsed = common.measure(lambda: run(interpreter_class, tree), repeat=7)
+        print('{:>14}: {:.3f} s, {:.0f} visits/s'.format(name, elapsed, visits / elapsed))
+
+
+if __name__ == '__main__':
+    main()
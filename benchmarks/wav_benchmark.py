@@ -0,0 +1,139 @@
+"""
+Halve the volume of a generated stereo WAV file with a script reading and writing it by blocks
+through the wav module, and with the whole file loaded into memory, as scripts did through
+helpers of their own. Each runs in a process of its own, whose peak resident memory is printed
+with the time.
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+
+import common
+import numpy
+from audioscript.interpreter.engines import ENGINES, make_interpreter
+from engines_benchmark import parse
+
+SCRIPT = """Declarations{{
+    Types: wavreader, wavwriter;
+    Modules{{
+        wav{{
+            wavreader reader(STRING, NUMBER);
+            wavwriter writer(STRING, NUMBER, NUMBER, NUMBER);
+            VAR blocks(wavreader);
+            VAR channels(wavreader);
+            VAR rate(wavreader);
+            array read(wavreader, NUMBER, NUMBER);
+            write(wavwriter, array, NUMBER);
+            close(wavwriter);
+        }}
+    }}
+}}
+wavreader input;
+wavwriter output;
+array left, right;
+var i, n, hz, count;
+input = reader("{input}", {block});
+hz = rate(input);
+count = channels(input);
+output = writer("{output}", hz, count, 16);
+n = blocks(input);
+i = 0;
+while (i < n){{
+    left = read(input, i, 0) * 0.5;
+    right = read(input, i, 1) * 0.5;
+    write(output, left, 0);
+    write(output, right, 1);
+    i = i + 1;
+}}
+close(output);
+"""
+RATE = 48000
+
+
+def generate(path, seconds):
+    """
+    Write stereo 16-bit file of noise, a second at a time.
+    """
+    random = numpy.random.default_rng(0)
+    with wave.open(path, 'wb') as file:
+        file.setnchannels(2)
+        file.setsampwidth(2)
+        file.setframerate(RATE)
+        for _ in range(seconds):
+            file.writeframes(random.integers(-32768, 32767, (RATE, 2), dtype='<i2'))
+
+
+def by_blocks(input, output, block, engine):
+    parsed = parse(SCRIPT.format(input=input, output=output, block=block))
+    with open(os.devnull, 'w') as devnull:
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            make_interpreter(parsed, engine).interpret()
+        finally:
+            sys.stdout = stdout
+
+
+def whole(input, output):
+    with wave.open(input, 'rb') as file:
+        params = file.getparams()
+        samples = numpy.frombuffer(file.readframes(file.getnframes()), '<i2')
+    halved = numpy.clip(numpy.rint(samples * 0.5), -32768, 32767).astype('<i2')
+    with wave.open(output, 'wb') as file:
+        file.setparams(params)
+        file.writeframes(halved)
+
+
+def child(args):
+    start = time.perf_counter()
+    if args.child == 'blocks':
+        by_blocks(args.input, args.output, args.block, args.engine)
+    else:
+        whole(args.input, args.output)
+    elapsed = time.perf_counter() - start
+    print(elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+def measure(mode, input, output, args):
+    result = subprocess.run([sys.executable, __file__, '--child', mode, '--input', input, '--output', output,
+                             '--block', str(args.block), '--engine', args.engine],
+                            check=True, stdout=subprocess.PIPE, universal_newlines=True)
+    elapsed, peak = result.stdout.split()
+    return float(elapsed), int(peak) / 1024
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--seconds', type=int, default=300, help='length of the generated file')
+    arg_parser.add_argument('--block', type=int, default=8192, help='frames of every block')
+    arg_parser.add_argument('--engine', choices=ENGINES, default='closure')
+    arg_parser.add_argument('--child', choices=('blocks', 'whole'), help=argparse.SUPPRESS)
+    arg_parser.add_argument('--input', help=argparse.SUPPRESS)
+    arg_parser.add_argument('--output', help=argparse.SUPPRESS)
+    args = arg_parser.parse_args()
+    if args.child:
+        child(args)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        input = os.path.join(directory, 'input.wav')
+        generate(input, args.seconds)
+        size = os.path.getsize(input) / 2 ** 20
+        outputs = {}
+        for mode in ('whole', 'blocks'):
+            outputs[mode] = os.path.join(directory, mode + '.wav')
+            elapsed, peak = measure(mode, input, outputs[mode], args)
+            print('{:>6}: {:.3f} s, {:.0f} MB/s, peak resident memory {:.0f} MB'.format(
+                mode, elapsed, size / elapsed, peak))
+        with open(outputs['whole'], 'rb') as whole_file, open(outputs['blocks'], 'rb') as blocks_file:
+            if whole_file.read() != blocks_file.read():
+                raise AssertionError('Files written by blocks and as a whole differ')
+        print('{:.0f} MB file, both ways wrote the same'.format(size))
+
+
+if __name__ == '__main__':
+    main()
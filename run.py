@@ -1,14 +1,96 @@
-import audioscript.interpreter.Interpreter
+import argparse
+import pathlib
+import sys
+
+import audioscript.interpreter.bytecode
+import audioscript.interpreter.engines
+import audioscript.interpreter.memo
+import audioscript.interpreter.optimizer
+import audioscript.interpreter.pipeline
+import audioscript.interpreter.transpiler
+import audioscript.interpreter.type_checker
+import audioscript.interpreter.vm
 import audioscript.lexer.Lexer
 import audioscript.pars.Parser
+import audioscript.pars.cache
 
 if __name__ == '__main__':
-    filepath = input("Input code path:\n>")
-    with open(filepath, 'r') as f:
-        text = ""
-        for line in f:
-            text += line.strip()
-        lexer = audioscript.lexer.Lexer.Lexer(text)
+    arg_parser = argparse.ArgumentParser(description='Run AudioScript program.')
+    arg_parser.add_argument('path', nargs='?', help='path to the script')
+    arg_parser.add_argument('--lexer', default='regex', choices=sorted(audioscript.lexer.Lexer.LEXER_ENGINES),
+                            help='lexing engine')
+    arg_parser.add_argument('--engine', default='tree', choices=sorted(audioscript.interpreter.engines.ENGINES),
+                            help='execution engine')
+    arg_parser.add_argument('--disassemble', action='store_true',
+                            help='print bytecode of the program compiled for the vm engine instead of running it')
+    arg_parser.add_argument('--save-module', metavar='MODULE',
+                            help='write Python module made by the python engine to MODULE instead of running the program')
+    arg_parser.add_argument('--load-module', metavar='MODULE',
+                            help='run Python module written by --save-module instead of a script')
+    arg_parser.add_argument('-O', dest='optimize', type=int, default=0, choices=audioscript.interpreter.optimizer.LEVELS,
+                            help='optimization level of the program tree, see Optimizer; what was removed is '
+                                 'reported on stderr')
+    arg_parser.add_argument('--typecheck', action='store_true',
+                            help='check types before running and do not run the program if they are wrong')
+    arg_parser.add_argument('--memo-size', type=int, default=audioscript.interpreter.memo.MEMO_SIZE,
+                            help='number of results of every pure function kept for calls with the same '
+                                 'arguments, 0 turns memoization off; hits and misses are reported on stderr')
+    arg_parser.add_argument('--process', metavar='WAV',
+                            help='run the program once, then call its function (see --function) as '
+                                 'process(block, channel) for every block of every channel of WAV; latency and '
+                                 'throughput are reported on stderr')
+    arg_parser.add_argument('--output', metavar='WAV',
+                            help='write arrays returned for the blocks of --process to WAV')
+    arg_parser.add_argument('--block-size', type=int, default=1024,
+                            help='frames of every block of --process')
+    arg_parser.add_argument('--function', default='process',
+                            help='name of the function called for every block of --process')
+    arg_parser.add_argument('--no-cache', action='store_true',
+                            help='always parse the script, do not use or write {} (also turned off by setting {})'.format(
+                                audioscript.pars.cache.CACHE_DIRECTORY, audioscript.pars.cache.DISABLE_VARIABLE))
+    args = arg_parser.parse_args()
+
+    if args.load_module:
+        audioscript.interpreter.transpiler.run_module(audioscript.interpreter.transpiler.load_module(args.load_module),
+                                                      args.memo_size)
+        raise SystemExit
+
+    filepath = args.path or input("Input code path:\n>")
+    if not args.no_cache and audioscript.pars.cache.cache_enabled():
+        parser = audioscript.pars.cache.CachedParser(filepath, args.lexer)
+    else:
+        lexer = audioscript.lexer.Lexer.make_lexer(pathlib.Path(filepath), args.lexer)
         parser = audioscript.pars.Parser.Parser(lexer)
-        int = audioscript.interpreter.Interpreter.Interpreter(parser)
-        int.interpret()
\ No newline at end of file
+    if args.optimize or args.typecheck:
+        tree = parser.parse()
+        if args.optimize:
+            # the function called for every block is referenced by the host only
+            roots = (args.function,) if args.process else ()
+            optimization = audioscript.interpreter.optimizer.Optimizer(parser, args.optimize, roots).optimize(tree)
+            print('\n'.join(optimization.report()), file=sys.stderr)
+            tree = optimization.tree
+        if args.typecheck:
+            errors = audioscript.interpreter.type_checker.TypeChecker(parser).check(tree).errors
+            if errors:
+                raise SystemExit('\n'.join(errors))
+        parser = audioscript.pars.Parser.ParsedTree(tree, parser)
+    if args.save_module:
+        source = audioscript.interpreter.transpiler.PythonInterpreter(parser).transpile(filepath)
+        audioscript.interpreter.transpiler.save_module(source, args.save_module)
+    elif args.disassemble:
+        print(audioscript.interpreter.bytecode.disassemble(audioscript.interpreter.vm.VirtualMachine(parser).compile()))
+    elif args.process:
+        source = audioscript.interpreter.pipeline.WavSource(args.process, args.block_size)
+        sink = None
+        if args.output:
+            sink = audioscript.interpreter.pipeline.WavSink(args.output, source)
+        pipeline = audioscript.interpreter.pipeline.Pipeline(parser, args.engine, args.function, args.memo_size)
+        try:
+            statistics = pipeline.run(source, sink)
+        finally:
+            if sink is not None:
+                sink.close()
+        print('\n'.join(statistics.report(source.sample_rate * source.channels)), file=sys.stderr)
+    else:
+        int = audioscript.interpreter.engines.make_interpreter(parser, args.engine, args.memo_size)
+        int.interpret()
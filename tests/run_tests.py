@@ -0,0 +1,164 @@
+"""
+Run the scripts of this directory with every engine and compare what they print with
+expected/<script>, and what they print on stderr with expected/<script>.stderr when it exists;
+scripts which fail have the last line of the error, their message, in expected/<script>.error.
+
+Scripts with expected/<script>.typecheck are run with --typecheck too, which must reject them
+before running: nothing may be printed but the type errors in the file.
+
+OPTIMIZED_SCRIPTS are run at every optimization level of OPTIMIZED_LEVELS too, and must print
+the same at each.
+
+PIPELINE_SCRIPTS run in pipeline mode instead, see run.py --process, at every optimization level
+of PIPELINE_LEVELS, passing through blocks of a generated file in every format the wav module
+reads; they must write the file unchanged.
+
+Scripts run in a temporary directory, removed with the files they wrote.
+
+Run as `python tests/run_tests.py [--engine ENGINE] [script ...]`.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+TESTS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(TESTS)
+EXPECTED = os.path.join(TESTS, 'expected')
+# modules inside the package import each other both as 'audioscript.x' and 'x'
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'audioscript')]
+
+import numpy
+from audioscript.interpreter.engines import ENGINES
+from audioscript.modules.wav import SAMPLE_TYPES, WavReader, WavWriter
+
+OPTIMIZED_SCRIPTS = frozenset(('optimizer_identities',))
+OPTIMIZED_LEVELS = (1, 2, 3)
+PIPELINE_SCRIPTS = frozenset(('pipeline',))
+PIPELINE_LEVELS = (0, 2)
+PIPELINE_FRAMES = 1000
+PIPELINE_BLOCK_SIZE = 256
+
+
+def scripts():
+    return sorted(name for name in os.listdir(TESTS) if os.path.isfile(os.path.join(EXPECTED, name)))
+
+
+def run(script, engine, directory, options=()):
+    """
+    Return standard output, standard error and exit status of run.py running the script.
+    """
+    environment = dict(os.environ, PYTHONPATH=os.pathsep.join((ROOT, os.path.join(ROOT, 'audioscript'))))
+    result = subprocess.run([sys.executable, os.path.join(ROOT, 'run.py'), '--no-cache', '--engine', engine]
+                            + list(options) + [os.path.join(TESTS, script)],
+                            cwd=directory, env=environment, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    return result.stdout, result.stderr, result.returncode
+
+
+def expected(name):
+    """
+    Return content of the expected output, None when there is none.
+    """
+    path = os.path.join(EXPECTED, name)
+    if not os.path.isfile(path):
+        return None
+    with open(path) as file:
+        return file.read()
+
+
+def generate(path, sample_type):
+    """
+    Write stereo file of noise with samples of the type and return its frames.
+    """
+    random = numpy.random.default_rng(0)
+    if sample_type.kind == 'f':
+        frames = random.uniform(-1, 1, (PIPELINE_FRAMES, 2)).astype(sample_type)
+    else:
+        limits = numpy.iinfo(sample_type)
+        frames = random.integers(limits.min, limits.max, (PIPELINE_FRAMES, 2), dtype=sample_type, endpoint=True)
+    writer = WavWriter(path, 48000, 2, sample_type)
+    for channel in range(2):
+        writer.write(frames[:, channel], channel)
+    writer.close()
+    return frames
+
+
+def check_pipeline(script, engine):
+    """
+    Return descriptions of the differences of what the script printed and wrote in pipeline mode
+    from the expected output and the file read.
+    """
+    failures = []
+    for sample_type in map(numpy.dtype, SAMPLE_TYPES.values()):
+        for level in PIPELINE_LEVELS:
+            with tempfile.TemporaryDirectory() as directory:
+                frames = generate(os.path.join(directory, 'input.wav'), sample_type)
+                stdout, stderr, _ = run(script, engine, directory, (
+                    '-O', str(level), '--process', 'input.wav', '--output', 'output.wav',
+                    '--block-size', str(PIPELINE_BLOCK_SIZE)))
+                case = '{} samples at -O{}'.format(sample_type, level)
+                if stdout != expected(script):
+                    failures.append('{}: output differs from expected/{}:\n{}'.format(case, script, stdout + stderr))
+                    continue
+                written = WavReader(os.path.join(directory, 'output.wav'), PIPELINE_FRAMES)
+                if written.sample_type != sample_type or not numpy.array_equal(written.samples, frames):
+                    failures.append('{}: output.wav differs from input.wav'.format(case))
+    return failures
+
+
+def check(script, engine):
+    """
+    Return descriptions of the differences of what the script printed from the expected output.
+    """
+    if script in PIPELINE_SCRIPTS:
+        return check_pipeline(script, engine)
+    with tempfile.TemporaryDirectory() as directory:
+        stdout, stderr, _ = run(script, engine, directory)
+    failures = []
+    if stdout != expected(script):
+        failures.append('output differs from expected/{}:\n{}'.format(script, stdout + stderr))
+    expected_errors = expected(script + '.stderr')
+    if expected_errors is not None and stderr != expected_errors:
+        failures.append('stderr differs from expected/{}.stderr:\n{}'.format(script, stderr))
+    expected_error = expected(script + '.error')
+    if expected_error is not None and stderr.rstrip('\n').rpartition('\n')[2] != expected_error.rstrip('\n'):
+        failures.append('error differs from expected/{}.error:\n{}'.format(script, stderr))
+    if script in OPTIMIZED_SCRIPTS:
+        for level in OPTIMIZED_LEVELS:
+            with tempfile.TemporaryDirectory() as directory:
+                stdout, stderr, _ = run(script, engine, directory, ('-O', str(level)))
+            if stdout != expected(script):
+                failures.append('output at -O{} differs from expected/{}:\n{}'.format(level, script, stdout + stderr))
+    type_errors = expected(script + '.typecheck')
+    if type_errors is not None:
+        with tempfile.TemporaryDirectory() as directory:
+            stdout, stderr, status = run(script, engine, directory, ('--typecheck',))
+        if stdout or stderr != type_errors or not status:
+            failures.append('--typecheck did not reject the script with expected/{}.typecheck:\n{}'.format(
+                script, stdout + stderr))
+    return failures
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('scripts', nargs='*', help='scripts to run, all by default')
+    arg_parser.add_argument('--engine', action='append', choices=ENGINES,
+                            help='engine to run the scripts with, may be given more than once; all by default')
+    args = arg_parser.parse_args()
+
+    failed = 0
+    for script in args.scripts or scripts():
+        for engine in args.engine or ENGINES:
+            failures = check(script, engine)
+            print('{} {:>8}: {}'.format(script, engine, 'FAILED' if failures else 'ok'))
+            for failure in failures:
+                print('    ' + failure.replace('\n', '\n    '))
+            failed += bool(failures)
+    if failed:
+        raise SystemExit('{} failed'.format(failed))
+
+
+if __name__ == '__main__':
+    main()